@@ -0,0 +1,316 @@
+"""End-to-end throughput benchmarks over the in-process Telegram simulator.
+
+Each scenario runs a real command (``repost``, ``delete`` or ``sync``) against
+a :class:`~src.simulator.FakeTelegram` in a scratch working directory, so the
+whole pipeline is exercised: URL parsing, batched fetches, album resolution,
+rate limiting, journals and the run catalog.  A scenario reports
+
+* messages per second (source URLs for ``repost``/``sync``, deleted URLs for
+  ``delete``);
+* API calls per message, from the simulator's call counts;
+* peak traced memory (``tracemalloc``).
+
+Every measurement is taken in the same traced run, so compare results only
+with results from the same machine.  :func:`save_results` writes them to JSON;
+:func:`find_regressions` compares a run with a saved baseline.
+
+:func:`run_transfer_benchmark` separately times one large media download plus
+upload through Telethon's sequential path and through the parallel
+:class:`~src.transfer.TransferEngine`, with a simulated latency per part.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .simulator import FakeTelegram
+from .urls import dest_message_url
+
+SCALES = (100, 10_000, 100_000)
+COMMANDS = ("repost", "delete", "sync")
+DEFAULT_RESULTS_PATH = "./data/bench/results.json"
+DEFAULT_BASELINE_PATH = "./data/bench/baseline.json"
+# Relative slowdown (or memory growth) tolerated before a result counts as a regression
+REGRESSION_TOLERANCE = 0.25
+# Peak-memory growth below this is noise at small scales and never counts
+MEMORY_SLACK_BYTES = 1 << 20
+
+# Simulated seconds per downloaded or uploaded part in the transfer benchmark
+DEFAULT_PART_LATENCY = 0.02
+
+SOURCE_CHANNEL = "-1001000000001"
+DESTINATION_CHANNEL = "-1002000000002"
+
+
+@dataclass
+class BenchResult:
+    command: str
+    urls: int
+    seconds: float
+    messages_per_second: float
+    api_calls: int
+    api_calls_per_message: float
+    peak_memory_bytes: int
+    calls: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.command}@{self.urls}"
+
+
+@dataclass
+class TransferResult:
+    mode: str  # "sequential" (download_media + upload_file) or "parallel" (TransferEngine)
+    size_bytes: int
+    seconds: float
+    megabytes_per_second: float
+    requests: int
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def simulated_telegram(server: FakeTelegram):
+    """Make the commands connect to *server* instead of Telegram."""
+    from . import reposter  # local import to avoid top-level cycle
+
+    previous = reposter.__dict__.get("TelegramClient")
+    reposter.TelegramClient = server.client
+    try:
+        yield server
+    finally:
+        if previous is None:
+            del reposter.TelegramClient
+        else:
+            reposter.TelegramClient = previous
+
+
+def _write_lines(path, lines) -> str:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+    return str(path)
+
+
+def _previous_run_path(output_dir, status="") -> Path:
+    from .utils_files import dest_slug  # local import to avoid top-level cycle
+
+    publish_ts = (datetime.now() - timedelta(days=1)).strftime("%Y%m%d_%H%M%S")
+    suffix = f".{status}" if status else ""
+    return Path(output_dir) / f"{publish_ts}_{dest_slug(DESTINATION_CHANNEL)}{suffix}.txt"
+
+
+def _prepare(command, urls, server, album_every):
+    """Seed *server* and the scratch directory for *command*; return the coroutine to time."""
+    from .config import get_config  # local import to avoid top-level cycle
+    from .delete import delete_from_file
+    from .reposter import repost_from_file
+    from .sync import sync
+
+    input_dir, output_dir = get_config().data_dirs
+    server.add_channel(SOURCE_CHANNEL)
+    server.add_channel(DESTINATION_CHANNEL)
+
+    def source_file():
+        ids = server.populate(SOURCE_CHANNEL, urls, album_every=album_every)
+        return _write_lines(
+            Path(input_dir) / "bench_urls.txt", (dest_message_url(SOURCE_CHANNEL, i) for i in ids)
+        )
+
+    def previous_run(status):
+        ids = server.populate(DESTINATION_CHANNEL, urls)
+        return _write_lines(
+            _previous_run_path(output_dir, status), (dest_message_url(DESTINATION_CHANNEL, i) for i in ids)
+        )
+
+    if command == "repost":
+        source = source_file()
+        return repost_from_file(DESTINATION_CHANNEL, source, 0, None, None, False)
+    if command == "delete":
+        previous_run("marked_for_deletion")
+        return delete_from_file(destination=DESTINATION_CHANNEL)
+    if command == "sync":
+        source = source_file()
+        previous_run("")
+        return sync(DESTINATION_CHANNEL, source, 0)
+    raise ValueError(f"Unknown benchmark command {command!r}; expected one of {', '.join(COMMANDS)}.")
+
+
+def run_benchmark(
+    command: str, urls: int, latency: Optional[Dict[str, float]] = None, default_latency: float = 0.0,
+    album_every: int = 0,
+) -> BenchResult:
+    """Run one scenario against a fresh simulator and return its measurements.
+
+    *latency* maps API methods to simulated seconds per call; other methods take
+    *default_latency*.  With *album_every*, the source holds 3-message albums.
+    """
+    # Loaded up front so the first scenario does not measure the lazy Telethon import
+    import telethon  # noqa: F401
+
+    server = FakeTelegram(latency, default_latency, keep_sent=False)
+    with tempfile.TemporaryDirectory() as workdir, _working_directory(workdir), simulated_telegram(server):
+        coro = _prepare(command, urls, server, album_every)
+        sink = io.StringIO()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            # Per-message progress lines would dominate the timings; keep them out of the terminal
+            with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+                asyncio.run(coro)
+        except SystemExit as e:
+            raise RuntimeError(f"{command} benchmark exited with status {e.code}:\n{sink.getvalue()[-2000:]}") from None
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    calls = {method: n for method, n in sorted(server.calls.items()) if method != "connect"}
+    api_calls = server.total_calls
+    return BenchResult(
+        command=command,
+        urls=urls,
+        seconds=round(elapsed, 4),
+        messages_per_second=round(urls / elapsed, 1) if elapsed else float("inf"),
+        api_calls=api_calls,
+        api_calls_per_message=round(api_calls / urls, 4),
+        peak_memory_bytes=peak,
+        calls=calls,
+    )
+
+
+def run_suite(
+    commands=COMMANDS, scales=SCALES, latency=None, default_latency=0.0, album_every=0, on_result=None,
+) -> List[BenchResult]:
+    """Run every command at every scale; *on_result* is called after each scenario."""
+    results = []
+    for urls in scales:
+        for command in commands:
+            result = run_benchmark(command, urls, latency, default_latency, album_every)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
+
+
+def save_results(results: List[BenchResult], path) -> None:
+    """Write *results* to *path* as JSON, along with the interpreter that produced them."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "results": [asdict(r) for r in results],
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_results(path) -> Dict[str, BenchResult]:
+    """Read results saved by :func:`save_results`, keyed by ``command@urls``."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    results = (BenchResult(**entry) for entry in data.get("results", []))
+    return {r.key: r for r in results}
+
+
+def find_regressions(results: List[BenchResult], baseline: Dict[str, BenchResult], tolerance=REGRESSION_TOLERANCE) -> List[str]:
+    """Describe every result that is worse than its *baseline* entry.
+
+    Throughput and memory may vary by *tolerance* (memory also by
+    ``MEMORY_SLACK_BYTES``); API calls per message are deterministic, so any
+    increase counts.
+    """
+    regressions = []
+    for result in results:
+        base = baseline.get(result.key)
+        if base is None:
+            continue
+        if result.messages_per_second < base.messages_per_second * (1 - tolerance):
+            regressions.append(
+                f"{result.key}: {result.messages_per_second:.1f} msgs/s, baseline {base.messages_per_second:.1f}"
+            )
+        if result.api_calls_per_message > base.api_calls_per_message:
+            regressions.append(
+                f"{result.key}: {result.api_calls_per_message} API calls/msg, baseline {base.api_calls_per_message}"
+            )
+        if result.peak_memory_bytes > max(base.peak_memory_bytes * (1 + tolerance), base.peak_memory_bytes + MEMORY_SLACK_BYTES):
+            regressions.append(
+                f"{result.key}: peak memory {result.peak_memory_bytes} B, baseline {base.peak_memory_bytes} B"
+            )
+    return regressions
+
+
+def format_result(result: BenchResult) -> str:
+    return (
+        f"{result.command:<7} {result.urls:>7} URLs  {result.messages_per_second:>10.1f} msgs/s  "
+        f"{result.api_calls_per_message:>7.3f} calls/msg  {result.peak_memory_bytes / 2**20:>8.1f} MiB peak"
+    )
+
+
+def run_transfer_benchmark(
+    size_bytes: int, part_latency: float = DEFAULT_PART_LATENCY, part_size_kb: Optional[int] = None,
+    parallelism: Optional[int] = None,
+) -> List[TransferResult]:
+    """Download and re-upload one *size_bytes* document sequentially, then in parallel.
+
+    Every part request takes *part_latency* simulated seconds.  The parallel run uses a
+    :class:`TransferEngine` with *part_size_kb* and *parallelism* (default: the env settings).
+    """
+    from .transfer import TransferEngine  # local import to avoid top-level cycle
+
+    engine = TransferEngine(part_size_kb, parallelism, threshold=0)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in ("sequential", "parallel"):
+            server = FakeTelegram({"download_part": part_latency, "upload_part": part_latency})
+            client = server.client()
+            media = server.add_file(size_bytes)
+            path = os.path.join(workdir, mode)
+
+            async def transfer():
+                if mode == "sequential":
+                    await client.upload_file(await client.download_media(media, file=path))
+                else:
+                    await engine.upload(client, await engine.download(client, media, path))
+
+            start = time.perf_counter()
+            asyncio.run(transfer())
+            elapsed = time.perf_counter() - start
+            os.remove(path)
+            results.append(TransferResult(
+                mode=mode,
+                size_bytes=size_bytes,
+                seconds=round(elapsed, 4),
+                megabytes_per_second=round(2 * size_bytes / 2**20 / elapsed, 1),
+                requests=server.total_calls,
+            ))
+    return results
+
+
+def format_transfer_result(result: TransferResult) -> str:
+    return (
+        f"{result.mode:<10} {result.size_bytes / 2**20:>8.1f} MiB  {result.seconds:>8.2f}s  "
+        f"{result.megabytes_per_second:>8.1f} MiB/s  {result.requests:>6} part requests"
+    )
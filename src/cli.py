@@ -4,6 +4,12 @@ import click
 
 from .reposter import login as perform_login, repost_from_file
 from .delete import delete_from_file
+from .sync import sync as perform_sync
+from .session_pool import DEFAULT_SESSION, get_session_names
+from .serve import DEFAULT_POLL_INTERVAL, serve as perform_serve
+from .follow import follow as perform_follow
+from .prefetch import prefetch as perform_prefetch
+from .pipeline import HistoryFilter
 
 
 @click.group()
@@ -13,38 +19,71 @@ def cli():
 
 
 @cli.command()
-@click.option("--destination", required=True, help="Destination channel ID or username.")
-@click.option("--source", required=False, default="./temp/input/source_urls.txt", help="Source file with message URLs.")
+@click.option("--destination", required=True, multiple=True, help="Destination channel ID or username. Repeat to fan out to several channels.")
+@click.option("--source", required=False, default="./temp/input/source_urls.txt", help="Source file with message URLs ('-' reads stdin).")
 @click.option("--sleep", type=float, default=None, help="Sleep interval in seconds between reposts (default: 0.1, overridden by REPOST_SLEEP_INTERVAL env var).")
-def repost(destination, source, sleep):
-    """Reposts messages from file to the specified destination."""
-    # Validate sleep interval if provided
-    if sleep is not None and sleep < 0:
-        raise click.BadParameter("Sleep interval must be a positive number.")
-
-    click.echo(f"Reposting messages to {destination} from {source}...")
-    asyncio.run(repost_from_file(destination, source, sleep))
+@click.option("--min-sleep", type=float, default=None, help="Floor the adaptive rate limiter may speed up to (default: the sleep interval).")
+@click.option("--max-sleep", type=float, default=None, help="Cap on the interval the rate limiter backs off to after flood waits.")
+@click.option("--resume", is_flag=True, default=False, help="Continue the latest interrupted run for the destination, skipping completed entries.")
+@click.option("--session", "sessions", multiple=True, help="Session (account) to send with; repeat to spread destinations over several accounts (default: TELEGRAM_SESSIONS env var, else 'anon').")
+@click.option("--force", is_flag=True, default=False, help="Send every message again, even if an earlier run already copied it to the destination (default: reuse the earlier copies).")
+@click.option("--incremental", is_flag=True, default=False, help="Range and channel sources: only send messages newer than the last run's, and keep the previous run instead of tagging it for deletion.")
+@click.option("--since-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a lower ID.")
+@click.option("--until-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a higher ID.")
+@click.option("--since-date", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), default=None, help="Range and channel sources: skip messages posted before this local time.")
+def repost(destination, source, sleep, min_sleep, max_sleep, resume, sessions, force, incremental, since_id, until_id, since_date):
+    """Reposts messages from file to the specified destination.
+
+    Besides message URLs, the file may list ranges (https://t.me/chan/100-5000) and whole
+    channels (https://t.me/chan), read oldest first.  Their URLs take server-side filters:
+    ?type=photo|video|photo_video|document|audio|voice|round|gif|url, &search=<text>,
+    &from=<user>, &since=<date> and &until=<date>.
+    """
+    # Validate sleep intervals if provided
+    for value in (sleep, min_sleep, max_sleep):
+        if value is not None and value < 0:
+            raise click.BadParameter("Sleep interval must be a positive number.")
+
+    click.echo(f"Reposting messages to {', '.join(destination)} from {source}...")
+    history = HistoryFilter(since_id, until_id, since_date)
+    asyncio.run(repost_from_file(
+        destination, source, sleep, min_sleep, max_sleep, resume, sessions=sessions, force=force, history=history,
+        incremental=incremental,
+    ))
     click.echo("Repost command finished.")
 
 
 @cli.command()
-def login():
+@click.option("--session", default=DEFAULT_SESSION, show_default=True, help="Name of the session file to create.")
+def login(session):
     """Creates a new session file by logging in."""
     click.echo("Starting Telegram login process...")
-    asyncio.run(perform_login())
+    asyncio.run(perform_login(session))
 
 
 @cli.command()
-@click.option("--delete-urls", required=False, default=None, help="File with message URLs to delete. If omitted, the tool auto-detects the latest *.marked_for_deletion.txt file for the provided destination.")
+@click.option("--delete-urls", required=False, default=None, help="File with message URLs to delete (not stdin). If omitted, the tool auto-detects the latest *.marked_for_deletion.txt file for the provided destination.")
 @click.option("--source", required=False, default=None, help="(Hidden) Ignored by delete.", hidden=True)
-@click.option("--destination", required=False, default=None, help="Destination channel (hidden, used for auto-detect)", hidden=True)
+@click.option("--destination", required=False, multiple=True, help="Destination channel (hidden, used for auto-detect)", hidden=True)
 @click.option("--sleep", required=False, default=None, type=float, help="(Hidden) Ignored by delete.", hidden=True)
-def delete(delete_urls, source, destination, sleep):
+@click.option("--min-sleep", required=False, default=None, type=float, help="(Hidden) Ignored by delete.", hidden=True)
+@click.option("--max-sleep", required=False, default=None, type=float, help="(Hidden) Ignored by delete.", hidden=True)
+@click.option("--resume", is_flag=True, default=False, help="Skip messages already deleted by an earlier failed or interrupted run on the same file.")
+@click.option("--session", "sessions", multiple=True, help="Session (account) to delete with; only the first is used (default: 'anon').")
+def delete(delete_urls, source, destination, sleep, min_sleep, max_sleep, resume, sessions):
     """Deletes messages from the destination channel based on a list."""
     import sys
     try:
         click.echo(f"Deleting messages using file: {delete_urls or '[auto-detect]'}...")
-        asyncio.run(delete_from_file(delete_urls, destination=destination))
+        session_name = get_session_names(sessions)[0]
+        if delete_urls or len(destination) <= 1:
+            asyncio.run(delete_from_file(
+                delete_urls, destination=destination[0] if destination else None, resume=resume, session_name=session_name,
+            ))
+        else:
+            # Each destination of a fan-out repost has its own marked run
+            for dest in destination:
+                asyncio.run(delete_from_file(destination=dest, resume=resume, session_name=session_name))
         click.echo("Delete command finished.")
         sys.exit(0)
     except FileNotFoundError as e:
@@ -53,3 +92,121 @@ def delete(delete_urls, source, destination, sleep):
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
         sys.exit(1)
+
+
+@cli.command()
+@click.option("--destination", required=True, multiple=True, help="Destination channel ID or username. Repeat to fan out to several channels.")
+@click.option("--source", required=False, default="./temp/input/source_urls.txt", help="Source file with message URLs ('-' reads stdin).")
+@click.option("--sleep", type=float, default=None, help="Sleep interval in seconds between reposts (default: 0.1, overridden by REPOST_SLEEP_INTERVAL env var).")
+@click.option("--min-sleep", type=float, default=None, help="Floor the adaptive rate limiter may speed up to (default: the sleep interval).")
+@click.option("--max-sleep", type=float, default=None, help="Cap on the interval the rate limiter backs off to after flood waits.")
+@click.option("--resume", is_flag=True, default=False, help="Resume interrupted repost and delete runs for the destination.")
+@click.option("--delete-urls", required=False, default=None, help="(Hidden) Ignored by sync, which always deletes the run tagged for deletion.", hidden=True)
+@click.option("--session", "sessions", multiple=True, help="Session (account) to send with; repeat to spread destinations over several accounts (default: TELEGRAM_SESSIONS env var, else 'anon').")
+@click.option("--reuse", is_flag=True, default=False, help="Reuse posts an earlier run already copied to the destination, deleting only those whose source left the list.")
+@click.option("--force", is_flag=True, default=False, help="Send every message again and delete the whole previous run (the default; overrides --reuse).")
+@click.option("--since-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a lower ID.")
+@click.option("--until-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a higher ID.")
+@click.option("--since-date", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), default=None, help="Range and channel sources: skip messages posted before this local time.")
+def sync(destination, source, sleep, min_sleep, max_sleep, resume, delete_urls, sessions, reuse, force, since_id, until_id, since_date):
+    """Reposts, tags the previous run and deletes it over one Telegram connection."""
+    for value in (sleep, min_sleep, max_sleep):
+        if value is not None and value < 0:
+            raise click.BadParameter("Sleep interval must be a positive number.")
+
+    click.echo(f"Syncing {', '.join(destination)} from {source}...")
+    history = HistoryFilter(since_id, until_id, since_date)
+    asyncio.run(perform_sync(
+        destination, source, sleep, min_sleep, max_sleep, resume, sessions=sessions, force=force, history=history,
+        reuse=reuse,
+    ))
+    click.echo("Sync command finished.")
+
+
+@cli.command()
+@click.option("--spool", required=False, default=None, help="Directory watched for job manifests and URL files (default: data/input/spool).")
+@click.option("--destination", multiple=True, help="Destination for plain URL-file jobs; repeat to fan out.")
+@click.option("--session", "sessions", multiple=True, help="Session (account) to keep connected; repeat for a session pool (default: TELEGRAM_SESSIONS env var, else 'anon').")
+@click.option("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, show_default=True, help="Seconds between spool directory scans.")
+@click.option("--once", is_flag=True, default=False, help="Exit once the spool directory is empty instead of waiting for new jobs.")
+@click.option("--metrics-port", type=click.IntRange(1, 65535), default=None, help="Serve Prometheus metrics at http://0.0.0.0:<port>/metrics.")
+def serve(spool, destination, sessions, poll_interval, once, metrics_port):
+    """Keeps the connection warm and runs repost/delete/sync jobs as they are spooled."""
+    if poll_interval <= 0:
+        raise click.BadParameter("Poll interval must be a positive number.")
+    asyncio.run(perform_serve(spool, destination, sessions, poll_interval, once, metrics_port))
+
+
+@cli.command()
+@click.option("--source", "sources", required=True, multiple=True, help="Source channel ID or username to follow; repeat for several channels.")
+@click.option("--destination", required=True, help="Destination channel ID or username.")
+@click.option("--sleep", type=float, default=None, help="Minimum interval in seconds between reposts (default: 0.1, overridden by REPOST_SLEEP_INTERVAL env var).")
+@click.option("--min-sleep", type=float, default=None, help="Floor the adaptive rate limiter may speed up to (default: the sleep interval).")
+@click.option("--max-sleep", type=float, default=None, help="Cap on the interval the rate limiter backs off to after flood waits.")
+@click.option("--session", "sessions", multiple=True, help="Session (account) to listen and send with (default: TELEGRAM_SESSIONS env var, else 'anon').")
+def follow(sources, destination, sleep, min_sleep, max_sleep, sessions):
+    """Mirrors new posts of the source channels to the destination as they arrive."""
+    for value in (sleep, min_sleep, max_sleep):
+        if value is not None and value < 0:
+            raise click.BadParameter("Sleep interval must be a positive number.")
+    asyncio.run(perform_follow(sources, destination, sleep, min_sleep, max_sleep, sessions))
+
+
+@cli.command()
+@click.option("--source", required=False, default="./temp/input/source_urls.txt", help="Source file with message URLs ('-' reads stdin).")
+@click.option("--session", default=DEFAULT_SESSION, show_default=True, help="Session (account) the later repost will fetch with; cached media references are bound to it.")
+@click.option("--since-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a lower ID.")
+@click.option("--until-id", type=click.IntRange(min=1), default=None, help="Range and channel sources: skip messages with a higher ID.")
+@click.option("--since-date", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), default=None, help="Range and channel sources: skip messages posted before this local time.")
+def prefetch(source, session, since_id, until_id, since_date):
+    """Fetches and caches source messages and albums ahead of a scheduled repost."""
+    click.echo(f"Prefetching messages from {source}...")
+    asyncio.run(perform_prefetch(source, session, history=HistoryFilter(since_id, until_id, since_date)))
+    click.echo("Prefetch command finished.")
+
+
+@cli.command()
+@click.option("--command", "commands", multiple=True, type=click.Choice(["repost", "delete", "sync"]), help="Command to benchmark; repeat for several (default: all).")
+@click.option("--urls", "scales", multiple=True, type=click.IntRange(min=1), help="Number of URLs per scenario; repeat for several (default: 100, 10000 and 100000).")
+@click.option("--latency", type=float, default=0.0, show_default=True, help="Simulated latency in seconds of every API call (with --transfer-mb: of every part, default 0.02).")
+@click.option("--album-every", type=click.IntRange(min=0), default=20, show_default=True, help="Start a 3-message album every N source messages (0: no albums).")
+@click.option("--results", "results_path", default=None, help="Where to save the results (default: data/bench/results.json).")
+@click.option("--baseline", "baseline_path", default=None, help="Saved results to compare against (default: data/bench/baseline.json, if present).")
+@click.option("--save-baseline", is_flag=True, default=False, help="Also save this run as the new baseline.")
+@click.option("--transfer-mb", type=click.IntRange(min=1), default=None, help="Instead of the commands, time a download plus upload of a file of this many MiB, sequential vs parallel.")
+@click.option("--part-kb", type=click.Choice([str(kb) for kb in (4, 8, 16, 32, 64, 128, 256, 512)]), default=None, help="Part size of the parallel transfer (default: TRANSFER_PART_KB env var, else 512).")
+@click.option("--parallelism", type=click.IntRange(min=1), default=None, help="Parts in flight in the parallel transfer (default: TRANSFER_PARALLELISM env var, else 8).")
+def bench(commands, scales, latency, album_every, results_path, baseline_path, save_baseline, transfer_mb, part_kb, parallelism):
+    """Benchmarks repost, delete and sync against an in-process Telegram simulator."""
+    import os
+    import sys
+    from . import bench as benchmarks
+
+    if transfer_mb is not None:
+        results = benchmarks.run_transfer_benchmark(
+            transfer_mb * 2**20, latency or benchmarks.DEFAULT_PART_LATENCY,
+            int(part_kb) if part_kb else None, parallelism,
+        )
+        for result in results:
+            click.echo(benchmarks.format_transfer_result(result))
+        click.echo(f"Speed-up: {results[0].seconds / results[1].seconds:.1f}x")
+        return
+
+    results = benchmarks.run_suite(
+        commands or benchmarks.COMMANDS, scales or benchmarks.SCALES,
+        default_latency=latency, album_every=album_every,
+        on_result=lambda result: click.echo(benchmarks.format_result(result)),
+    )
+    benchmarks.save_results(results, results_path or benchmarks.DEFAULT_RESULTS_PATH)
+
+    baseline_path = baseline_path or benchmarks.DEFAULT_BASELINE_PATH
+    regressions = []
+    if os.path.exists(baseline_path):
+        regressions = benchmarks.find_regressions(results, benchmarks.load_results(baseline_path))
+    if save_baseline:
+        benchmarks.save_results(results, baseline_path)
+        click.echo(f"Saved baseline to {baseline_path}.")
+    for regression in regressions:
+        click.echo(f"[WARN] Regression: {regression}", err=True)
+    if regressions and not save_baseline:
+        sys.exit(1)
@@ -0,0 +1,72 @@
+"""Runtime configuration resolved once per process.
+
+Whether we run under the test suite decides which data directories are used.
+That used to be worked out on every ``get_data_dirs()`` call by walking
+``inspect.stack()``, which builds frame records and reads source lines for
+the whole call stack; ``list_runs`` and the state-file helpers paid for it on
+every call.  :func:`get_config` resolves the environment once into a frozen
+:class:`RuntimeConfig` and caches it.
+
+Test mode is on when ``TEST_MODE=1`` is set or pytest has been imported.
+API credentials are read when the config is first resolved, which happens
+after ``src.main`` has loaded ``.env``.  Numeric tuning knobs (cache sizes,
+TTLs, transfer parts) are read on each use through :func:`env_number`.
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+TEST_DATA_DIRS = ("./tests/data/input", "./tests/data/output")
+DATA_DIRS = ("./data/input", "./data/output")
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """Process-wide settings derived from the environment."""
+
+    test_mode: bool
+    input_dir: str
+    output_dir: str
+    api_id: Optional[str] = None
+    api_hash: Optional[str] = None
+
+    @property
+    def data_dirs(self) -> tuple:
+        return self.input_dir, self.output_dir
+
+
+def _detect_test_mode() -> bool:
+    return os.environ.get("TEST_MODE") == "1" or "pytest" in sys.modules
+
+
+@lru_cache(maxsize=None)
+def get_config() -> RuntimeConfig:
+    """Return the runtime configuration, resolving it on first use."""
+    test_mode = _detect_test_mode()
+    input_dir, output_dir = TEST_DATA_DIRS if test_mode else DATA_DIRS
+    return RuntimeConfig(
+        test_mode=test_mode,
+        input_dir=input_dir,
+        output_dir=output_dir,
+        api_id=os.getenv("API_ID"),
+        api_hash=os.getenv("API_HASH"),
+    )
+
+
+def env_number(name: str, default, parse=float):
+    """Return environment variable *name* parsed by *parse*, or *default* if it is unset or invalid."""
+    env_value = os.environ.get(name)
+    if env_value is not None:
+        try:
+            return parse(env_value)
+        except (ValueError, TypeError):
+            pass
+    return default
+
+
+def reset_config() -> None:
+    """Forget the resolved configuration so the next :func:`get_config` re-reads the environment."""
+    get_config.cache_clear()
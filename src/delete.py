@@ -1,24 +1,133 @@
 from typing import Optional
+import asyncio
 import os
 import sys
 from datetime import datetime
 from pathlib import Path
 
-from .reposter import (
-    parse_telegram_url,
-    TelegramClient,
-    API_ID,
-    API_HASH,
-    get_data_dirs,
-    normalize_channel_id,
-)
+from .reposter import get_data_dirs, open_client
+from .urls import parse_telegram_url, normalize_channel_id, to_entity_id
+from .entity_cache import EntityCache
+from .rate_limit import RateLimiter
 
-from .utils_files import dest_slug, list_runs
+from .utils_files import dest_slug, iter_url_lines, list_runs, state_dir
+from .journal import Journal, cancel_on_signals
+from .metrics import RunSummary
+from .session_pool import DEFAULT_SESSION, entity_cache_path
+from .run_catalog import RunCatalog, parse_run_name
+from .repost_index import RepostIndex
+
+# Telegram deletes at most 100 message IDs per channels.deleteMessages request
+DELETE_MESSAGES_BATCH_SIZE = 100
+
+
+def format_ids(ids) -> str:
+    """Render a list of message IDs compactly, collapsing consecutive runs (``1-3, 7``)."""
+    parts = []
+    run_start = prev = None
+    for msg_id in ids:
+        if prev is not None and msg_id == prev + 1:
+            prev = msg_id
+            continue
+        if run_start is not None:
+            parts.append(str(run_start) if run_start == prev else f"{run_start}-{prev}")
+        run_start = prev = msg_id
+    if run_start is not None:
+        parts.append(str(run_start) if run_start == prev else f"{run_start}-{prev}")
+    return ", ".join(parts)
+
+
+class _IdBitmap:
+    """Set of message IDs stored one bit per possible ID.
+
+    Message IDs are dense per channel, so this takes ``max_id / 8`` bytes where a
+    Python set of millions of ints would take tens of megabytes.
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def add(self, msg_id: int) -> bool:
+        """Add *msg_id*; return False if it was already present."""
+        byte, bit = divmod(msg_id, 8)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
+        mask = 1 << bit
+        if self._bits[byte] & mask:
+            return False
+        self._bits[byte] |= mask
+        return True
+
+
+def _iter_delete_ids(path, skip=frozenset(), report_invalid=False):
+    """Lazily yield ``(channel, msg_id)`` for every distinct message listed in *path*.
+
+    Pairs in *skip* (already deleted by an earlier run) are left out.
+    """
+    seen = {}  # channel -> _IdBitmap
+    for url in iter_url_lines(path):
+        channel, msg_id = parse_telegram_url(url)
+        if not (channel and msg_id):
+            if report_invalid:
+                print(f"Invalid URL: {url}", file=sys.stderr)
+            continue
+        if (channel, msg_id) in skip:
+            continue
+        if seen.setdefault(channel, _IdBitmap()).add(msg_id):
+            yield channel, msg_id
+
+
+class _SkippedMessages:
+    """``(channel, msg_id)`` pairs delete must leave alone.
+
+    These are the messages an earlier attempt already deleted, plus the messages a
+    newer repost run reused and now owns according to the :class:`RepostIndex`.
+    """
+
+    def __init__(self, already_deleted, index, run):
+        self.already_deleted = already_deleted
+        self.index = index
+        self.run = run
+        self._reused = {}  # channel -> IDs owned by other runs
+
+    def reused(self, channel, msg_id) -> bool:
+        if self.run is None:
+            return False
+        ids = self._reused.get(channel)
+        if ids is None:
+            ids = self._reused[channel] = self.index.owned_elsewhere(channel, self.run)
+        return msg_id in ids
+
+    def __contains__(self, ref) -> bool:
+        return ref in self.already_deleted or self.reused(*ref)
+
+
+def iter_delete_chunks(path, skip=frozenset(), size=DELETE_MESSAGES_BATCH_SIZE):
+    """Lazily yield ``(channel, ids)`` delete batches of up to *size* IDs from *path*.
+
+    Each channel keeps a pending buffer that is emitted as soon as it is full, so
+    only ``size`` IDs per channel are held in memory; partial buffers are emitted
+    at the end in first-seen channel order.
+    """
+    pending = {}
+    for channel, msg_id in _iter_delete_ids(path, skip):
+        ids = pending.setdefault(channel, [])
+        ids.append(msg_id)
+        if len(ids) == size:
+            yield channel, ids
+            pending[channel] = []
+    for channel, ids in pending.items():
+        if ids:
+            yield channel, ids
 
 
 async def delete_from_file(
     delete_urls_file: Optional[str] = None,
     destination: Optional[str] = None,
+    resume: bool = False,
+    client=None,
+    entity_cache: Optional[EntityCache] = None,
+    session_name: str = DEFAULT_SESSION,
 ) -> None:
     """
     Async: Delete Telegram messages listed in the given file. If *delete_urls_file* is ``None`` the
@@ -29,7 +138,21 @@ async def delete_from_file(
     The function parses URLs, extracts message IDs and destination channel, and deletes messages via
     Telethon.  It stops immediately on any error to ensure data integrity.  On success, the
     processed file is renamed to ``{publish_ts}_{slug}.deleted_at_{delete_ts}.txt``.
+
+    Messages that a newer repost run reused (see :class:`RepostIndex`) belong to that run and
+    are kept; deleted messages are dropped from the index.
+
+    Every deleted chunk is recorded in a progress journal.  With *resume*, messages recorded by an
+    earlier, failed or interrupted run on the same file are skipped instead of deleted again.
+
+    *client* and *entity_cache* may be passed in to reuse a connection and cache opened by the
+    caller (see ``sync``); by default a new client is connected for *session_name*.
+
+    Unlike ``repost``, delete cannot read stdin (``-``): the file is read twice and renamed
+    once its messages are deleted.
     """
+    if delete_urls_file == "-":
+        raise ValueError("delete cannot read URLs from stdin ('-'); pass the run file to delete.")
     if delete_urls_file is None:
         if destination is None:
             raise FileNotFoundError(
@@ -47,58 +170,97 @@ async def delete_from_file(
             )
         delete_urls_file = str(candidates[0])
 
-    with open(delete_urls_file, 'r', encoding='utf-8') as f:
-        urls = [line.strip() for line in f if line.strip()]
+    journal = Journal(state_dir() / f"{os.path.basename(delete_urls_file)}.delete.journal")
+    already_deleted = set()
+    if resume:
+        already_deleted = {(r["channel"], msg_id) for r in journal.load() for msg_id in r["ids"]}
+        if already_deleted:
+            print(f"Skipping {len(already_deleted)} messages deleted by an earlier run.", file=sys.stderr)
 
-    parsed = []
-    for url in urls:
-        channel, msg_id = parse_telegram_url(url)
-        if channel and msg_id:
-            # Keep original channel value for entity resolution
-            parsed.append((channel, msg_id))
-        else:
-            print(f"Invalid URL: {url}", file=sys.stderr)
+    parsed_name = parse_run_name(os.path.basename(delete_urls_file))
+    run = f"{parsed_name[2]}_{parsed_name[0]}" if parsed_name else None
+    index = RepostIndex()
+    skip = _SkippedMessages(already_deleted, index, run)
+
+    # The file is streamed twice instead of being loaded: a first pass counts the distinct
+    # messages per channel (first-seen order) so every channel can be resolved up front,
+    # the second pass feeds the delete batches
+    counts = {}
+    kept = 0
+    for channel, msg_id in _iter_delete_ids(delete_urls_file, already_deleted, report_invalid=True):
+        if skip.reused(channel, msg_id):
+            kept += 1
+            continue
+        counts[channel] = counts.get(channel, 0) + 1
+    if kept:
+        print(f"[INFO] Keeping {kept} messages reused by a newer run.", file=sys.stderr)
 
-    session_name = "anon"
     should_exit = False
     exit_message = ""
+    deleted = {}  # channel -> IDs confirmed deleted so far, reported on failure
 
-    async with TelegramClient(session_name, API_ID, API_HASH) as client:
-        for channel, msg_id in parsed:
-            # For private channels (starting with -100), use int; for public, use string
-            if str(channel).startswith('-100'):
-                entity_id = int(channel)
-            else:
-                entity_id = channel
-
-            # Entity resolution - if this fails, exit immediately
-            entity = None
-            try:
-                entity = await client.get_entity(entity_id)
-            except Exception as e1:
-                print(f"[WARN] get_entity failed for channel '{entity_id}': {e1}", file=sys.stderr)
-                try:
-                    entity = await client.get_input_entity(entity_id)
-                except Exception as e2:
-                    print(f"[ERROR] get_input_entity also failed for channel '{entity_id}': {e2}", file=sys.stderr)
-                    print(f"Could not find the channel entity '{entity_id}'.", file=sys.stderr)
+    if entity_cache is None:
+        entity_cache = EntityCache(entity_cache_path(session_name))
+    limiter = RateLimiter(0)
+    run_summary = RunSummary("delete")
+    journal.open(truncate=not resume)
+    with cancel_on_signals():
+        try:
+            async with open_client(client, session_name) as client:
+                # Resolve every distinct channel once, concurrently, before deleting anything
+                entities = await entity_cache.resolve_many(
+                    client, [to_entity_id(channel) for channel in counts]
+                )
+                unresolved = [
+                    entity_id for entity_id, entity in entities.items() if isinstance(entity, Exception)
+                ]
+                if unresolved:
+                    for entity_id in unresolved:
+                        print(f"Could not find the channel entity '{entity_id}'.", file=sys.stderr)
                     should_exit = True
                     exit_message = "Entity resolution failed"
-                    break
-
-            # Message deletion - if this fails, exit immediately
-            try:
-                await client.delete_messages(entity, msg_id)
-                print(f"Deleted message {msg_id} from {channel}.")
-            except Exception as e:
-                print(f"Error deleting message {msg_id} from {channel}: {e}", file=sys.stderr)
-                # Exit immediately on any delete error for data integrity
-                should_exit = True
-                exit_message = f"Delete operation failed: {e}"
-                break
+                else:
+                    chunk_numbers = {}
+                    for channel, chunk in iter_delete_chunks(delete_urls_file, skip):
+                        entity_id = to_entity_id(channel)
+                        n = chunk_numbers[channel] = chunk_numbers.get(channel, 0) + 1
+                        total = -(-counts[channel] // DELETE_MESSAGES_BATCH_SIZE)
+
+                        # Message deletion - if any chunk fails, exit immediately
+                        try:
+                            await limiter.call(("delete_messages", entity_id), lambda: entity_cache.call(
+                                client, entity_id,
+                                lambda entity: client.delete_messages(entity, chunk),
+                            ))
+                        except Exception as e:
+                            print(
+                                f"Error deleting chunk {n}/{total} from {channel} "
+                                f"(message IDs {format_ids(chunk)}): {e}",
+                                file=sys.stderr,
+                            )
+                            # Exit immediately on any delete error for data integrity
+                            should_exit = True
+                            exit_message = f"Delete operation failed: {e}"
+                            break
+                        journal.record(channel=channel, ids=chunk)
+                        index.forget(channel, chunk)
+                        deleted.setdefault(channel, []).extend(chunk)
+                        print(f"Deleted {len(chunk)} messages ({format_ids(chunk)}) from {channel}.")
+        except asyncio.CancelledError:
+            should_exit = True
+            exit_message = "Interrupted"
+    journal.close()
+    index.close()
+    entity_cache.save()
 
     # Exit outside the client context if needed
     if should_exit:
+        for channel, ids in deleted.items():
+            print(f"[INFO] Already deleted from {channel}: {format_ids(ids)}", file=sys.stderr)
+        if deleted:
+            print("[INFO] Re-run with --resume to skip the messages already deleted.", file=sys.stderr)
+        else:
+            print("[INFO] No messages were deleted before the failure.", file=sys.stderr)
         print(f"[DEBUG] Exiting due to: {exit_message}", file=sys.stderr)
         raise SystemExit(1)
 
@@ -120,5 +282,9 @@ async def delete_from_file(
     delete_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     new_name = os.path.join(dir_name, f"{publish_ts}_{slug}.deleted_at_{delete_ts}.txt")
 
-    os.replace(delete_urls_file, new_name)
+    with RunCatalog().updating() as catalog:
+        os.replace(delete_urls_file, new_name)
+        catalog.rename(delete_urls_file, new_name)
+    journal.remove()
     print(f"Renamed {base_name} to {os.path.basename(new_name)} after successful deletion.")
+    run_summary.finish(sum(len(ids) for ids in deleted.values()), run_file=os.path.basename(new_name))
@@ -0,0 +1,206 @@
+"""Entity resolution with a persistent on-disk cache.
+
+Resolving usernames (``contacts.resolveUsername``) is one of the most heavily
+flood-limited Telegram calls, yet every run of ``repost`` and ``delete`` used
+to start cold.  :class:`EntityCache` keeps the resolved *input peers* (peer
+type, ID and access hash) in ``.state/entity_cache.json`` keyed by username or
+``-100…`` ID, so later runs can address channels without resolving them again.
+
+Entries expire after a TTL (``ENTITY_CACHE_TTL`` seconds, default one day) and
+are dropped as soon as Telegram reports the peer as invalid.  Access hashes are
+bound to the account that obtained them, so ``login`` clears the cache when a
+new session is created.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import env_number
+from .rate_limit import unpaced_call
+from .utils_files import state_dir
+
+CACHE_FILENAME = "entity_cache.json"
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def get_cache_ttl() -> float:
+    """Return the cache TTL in seconds: ``ENTITY_CACHE_TTL`` env var > default (one day)."""
+    return env_number("ENTITY_CACHE_TTL", DEFAULT_TTL)
+
+
+def cache_key(entity_id) -> str:
+    """Return the cache key for a username (``@`` and case ignored) or numeric ID."""
+    key = str(entity_id).strip()
+    if key.lstrip("-").isdigit():
+        return key
+    return key.lstrip("@").lower()
+
+
+def peer_to_dict(entity) -> Optional[dict]:
+    """Serialize the input peer of *entity*, or return None if it has none."""
+    from telethon import utils
+    from telethon.tl import types
+
+    try:
+        peer = utils.get_input_peer(entity, allow_self=False)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(peer, types.InputPeerChannel):
+        return {"type": "channel", "id": peer.channel_id, "access_hash": peer.access_hash}
+    if isinstance(peer, types.InputPeerUser):
+        return {"type": "user", "id": peer.user_id, "access_hash": peer.access_hash}
+    if isinstance(peer, types.InputPeerChat):
+        return {"type": "chat", "id": peer.chat_id}
+    return None
+
+
+def peer_from_dict(data: dict):
+    """Rebuild the Telethon input peer serialized by :func:`peer_to_dict`."""
+    from telethon.tl import types
+
+    if data["type"] == "channel":
+        return types.InputPeerChannel(channel_id=data["id"], access_hash=data["access_hash"])
+    if data["type"] == "user":
+        return types.InputPeerUser(user_id=data["id"], access_hash=data["access_hash"])
+    return types.InputPeerChat(chat_id=data["id"])
+
+
+def is_stale_peer_error(exc: BaseException) -> bool:
+    """True if *exc* means Telegram no longer accepts the peer we addressed."""
+    from telethon import errors
+
+    return isinstance(
+        exc,
+        (
+            errors.ChannelInvalidError,
+            errors.PeerIdInvalidError,
+            errors.ChatIdInvalidError,
+            errors.UserIdInvalidError,
+        ),
+    )
+
+
+async def resolve_entity(client, entity_id):
+    """Resolve *entity_id* via get_entity, falling back to get_input_entity.
+
+    Raises the get_input_entity error if both lookups fail.
+    """
+    try:
+        return await unpaced_call(("get_entity",), lambda: client.get_entity(entity_id))
+    except Exception as e1:
+        print(f"[WARN] get_entity failed for channel '{entity_id}': {e1}", file=sys.stderr)
+        try:
+            return await unpaced_call(("get_input_entity",), lambda: client.get_input_entity(entity_id))
+        except Exception as e2:
+            print(f"[ERROR] get_input_entity also failed for channel '{entity_id}': {e2}", file=sys.stderr)
+            raise
+
+
+class EntityCache:
+    """Per-run memo of resolved entities backed by a JSON file of input peers."""
+
+    def __init__(self, path: Optional[Path] = None, ttl: Optional[float] = None):
+        self.path = Path(path) if path is not None else state_dir() / CACHE_FILENAME
+        self.ttl = get_cache_ttl() if ttl is None else ttl
+        self._entries = self._load()
+        self._memo = {}
+        self._dirty = False
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring unreadable entity cache {self.path}: {e}", file=sys.stderr)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def save(self) -> None:
+        """Write the cache back to disk (atomically) if it changed during this run."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def clear(self) -> None:
+        """Forget every cached entity, both in memory and on disk."""
+        self._entries = {}
+        self._memo = {}
+        self._dirty = True
+        self.save()
+
+    def lookup(self, entity_id):
+        """Return the cached input peer for *entity_id* if present and fresh, else None."""
+        key = cache_key(entity_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.get("resolved_at", 0) > self.ttl:
+            del self._entries[key]
+            self._dirty = True
+            return None
+        return peer_from_dict(entry["peer"])
+
+    def remember(self, entity_id, entity) -> None:
+        """Persist the input peer of *entity* under *entity_id* (no-op if it has none)."""
+        peer = peer_to_dict(entity)
+        if peer is None:
+            return
+        self._entries[cache_key(entity_id)] = {"peer": peer, "resolved_at": time.time()}
+        self._dirty = True
+
+    def invalidate(self, entity_id) -> None:
+        """Drop *entity_id* after Telegram rejected its cached peer."""
+        key = cache_key(entity_id)
+        self._memo.pop(key, None)
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+            print(f"[WARN] Dropped stale cached entity for '{entity_id}'.", file=sys.stderr)
+
+    async def resolve(self, client, entity_id):
+        """Return the entity for *entity_id*, resolving it through Telegram only on a cache miss."""
+        key = cache_key(entity_id)
+        if key in self._memo:
+            return self._memo[key]
+        entity = self.lookup(entity_id)
+        if entity is None:
+            entity = await resolve_entity(client, entity_id)
+            self.remember(entity_id, entity)
+        self._memo[key] = entity
+        return entity
+
+    async def resolve_many(self, client, entity_ids) -> dict:
+        """Resolve every distinct ID in *entity_ids* concurrently, once each.
+
+        Returns a dict mapping each ID to its entity, or to the exception that made
+        resolution fail.
+        """
+        unique_ids = list(dict.fromkeys(entity_ids))
+        results = await asyncio.gather(
+            *(self.resolve(client, entity_id) for entity_id in unique_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(unique_ids, results))
+
+    async def call(self, client, entity_id, fn):
+        """Await ``fn(entity)``; if the cached peer turns out stale, re-resolve once and retry."""
+        entity = await self.resolve(client, entity_id)
+        try:
+            return await fn(entity)
+        except Exception as e:
+            if not is_stale_peer_error(e):
+                raise
+            self.invalidate(entity_id)
+            entity = await self.resolve(client, entity_id)
+            return await fn(entity)
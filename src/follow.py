@@ -0,0 +1,144 @@
+"""Live ``follow`` mode: mirror new posts of source channels as they arrive.
+
+Instead of polling and re-running ``repost`` over URL files, :func:`follow`
+subscribes to ``events.NewMessage`` and ``events.Album`` on the source
+channels and copies each post to the destination with the same copy (not
+forward) semantics as :func:`~src.reposter.repost_from_file`.  Telethon's
+``Album`` event buffers grouped messages briefly until the whole album has
+arrived, so albums are still sent as one group.
+
+Events are queued and sent in arrival order by a single sender under the
+destination's rate limiter.  New destination URLs are appended to the current
+run file of the destination (the newest untagged ``{publish_ts}_{slug}.txt``,
+or a new one), so a later ``repost`` or ``delete`` sees them like any other
+run.  Posts published while ``follow`` is not running are not picked up.
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from .journal import cancel_on_signals
+from .pipeline import RepostItem
+from .rate_limit import RateLimiter
+from .run_catalog import RunCatalog
+from .reposter import get_data_dirs, get_sleep_interval, send_item
+from .session_pool import SessionPool
+from .urls import dest_message_url, normalize_channel_id, to_entity_id
+from .utils_files import dest_slug, list_runs
+
+
+def current_run_file(normalized_destination) -> Path:
+    """Return the newest untagged run file of the destination, creating a new one if there is none."""
+    slug = dest_slug(normalized_destination)
+    runs = list_runs(slug, status=[""])
+    if runs:
+        return runs[0]
+    _, output_dir = get_data_dirs()
+    os.makedirs(output_dir, exist_ok=True)
+    publish_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_file = Path(output_dir) / f"{publish_ts}_{slug}.txt"
+    with RunCatalog().updating() as catalog:
+        run_file.touch()
+        catalog.add(run_file)
+    return run_file
+
+
+class LiveMirror:
+    """Event handlers feeding a single in-order sender for one destination."""
+
+    def __init__(self, client, entity_cache, normalized_destination, run_file, limiter):
+        self.client = client
+        self.entity_cache = entity_cache
+        self.normalized_destination = normalized_destination
+        self.run_file = Path(run_file)
+        self.limiter = limiter
+        self.queue = asyncio.Queue()
+        self._count = 0
+
+    def _item(self, chat_id, message, album=None) -> RepostItem:
+        channel = str(chat_id)
+        self._count += 1
+        return RepostItem(
+            self._count, dest_message_url(channel, message.id), channel, message.id, chat_id,
+            message=message, album=album,
+        )
+
+    async def on_message(self, event) -> None:
+        # Grouped messages arrive again, complete, through on_album
+        if getattr(event.message, 'grouped_id', None):
+            return
+        await self.queue.put(self._item(event.chat_id, event.message))
+
+    async def on_album(self, event) -> None:
+        messages = sorted(event.messages, key=lambda m: m.id)
+        await self.queue.put(self._item(event.chat_id, messages[0], album=messages))
+
+    async def run(self) -> None:
+        """Send queued posts in arrival order, appending their URLs to the run file."""
+        with open(self.run_file, "a", encoding="utf-8") as out:
+            while True:
+                item = await self.queue.get()
+                try:
+                    sent_msgs = await send_item(
+                        self.client, item, self.normalized_destination, self.entity_cache, self.limiter
+                    )
+                    for sent in sent_msgs:
+                        out.write(dest_message_url(self.normalized_destination, sent.id) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                except Exception as e:
+                    print(f"Error reposting message {item.msg_id} from {item.channel}: {e}", file=sys.stderr)
+                finally:
+                    self.queue.task_done()
+
+
+async def follow(sources, destination, sleep_interval=None, min_sleep=None, max_sleep=None, sessions=None):
+    """Mirror new posts of *sources* to *destination* until disconnected or interrupted."""
+    from telethon import events
+
+    normalized_destination = str(normalize_channel_id(destination))
+    run_file = current_run_file(normalized_destination)
+    sleep_time = get_sleep_interval(sleep_interval)
+
+    async with SessionPool(sessions) as pool:
+        lane = pool.lane_for(normalized_destination)
+        client = lane.client
+        try:
+            await lane.entity_cache.resolve(client, to_entity_id(normalized_destination))
+        except Exception:
+            print(f"Could not find the destination entity '{destination}'.", file=sys.stderr)
+            sys.exit(1)
+        chats = []
+        for source in sources:
+            source_id = to_entity_id(source)
+            try:
+                chats.append(await lane.entity_cache.resolve(client, source_id))
+            except Exception:
+                print(f"Could not find the source entity '{source}'.", file=sys.stderr)
+                sys.exit(1)
+
+        limiter = pool.limiter(
+            ("send", normalized_destination, sleep_time, min_sleep, max_sleep),
+            lambda: RateLimiter(sleep_time, min_interval=min_sleep, max_interval=max_sleep),
+        )
+        mirror = LiveMirror(client, lane.entity_cache, normalized_destination, run_file, limiter)
+        client.add_event_handler(mirror.on_message, events.NewMessage(chats=chats))
+        client.add_event_handler(mirror.on_album, events.Album(chats=chats))
+        sender = asyncio.create_task(mirror.run())
+        print(
+            f"Following {', '.join(str(s) for s in sources)}; appending to {run_file.name}.",
+            file=sys.stderr,
+        )
+        with cancel_on_signals():
+            try:
+                await client.run_until_disconnected()
+                # Send whatever arrived before the disconnect
+                await mirror.queue.join()
+            except asyncio.CancelledError:
+                print("Stopped following.", file=sys.stderr)
+            finally:
+                sender.cancel()
+                pool.save_caches()
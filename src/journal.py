@@ -0,0 +1,114 @@
+"""Crash-safe progress journals for long repost and delete runs.
+
+A :class:`Journal` is an append-only JSON-lines file in the ``.state/``
+directory.  Every record is flushed and fsync'd before the run moves on, so
+after a crash, container restart or signal the journal lists exactly the work
+that was completed; ``--resume`` reads it back and skips those entries.
+:func:`cancel_on_signals` turns SIGTERM/SIGINT into task cancellation so the
+commands can close their journals and exit cleanly instead of being killed
+mid-write.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+
+class Journal:
+    """Append-only, fsync'd JSON-lines progress log."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> List[dict]:
+        """Return all complete records; a torn last line from a crash is ignored."""
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        print(f"[WARN] Ignoring incomplete journal line in {self.path.name}.", file=sys.stderr)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def open(self, truncate: bool = False) -> "Journal":
+        """Open the journal for appending (or start it over with *truncate*)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w" if truncate else "a", encoding="utf-8")
+        return self
+
+    def record(self, **entry) -> None:
+        """Durably append one record."""
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        """Close and delete the journal once its run has completed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+# Nesting depth of cancel_on_signals(); only the outermost block installs handlers
+_active = 0
+
+
+@contextmanager
+def cancel_on_signals(on_signal=None):
+    """Cancel the current task on SIGTERM/SIGINT while the block runs.
+
+    The cancelled command sees :class:`asyncio.CancelledError` at its next await
+    point and can close its journal before exiting.  *on_signal* is called first,
+    so a caller can tell a shutdown apart from other cancellations.  Nested blocks
+    (a ``serve`` job running ``repost``) keep the outermost handlers, which
+    cancel the same task.
+    """
+    global _active
+    if _active:
+        _active += 1
+        try:
+            yield
+        finally:
+            _active -= 1
+        return
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+
+    def handle():
+        if on_signal is not None:
+            on_signal()
+        task.cancel()
+
+    installed = []
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, handle)
+            installed.append(sig)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Not supported on this platform or outside the main thread
+            pass
+    _active += 1
+    try:
+        yield
+    finally:
+        _active -= 1
+        for sig in installed:
+            loop.remove_signal_handler(sig)
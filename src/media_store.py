@@ -0,0 +1,313 @@
+"""Content-addressed copies of source media, uploaded once per session.
+
+Messages are normally copied *by reference*: the source's photo or document
+is sent again without transferring any bytes.  Telegram refuses that for
+channels that restrict forwarding, and once a file reference has expired.
+Every such album used to fall back to a fresh transfer to every destination,
+on every run.  :class:`MediaStore` keeps, under ``.state/media/``:
+
+* blobs of downloaded media, named by the SHA-256 of their bytes, so identical
+  files from different source messages are stored once;
+* which source photo or document each blob holds;
+* per session, a *handle* for every blob already uploaded: the input media of
+  the destination message that carried it.  Later destinations and runs send
+  the handle, which costs no transfer at all.
+
+:func:`send_media` tries the reference first and falls back to the store.  A
+handle whose file reference has expired is refreshed by fetching its
+destination message again (or, if that message is gone, uploaded again from
+the blob).  Large files are moved by the parallel
+:class:`~src.transfer.TransferEngine`.  Blobs are bounded to ``MEDIA_CACHE_MAX_MB`` megabytes (default
+2048), evicting the least recently used first; handles need no blob and are
+kept.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import env_number
+from .entity_cache import cache_key
+from .message_cache import decode_message, encode_message, is_file_reference_error
+from .metrics import METRICS
+from .rate_limit import unpaced_call
+from .session_pool import DEFAULT_SESSION
+from .transfer import TransferEngine
+from .urls import to_entity_id
+from .utils_files import state_dir
+
+MEDIA_DIRNAME = "media"
+INDEX_FILENAME = "media.sqlite"
+DEFAULT_MAX_MB = 2048
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    media TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS handles (
+    session TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    input_media BLOB NOT NULL,
+    destination TEXT NOT NULL,
+    msg_id INTEGER NOT NULL,
+    PRIMARY KEY (session, sha256)
+);
+"""
+
+
+def get_max_bytes() -> int:
+    """Return the blob size bound: ``MEDIA_CACHE_MAX_MB`` env var > default (2048 MB)."""
+    return int(env_number("MEDIA_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+
+
+def media_id(media) -> Optional[str]:
+    """Return ``photo:<id>`` or ``document:<id>`` for transferable *media*, else None."""
+    for kind in ("photo", "document"):
+        item_id = getattr(getattr(media, kind, None), "id", None)
+        if isinstance(item_id, int):
+            return f"{kind}:{item_id}"
+    return None
+
+
+def needs_copy(exc: BaseException) -> bool:
+    """True if *exc* means the media cannot be sent by reference."""
+    from telethon import errors
+
+    return isinstance(exc, errors.ChatForwardsRestrictedError) or is_file_reference_error(exc)
+
+
+def uploaded_media(media, input_file):
+    """Return the input media sending the uploaded *input_file* like the source *media*."""
+    from telethon.tl import types
+
+    if getattr(media, "photo", None) is not None:
+        return types.InputMediaUploadedPhoto(file=input_file)
+    document = media.document
+    return types.InputMediaUploadedDocument(
+        file=input_file, mime_type=document.mime_type, attributes=list(document.attributes or []),
+    )
+
+
+class MediaStore:
+    """On-disk blobs of source media plus per-session handles of their uploaded copies."""
+
+    def __init__(self, root=None, max_bytes: Optional[int] = None, transfer: Optional[TransferEngine] = None):
+        self.root = Path(root) if root is not None else state_dir() / MEDIA_DIRNAME
+        self.max_bytes = get_max_bytes() if max_bytes is None else max_bytes
+        self.transfer = transfer or TransferEngine()
+        self.restricted = set()  # source channels that refused a send by reference this run
+        self._conn = None
+        self._locks = {}  # session -> asyncio.Lock serializing its copy sends
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.root / INDEX_FILENAME, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "MediaStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lock(self, session: str) -> asyncio.Lock:
+        """Return the lock held while *session* sends copies, so each file is uploaded once."""
+        if session not in self._locks:
+            self._locks[session] = asyncio.Lock()
+        return self._locks[session]
+
+    def blob_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def _sha_of(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT sha256 FROM sources WHERE media = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def handle(self, session: str, sha256: str):
+        """Return the uploaded input media of blob *sha256* for *session*, or None."""
+        row = self._connect().execute(
+            "SELECT input_media FROM handles WHERE session = ? AND sha256 = ?", (session, sha256),
+        ).fetchone()
+        return decode_message(row[0]) if row else None
+
+    def has_handle(self, session: str, media) -> bool:
+        """True if *session* already uploaded a copy of *media*."""
+        key = media_id(media)
+        sha256 = self._sha_of(key) if key else None
+        return sha256 is not None and self.handle(session, sha256) is not None
+
+    async def _download(self, client, media, key: str) -> str:
+        partial = self.root / f".{key.replace(':', '_')}.part"
+        self.root.mkdir(parents=True, exist_ok=True)
+        downloaded = await self.transfer.download(client, media, partial)
+        if downloaded is None:
+            raise ValueError(f"could not download {key}")
+        digest = hashlib.sha256()
+        with open(downloaded, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        path = self.blob_path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(downloaded, path)
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO sources (media, sha256) VALUES (?, ?)", (key, sha256))
+        conn.execute(
+            "INSERT OR REPLACE INTO blobs (sha256, size, last_used) VALUES (?, ?, ?)",
+            (sha256, path.stat().st_size, time.time()),
+        )
+        conn.commit()
+        self.evict(keep=sha256)
+        return sha256
+
+    async def _upload(self, client, sha256: str):
+        path = self.blob_path(sha256)
+        self._connect().execute("UPDATE blobs SET last_used = ? WHERE sha256 = ?", (time.time(), sha256))
+        return await self.transfer.upload(client, path)
+
+    async def input_media(self, client, session: str, media, refresh: bool = False):
+        """Return ``(sha256, input media)`` sending a copy of *media* through *session*.
+
+        Uses the session's handle if there is one, else uploads the blob, downloading it
+        first if needed.  With *refresh* a handle is fetched again before it is used.
+        """
+        key = media_id(media)
+        if key is None:
+            return None, media
+        sha256 = self._sha_of(key)
+        if sha256 is not None:
+            handle = await self.refresh(client, session, sha256) if refresh else self.handle(session, sha256)
+            if handle is not None:
+                METRICS.inc("media_copies_total", source="handle")
+                return sha256, handle
+        if sha256 is not None and self.blob_path(sha256).exists():
+            METRICS.inc("media_copies_total", source="blob")
+        else:
+            sha256 = await self._download(client, media, key)
+            METRICS.inc("media_copies_total", source="download")
+        return sha256, uploaded_media(media, await self._upload(client, sha256))
+
+    def remember(self, session: str, sha256: Optional[str], destination, sent) -> None:
+        """Record the media of message *sent* to *destination* as the session's handle of *sha256*."""
+        from telethon import utils
+
+        if sha256 is None or getattr(sent, "media", None) is None:
+            return
+        try:
+            data = encode_message(utils.get_input_media(sent.media))
+        except TypeError:
+            return
+        if data is None:
+            return
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO handles (session, sha256, input_media, destination, msg_id) VALUES (?, ?, ?, ?, ?)",
+            (session, sha256, data, cache_key(destination), sent.id),
+        )
+        conn.commit()
+
+    async def refresh(self, client, session: str, sha256: str):
+        """Fetch the message carrying the handle of *sha256* again; returns the fresh handle or None."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT destination, msg_id FROM handles WHERE session = ? AND sha256 = ?", (session, sha256),
+        ).fetchone()
+        if row is None:
+            return None
+        destination, msg_id = row
+        try:
+            carrier = await unpaced_call(
+                ("get_messages", destination), lambda: client.get_messages(to_entity_id(destination), ids=msg_id),
+            )
+        except Exception as e:
+            print(f"[WARN] Could not refresh uploaded media {sha256[:12]}: {e}", file=sys.stderr)
+            carrier = None
+        conn.execute("DELETE FROM handles WHERE session = ? AND sha256 = ?", (session, sha256))
+        conn.commit()
+        if carrier is None or getattr(carrier, "media", None) is None:
+            return None
+        self.remember(session, sha256, destination, carrier)
+        return self.handle(session, sha256)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete the least recently used blobs beyond the size bound; returns how many."""
+        conn = self._connect()
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        victims = []
+        if total > self.max_bytes:
+            for sha256, size in conn.execute("SELECT sha256, size FROM blobs ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                if sha256 == keep:
+                    continue
+                victims.append(sha256)
+                total -= size
+        for sha256 in victims:
+            self.blob_path(sha256).unlink(missing_ok=True)
+        conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(sha256,) for sha256 in victims])
+        conn.commit()
+        return len(victims)
+
+
+async def send_media(store, client, session, source_id, destination, media_list, send_reference, send_copies):
+    """Send media by reference via ``send_reference()``, falling back to copies from *store*.
+
+    ``send_copies(files)`` sends a list of input media in place of *media_list*.  Once a
+    source channel refuses references, its later media go straight to the copies.  An
+    expired source reference is re-raised for the caller to fetch the message again, unless
+    the session already holds copies of all the media.
+    """
+    source = cache_key(source_id)
+    session = session or DEFAULT_SESSION
+    if store is None or not any(media_id(media) for media in media_list):
+        return await send_reference()
+    if source not in store.restricted:
+        try:
+            return await send_reference()
+        except Exception as e:
+            if not needs_copy(e):
+                raise
+            if is_file_reference_error(e):
+                # Fetching a fresh reference is cheaper than any transfer
+                if not all(store.has_handle(session, media) for media in media_list):
+                    raise
+            else:
+                store.restricted.add(source)
+                print(f"[WARN] Media of {source} cannot be sent by reference ({e}); sending copies.", file=sys.stderr)
+
+    # Destinations sending concurrently wait here and then find the first one's handles
+    async with store.lock(session):
+        refresh = False
+        while True:
+            prepared = [await store.input_media(client, session, media, refresh) for media in media_list]
+            try:
+                sent = await send_copies([file for _, file in prepared])
+            except Exception as e:
+                # A reused handle may have expired; fetch its carrier message once and retry
+                if refresh or not is_file_reference_error(e):
+                    raise
+                refresh = True
+                continue
+            for (sha256, _), message in zip(prepared, sent if isinstance(sent, list) else [sent]):
+                store.remember(session, sha256, destination, message)
+            return sent
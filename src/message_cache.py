@@ -0,0 +1,283 @@
+"""On-disk cache of fetched source messages, filled ahead of time by ``prefetch``.
+
+Publishing the same source list at a scheduled moment used to spend the start
+of the publishing window on ``get_messages`` batches and album lookups.
+``prefetch`` runs the fetch stage earlier and stores what it found in
+``.state/message_cache.sqlite``:
+
+* every fetched message, serialized with Telethon's own TL encoding, so its
+  text, entities and media references (file IDs, access hashes and file
+  references) come back exactly as Telegram sent them;
+* the membership of every album, so a grouped message is only a hit when all
+  of its album is cached too.
+
+``repost`` reads from the cache first and only fetches misses from Telegram,
+which leaves the publishing window mostly send-only.  Entries older than
+``MESSAGE_CACHE_TTL`` seconds (default six hours) are ignored, and a send
+that fails because a cached file reference expired fetches the message again
+and retries.  The cache is bounded to ``MESSAGE_CACHE_MAX_MB`` megabytes
+(default 256), evicting the least recently used messages first.
+
+Media references are bound to the account that fetched them, so every session
+has its own cache file, as with the entity cache.
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import env_number
+from .entity_cache import cache_key
+from .session_pool import DEFAULT_SESSION
+from .utils_files import state_dir
+
+CACHE_FILENAME = "message_cache.sqlite"
+DEFAULT_TTL = 6 * 60 * 60
+DEFAULT_MAX_MB = 256
+# Bytes counted per cached message on top of its serialized size
+ROW_OVERHEAD = 64
+# Writes are committed in batches; close() commits the rest
+COMMIT_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    source TEXT NOT NULL,
+    msg_id INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (source, msg_id)
+);
+CREATE INDEX IF NOT EXISTS messages_by_use ON messages (last_used);
+CREATE TABLE IF NOT EXISTS albums (
+    source TEXT NOT NULL,
+    grouped_id INTEGER NOT NULL,
+    members TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (source, grouped_id)
+);
+"""
+
+
+def get_cache_ttl() -> float:
+    """Return the cache TTL in seconds: ``MESSAGE_CACHE_TTL`` env var > default (six hours)."""
+    return env_number("MESSAGE_CACHE_TTL", DEFAULT_TTL)
+
+
+def get_max_bytes() -> int:
+    """Return the cache size bound: ``MESSAGE_CACHE_MAX_MB`` env var > default (256 MB)."""
+    return int(env_number("MESSAGE_CACHE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+
+
+def message_cache_path(session: str) -> Path:
+    """Return the message cache file of *session*."""
+    if session == DEFAULT_SESSION:
+        return state_dir() / CACHE_FILENAME
+    return state_dir() / f"message_cache.{session}.sqlite"
+
+
+def encode_message(message) -> Optional[bytes]:
+    """Return the TL serialization of *message*, or None if it is not a Telethon object."""
+    from telethon.tl.tlobject import TLObject
+
+    if not isinstance(message, TLObject):
+        return None
+    return bytes(message)
+
+
+def decode_message(data: bytes):
+    """Rebuild a message serialized by :func:`encode_message`."""
+    from telethon.extensions import BinaryReader
+
+    with BinaryReader(data) as reader:
+        return reader.tgread_object()
+
+
+def is_file_reference_error(exc: BaseException) -> bool:
+    """True if *exc* means the media references of a message are no longer valid."""
+    from telethon import errors
+
+    return isinstance(
+        exc,
+        (errors.FileReferenceExpiredError, errors.FileReferenceInvalidError, errors.FileReferenceEmptyError),
+    )
+
+
+class MessageCache:
+    """SQLite cache of source messages and album membership, keyed by source channel and ID."""
+
+    def __init__(self, path=None, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path) if path is not None else state_dir() / CACHE_FILENAME
+        self.ttl = get_cache_ttl() if ttl is None else ttl
+        self.max_bytes = get_max_bytes() if max_bytes is None else max_bytes
+        self.hits = 0
+        self._conn = None
+        self._pending = 0
+        self._used = {}  # (source, msg_id) -> last use not yet written
+
+    def _connect(self, create=True) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if not create and not self.path.exists():
+                # Nothing was prefetched: don't create an empty cache just to read it
+                return None
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _write(self, sql, rows) -> None:
+        conn = self._connect()
+        conn.executemany(sql, rows)
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self) -> None:
+        if self._conn is not None:
+            if self._used:
+                self._conn.executemany(
+                    "UPDATE messages SET last_used = ? WHERE source = ? AND msg_id = ?",
+                    [(used, source, msg_id) for (source, msg_id), used in self._used.items()],
+                )
+                self._used = {}
+            self._conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "MessageCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def clear(self) -> None:
+        """Forget every cached message and album."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return
+        self._used = {}
+        conn.execute("DELETE FROM messages")
+        conn.execute("DELETE FROM albums")
+        conn.commit()
+
+    def store(self, source_id, message) -> bool:
+        """Cache *message* of *source_id*; returns False if it cannot be serialized."""
+        data = encode_message(message)
+        if data is None:
+            return False
+        now = time.time()
+        self._write(
+            "INSERT OR REPLACE INTO messages (source, msg_id, data, fetched_at, last_used, size) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(cache_key(source_id), message.id, data, now, now, len(data) + ROW_OVERHEAD)],
+        )
+        return True
+
+    def store_album(self, source_id, album) -> bool:
+        """Cache every message of *album* and its membership."""
+        if not all([self.store(source_id, message) for message in album]):
+            return False
+        self._write(
+            "INSERT OR REPLACE INTO albums (source, grouped_id, members, fetched_at) VALUES (?, ?, ?, ?)",
+            [(cache_key(source_id), album[0].grouped_id, json.dumps([m.id for m in album]), time.time())],
+        )
+        return True
+
+    def get(self, source_id, msg_id):
+        """Return the fresh cached message *msg_id* of *source_id*, or None."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return None
+        source = cache_key(source_id)
+        row = conn.execute(
+            "SELECT data FROM messages WHERE source = ? AND msg_id = ? AND fetched_at >= ?",
+            (source, msg_id, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            message = decode_message(row[0])
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable cached message {source}/{msg_id}: {e}", file=sys.stderr)
+            return None
+        self._used[(source, msg_id)] = time.time()
+        return message
+
+    def get_album(self, source_id, grouped_id):
+        """Return the fresh cached messages of album *grouped_id*, or None if any is missing."""
+        conn = self._connect(create=False)
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT members FROM albums WHERE source = ? AND grouped_id = ? AND fetched_at >= ?",
+            (cache_key(source_id), grouped_id, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        album = [self.get(source_id, msg_id) for msg_id in json.loads(row[0])]
+        return None if None in album else album
+
+    def fill(self, item) -> bool:
+        """Set *item*'s message and album from the cache; returns False on a miss."""
+        message = self.get(item.source_id, item.msg_id)
+        if message is None:
+            return False
+        album = None
+        if message.grouped_id:
+            album = self.get_album(item.source_id, message.grouped_id)
+            if album is None:
+                return False
+        if album is not None:
+            # Keep one object per message, as the fetch stage does
+            message = next((m for m in album if m.id == item.msg_id), message)
+        item.message = message
+        item.album = album
+        item.cached = True
+        self.hits += 1
+        return True
+
+    def store_item(self, item) -> bool:
+        """Cache the message and album of a fetched RepostItem; returns False if nothing was stored."""
+        if item.message is None or item.error is not None:
+            return False
+        if item.album:
+            return self.store_album(item.source_id, item.album)
+        return self.store(item.source_id, item.message)
+
+    def evict(self) -> int:
+        """Drop stale entries, then the least recently used ones beyond the size bound.
+
+        Returns the number of messages removed.
+        """
+        conn = self._connect(create=False)
+        if conn is None:
+            return 0
+        self.commit()
+        cutoff = time.time() - self.ttl
+        removed = conn.execute("DELETE FROM messages WHERE fetched_at < ?", (cutoff,)).rowcount
+        conn.execute("DELETE FROM albums WHERE fetched_at < ?", (cutoff,))
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()
+        if total > self.max_bytes:
+            victims = []
+            for source, msg_id, size in conn.execute(
+                "SELECT source, msg_id, size FROM messages ORDER BY last_used, fetched_at"
+            ):
+                if total <= self.max_bytes:
+                    break
+                victims.append((source, msg_id))
+                total -= size
+            conn.executemany("DELETE FROM messages WHERE source = ? AND msg_id = ?", victims)
+            removed += len(victims)
+        conn.commit()
+        return removed
@@ -0,0 +1,325 @@
+"""Counters, gauges and latency histograms for API calls and pipeline stages.
+
+Sleep intervals and session counts used to be tuned by reading log lines.
+:data:`METRICS` is a process-wide registry fed by
+
+* :class:`InstrumentedClient`, which wraps every connected client and counts
+  and times ``get_messages``, ``send_message``, ``send_file``,
+  ``delete_messages``, ``get_entity``, ``get_input_entity``,
+  ``download_media`` and ``upload_file`` calls, and raw requests such as
+  the parts of parallel transfers;
+* the rate limiters, which add up flood waits and the seconds slept for
+  pacing;
+* the repost send stage, which reports the depth of its queue.
+
+:class:`RunSummary` turns what changed during one repost or delete run into a
+JSON summary in ``.state/metrics/`` with the run's throughput.  The registry
+is exported in the Prometheus text format: to the file named by the
+``METRICS_TEXTFILE`` env var after every run (for node_exporter's textfile
+collector), and over HTTP by ``serve --metrics-port``.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+INSTRUMENTED_METHODS = (
+    "get_messages", "send_message", "send_file", "delete_messages", "get_entity", "get_input_entity",
+    "download_media", "upload_file",
+)
+# Upper bounds in seconds of the API latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TEXTFILE_ENV = "METRICS_TEXTFILE"
+SUMMARY_DIRNAME = "metrics"
+
+# name -> (type, help)
+METRIC_INFO = {
+    "telegram_api_calls_total": ("counter", "Telegram API calls by method."),
+    "telegram_api_errors_total": ("counter", "Telegram API calls that raised, by method and error."),
+    "telegram_api_call_seconds": ("histogram", "Telegram API call latency by method."),
+    "flood_waits_total": ("counter", "FloodWait errors by rate-limiter key."),
+    "flood_wait_seconds_total": ("counter", "Seconds of FloodWait requested by Telegram."),
+    "rate_limit_sleep_seconds_total": ("counter", "Seconds slept by the rate limiters, including flood waits."),
+    "pipeline_queue_depth": ("gauge", "Fetched items waiting for the send stage, by destination."),
+    "media_copies_total": ("counter", "Media sent as copies, by where the copy came from: handle, blob or download."),
+    "run_messages_total": ("counter", "Messages reposted or deleted by finished runs."),
+    "run_messages_per_second": ("gauge", "Throughput of the last finished run, by command."),
+}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """In-memory registry of labelled counters, gauges and histograms."""
+
+    def __init__(self):
+        self._values = {}  # (name, label key) -> counter or gauge value
+        self._histograms = {}  # (name, label key) -> Histogram
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        self._values[key] = self._values.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        self._values[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def value(self, name: str, **labels) -> float:
+        return self._values.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self._histograms.get((name, _label_key(labels)))
+
+    def snapshot(self) -> dict:
+        """Return a copy of the counters and histogram totals, for diffing with a later snapshot."""
+        values = {key: value for key, value in self._values.items() if METRIC_INFO.get(key[0], ("",))[0] != "gauge"}
+        for key, histogram in self._histograms.items():
+            values[(key[0] + "_count", key[1])] = histogram.count
+            values[(key[0] + "_sum", key[1])] = histogram.sum
+        return values
+
+    def reset(self) -> None:
+        self._values.clear()
+        self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format."""
+        by_name = {}
+        for (name, key), value in self._values.items():
+            by_name.setdefault(name, []).append((key, value))
+        for (name, key), histogram in self._histograms.items():
+            by_name.setdefault(name, []).append((key, histogram))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = METRIC_INFO.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(by_name[name], key=lambda entry: entry[0]):
+                if isinstance(value, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', bound))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {value.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path) -> None:
+        """Write the Prometheus exposition atomically, as the textfile collector expects."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
+
+
+def limiter_label(key) -> str:
+    """Return the metric label of a rate-limiter key: its first element, e.g. ``send``."""
+    return str(key[0]) if isinstance(key, tuple) and key else str(key)
+
+
+class InstrumentedClient:
+    """Proxy for a connected client that counts and times the API methods it forwards."""
+
+    def __init__(self, client, metrics: Metrics = METRICS):
+        self._client = client
+        self._metrics = metrics
+
+    async def _timed(self, name, fn, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            self._metrics.inc("telegram_api_errors_total", method=name, error=type(e).__name__)
+            raise
+        finally:
+            self._metrics.inc("telegram_api_calls_total", method=name)
+            self._metrics.observe("telegram_api_call_seconds", time.monotonic() - start, method=name)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in INSTRUMENTED_METHODS:
+            return attr
+
+        async def timed(*args, **kwargs):
+            return await self._timed(name, attr, *args, **kwargs)
+
+        return timed
+
+    async def __call__(self, request, *args, **kwargs):
+        """Invoke a raw API *request*, labelled with its type (e.g. ``SaveBigFilePartRequest``)."""
+        return await self._timed(type(request).__name__, self._client, request, *args, **kwargs)
+
+
+def export_textfile(metrics: Metrics = METRICS) -> None:
+    """Write the registry to ``$METRICS_TEXTFILE`` if that env var is set."""
+    path = os.environ.get(TEXTFILE_ENV)
+    if not path:
+        return
+    try:
+        metrics.write_textfile(path)
+    except OSError as e:
+        print(f"[WARN] Could not write metrics textfile {path}: {e}", file=sys.stderr)
+
+
+def _by_label(delta: dict, name: str, label: str) -> Dict[str, float]:
+    totals = {}
+    for (metric, key), value in delta.items():
+        if metric == name:
+            labels = dict(key)
+            totals[labels.get(label, "")] = totals.get(labels.get(label, ""), 0) + value
+    return totals
+
+
+class RunSummary:
+    """Metrics of one command run, from construction until :meth:`finish`."""
+
+    def __init__(self, command: str, metrics: Metrics = METRICS):
+        self.command = command
+        self.metrics = metrics
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self._before = metrics.snapshot()
+
+    def summary(self, messages: int, **extra) -> dict:
+        seconds = time.monotonic() - self._start
+        after = self.metrics.snapshot()
+        delta = {key: value - self._before.get(key, 0) for key, value in after.items()}
+        delta = {key: value for key, value in delta.items() if value}
+        calls = _by_label(delta, "telegram_api_calls_total", "method")
+        call_seconds = _by_label(delta, "telegram_api_call_seconds_sum", "method")
+        errors = _by_label(delta, "telegram_api_errors_total", "method")
+        return {
+            "command": self.command,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "messages": messages,
+            "messages_per_second": round(messages / seconds, 2) if seconds > 0 else None,
+            "api_calls": {
+                method: {
+                    "count": int(count),
+                    "seconds": round(call_seconds.get(method, 0.0), 3),
+                    "errors": int(errors.get(method, 0)),
+                }
+                for method, count in sorted(calls.items())
+            },
+            "api_calls_per_message": round(sum(calls.values()) / messages, 3) if messages else None,
+            "flood_waits": {
+                key: {"count": int(count), "seconds": _by_label(delta, "flood_wait_seconds_total", "key").get(key, 0)}
+                for key, count in sorted(_by_label(delta, "flood_waits_total", "key").items())
+            },
+            "rate_limit_sleep_seconds": {
+                key: round(seconds, 3)
+                for key, seconds in sorted(_by_label(delta, "rate_limit_sleep_seconds_total", "key").items())
+            },
+            **extra,
+        }
+
+    def finish(self, messages: int, **extra) -> dict:
+        """Record the run's throughput, write its JSON summary and export the textfile."""
+        from .utils_files import state_dir  # local import to avoid top-level cycle
+
+        summary = self.summary(messages, **extra)
+        self.metrics.inc("run_messages_total", messages, command=self.command)
+        if summary["messages_per_second"] is not None:
+            self.metrics.set_gauge("run_messages_per_second", summary["messages_per_second"], command=self.command)
+
+        directory = state_dir() / SUMMARY_DIRNAME
+        stem = f"{self.started_at:%Y%m%d_%H%M%S}_{self.command}"
+        path = directory / f"{stem}.json"
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            # Runs started in the same second get numbered names instead of overwriting each other
+            for n in itertools.count(2):
+                try:
+                    f = open(path, "x", encoding="utf-8")
+                    break
+                except FileExistsError:
+                    path = directory / f"{stem}_{n}.json"
+            with f:
+                json.dump(summary, f, indent=1)
+        except OSError as e:
+            print(f"[WARN] Could not write run summary {path}: {e}", file=sys.stderr)
+        else:
+            print(
+                f"[INFO] {self.command}: {messages} messages in {summary['seconds']}s; summary in {path}.",
+                file=sys.stderr,
+            )
+        export_textfile(self.metrics)
+        return summary
+
+
+async def serve_metrics(port: int, host: str = "0.0.0.0", metrics: Metrics = METRICS):
+    """Serve the registry at ``http://host:port/metrics``; returns the started server."""
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Drain the request headers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", metrics.render_prometheus().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
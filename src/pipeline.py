@@ -0,0 +1,662 @@
+"""Fetch stage of the repost pipeline.
+
+``repost_from_file`` runs as a producer/consumer pair: :func:`produce_items`
+parses source URLs, fetches their messages (in batches of up to 100 IDs per
+channel) and resolves albums ahead of time, feeding :class:`RepostItem`
+objects into a bounded :class:`asyncio.Queue` in input order.  The sender
+drains the queue under the rate limiter, so fetch latency overlaps with the
+mandatory delay between sends instead of adding to it.
+
+Besides one URL per message, the input may hold message ranges
+(``https://t.me/chan/100-5000``) and whole channels (``https://t.me/chan``),
+optionally bounded by a :class:`HistoryFilter`.  Those are read with
+``iter_messages`` oldest first, 100 messages per request, and albums are
+grouped from consecutive messages as they stream past, with no window
+fetches.  A :class:`SourceQuery` in the URL's query string
+(``https://t.me/chan?type=photo&search=cats``) is pushed down to Telegram's
+message search, so only matching messages are downloaded.
+"""
+
+import asyncio
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from .entity_cache import cache_key, is_stale_peer_error
+from .rate_limit import flood_wait_seconds
+from .urls import dest_message_url, parse_history_url, parse_telegram_url, to_entity_id
+
+# Telegram returns at most 100 messages per messages.getMessages / channels.getMessages request
+GET_MESSAGES_BATCH_SIZE = 100
+
+
+def iter_chunks(items, size):
+    """Yield consecutive slices of *items* holding at most *size* elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _as_message_list(result):
+    """Normalize a get_messages() result (list, single message or None) to a list."""
+    if result is None:
+        return []
+    if isinstance(result, (list, tuple)):
+        return list(result)
+    return [result]
+
+
+async def fetch_messages(client, source_id, ids, entity_cache=None, limiter=None):
+    """Call get_messages for *source_id*, addressing it through a cached input peer if possible.
+
+    A cached peer that Telegram rejects is invalidated and the call is retried with the raw ID.
+    Peers learned from the returned messages are recorded in *entity_cache*.  When *limiter* is
+    given, calls are paced per source and retried after flood waits.
+    """
+    async def get_messages(target):
+        if limiter is None:
+            return await client.get_messages(target, ids=ids)
+        return await limiter.call(("get_messages", source_id), lambda: client.get_messages(target, ids=ids))
+
+    peer = entity_cache.lookup(source_id) if entity_cache is not None else None
+    if peer is not None:
+        try:
+            return await get_messages(peer)
+        except Exception as e:
+            if not is_stale_peer_error(e):
+                raise
+            entity_cache.invalidate(source_id)
+    result = await get_messages(source_id)
+    if entity_cache is not None:
+        for message in _as_message_list(result):
+            if message is not None:
+                entity_cache.remember(source_id, getattr(message, 'input_chat', None))
+                break
+    return result
+
+
+async def prefetch_messages(client, refs, batch_size=GET_MESSAGES_BATCH_SIZE, entity_cache=None, limiter=None):
+    """Fetch the messages referenced by *refs* (``(source_id, msg_id)`` pairs) in batches.
+
+    IDs are grouped per source channel and requested up to *batch_size* at a time, so N URLs from
+    one channel cost ``ceil(N / batch_size)`` round trips instead of N; distinct channels are fetched
+    concurrently.  Returns a dict mapping each
+    ``(source_id, msg_id)`` to the fetched message, or to the exception raised while fetching its
+    batch.  Messages Telegram did not return are simply absent from the dict.
+    """
+    ids_by_source = {}
+    for source_id, msg_id in refs:
+        # dict keeps first-seen order while dropping duplicate IDs
+        ids_by_source.setdefault(source_id, {})[msg_id] = None
+
+    fetched = {}
+
+    async def fetch_source(source_id, ids):
+        for chunk in iter_chunks(list(ids), batch_size):
+            try:
+                result = await fetch_messages(client, source_id, chunk, entity_cache, limiter)
+            except Exception as e:
+                print(f"[WARN] Failed to fetch {len(chunk)} messages from {source_id}: {e}", file=sys.stderr)
+                for msg_id in chunk:
+                    fetched[(source_id, msg_id)] = e
+                continue
+            requested = set(chunk)
+            for message in _as_message_list(result):
+                if message is not None and getattr(message, 'id', None) in requested:
+                    fetched[(source_id, message.id)] = message
+
+    # Different source channels are fetched concurrently
+    await asyncio.gather(*(fetch_source(source_id, ids) for source_id, ids in ids_by_source.items()))
+    return fetched
+
+
+# Number of fetched items that may wait for the sender before fetching pauses
+PIPELINE_QUEUE_SIZE = 2 * GET_MESSAGES_BATCH_SIZE
+
+
+class FanOut:
+    """Queue-like sink that hands every item to several queues, one per destination.
+
+    Items are shared, not copied; consumers must treat them as read-only.  A full
+    queue blocks the producer, so the slowest destination sets the read-ahead pace.
+    """
+
+    def __init__(self, queues):
+        self.queues = list(queues)
+
+    async def put(self, item) -> None:
+        for queue in self.queues:
+            await queue.put(item)
+
+
+@dataclass
+class RepostItem:
+    """One source URL travelling from the fetch stage to the send stage."""
+
+    index: int
+    url: str
+    channel: Optional[str] = None
+    msg_id: Optional[int] = None
+    source_id: Any = None
+    message: Any = None  # fetched source message, None if Telegram did not return it
+    album: Optional[List[Any]] = None  # all messages of the album, sorted by ID
+    album_duplicate: bool = False  # album already queued for an earlier input URL
+    error: Optional[BaseException] = None  # error raised while fetching
+    cached: bool = False  # message and album were read from the message cache
+    mark_key: Optional[str] = None  # high-water mark key of its range or whole-channel source
+
+    @property
+    def valid(self) -> bool:
+        return self.channel is not None
+
+
+# Telegram albums hold at most 10 messages with consecutive IDs
+MAX_ALBUM_SIZE = 10
+# IDs probed per direction each time an album's boundary is still unknown
+ALBUM_WINDOW_STEP = 5
+# Fetched messages remembered per source channel for album resolution
+ALBUM_CACHE_SIZE = 5 * GET_MESSAGES_BATCH_SIZE
+# Resolved and queued albums remembered per run; input URLs pointing into an album
+# further back than that are sent again
+RECENT_ALBUMS = 10 * GET_MESSAGES_BATCH_SIZE
+
+
+class RecentAlbums:
+    """The ``RECENT_ALBUMS`` most recently used ``(source_id, grouped_id)`` keys and their values."""
+
+    def __init__(self, keys=(), maxsize=RECENT_ALBUMS):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return value
+
+    def add(self, key, value=None) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class AlbumResolver:
+    """Finds the exact members of albums, reusing everything already fetched.
+
+    Messages seen by the batch prefetch (and by earlier album lookups) are cached per
+    source channel, so neighbours listed in the input cost nothing.  Around a grouped
+    message the window grows ``ALBUM_WINDOW_STEP`` IDs at a time, only in directions
+    whose group boundary has not been found yet.  Recently resolved albums are kept per
+    ``(source_id, grouped_id)`` so every member of an album maps to the same result.
+    """
+
+    def __init__(self, client, entity_cache=None, limiter=None):
+        self.client = client
+        self.entity_cache = entity_cache
+        self.limiter = limiter
+        self._known = {}  # source_id -> OrderedDict(msg_id -> message or None if missing)
+        self._albums = RecentAlbums()  # (source_id, grouped_id) -> sorted album messages
+
+    def seed(self, source_id, msg_id, message) -> None:
+        """Record a fetched message (None: Telegram returned nothing for *msg_id*)."""
+        known = self._known.setdefault(source_id, OrderedDict())
+        known[msg_id] = message
+        known.move_to_end(msg_id)
+        while len(known) > ALBUM_CACHE_SIZE:
+            known.popitem(last=False)
+
+    async def _fetch(self, source_id, ids) -> None:
+        result = await fetch_messages(self.client, source_id, ids, self.entity_cache, self.limiter)
+        returned = {m.id: m for m in _as_message_list(result) if m is not None}
+        for msg_id in ids:
+            self.seed(source_id, msg_id, returned.get(msg_id))
+
+    async def resolve(self, source_id, message):
+        """Return the messages sharing *message*'s grouped_id, sorted by ID."""
+        grouped_id = message.grouped_id
+        album = self._albums.get((source_id, grouped_id))
+        if album is not None:
+            return album
+
+        self.seed(source_id, message.id, message)
+        known = self._known[source_id]
+
+        def in_group(msg_id):
+            return getattr(known.get(msg_id), 'grouped_id', None) == grouped_id
+
+        lo = hi = message.id
+        lo_done = hi_done = False
+        while True:
+            # Walk outwards over what is already known
+            while not lo_done and lo - 1 in known:
+                if in_group(lo - 1):
+                    lo -= 1
+                else:
+                    lo_done = True
+            while not hi_done and hi + 1 in known:
+                if in_group(hi + 1):
+                    hi += 1
+                else:
+                    hi_done = True
+            room = MAX_ALBUM_SIZE - (hi - lo + 1)
+            if room <= 0:
+                lo_done = hi_done = True
+            if lo_done and hi_done:
+                break
+            # Grow the window only where the boundary is still unknown
+            step = min(ALBUM_WINDOW_STEP, room)
+            ids = []
+            if not lo_done:
+                ids += [i for i in range(lo - step, lo) if i > 0 and i not in known]
+                if lo - 1 <= 0:
+                    lo_done = True
+            if not hi_done:
+                ids += [i for i in range(hi + 1, hi + 1 + step) if i not in known]
+            if ids:
+                await self._fetch(source_id, ids)
+
+        album = [known[i] for i in range(lo, hi + 1)]
+        self._albums.add((source_id, grouped_id), album)
+        return album
+
+
+async def refetch_item(client, item, entity_cache=None, limiter=None) -> RepostItem:
+    """Return a copy of *item* whose message (and album) were fetched through *client*.
+
+    Media references are bound to the account that fetched them, so an item fetched by one
+    session must be fetched again before another session can send it.
+    """
+    ids = [m.id for m in item.album] if item.album else [item.msg_id]
+    result = await fetch_messages(client, item.source_id, ids, entity_cache, limiter)
+    by_id = {m.id: m for m in _as_message_list(result) if m is not None}
+    album = [by_id[i] for i in ids if i in by_id] if item.album else None
+    return replace(item, message=by_id.get(item.msg_id), album=album, cached=False)
+
+
+def make_item(index, url) -> RepostItem:
+    """Parse *url* into a RepostItem (``valid`` is False for unparseable URLs)."""
+    channel, msg_id = parse_telegram_url(url)
+    if not (channel and msg_id):
+        return RepostItem(index, url)
+    return RepostItem(index, url, channel, msg_id, to_entity_id(channel))
+
+
+@dataclass(frozen=True)
+class HistoryFilter:
+    """Bounds applied to range and whole-channel sources (single message URLs are not filtered)."""
+
+    since_id: Optional[int] = None  # first message ID to include
+    until_id: Optional[int] = None  # last message ID to include
+    since_date: Optional[datetime] = None  # include messages posted at or after this time
+
+    def id_bounds(self, first_id=None, last_id=None):
+        """Return the exclusive ``(min_id, max_id)`` of a source spanning *first_id*..*last_id*."""
+        lows = [i for i in (first_id, self.since_id) if i is not None]
+        highs = [i for i in (last_id, self.until_id) if i is not None]
+        return (max(lows) - 1 if lows else 0), (min(highs) + 1 if highs else 0)
+
+    @property
+    def lower_bounded(self) -> bool:
+        """True if sources are read from a given message or date on, not from their start."""
+        return self.since_id is not None or self.since_date is not None
+
+
+# Telegram returns at most 100 messages per messages.search request
+SEARCH_PAGE_SIZE = 100
+# Query source ``type`` values and the Telegram search filters they map to
+QUERY_TYPES = {
+    'photo': 'InputMessagesFilterPhotos',
+    'video': 'InputMessagesFilterVideo',
+    'photo_video': 'InputMessagesFilterPhotoVideo',
+    'document': 'InputMessagesFilterDocument',
+    'audio': 'InputMessagesFilterMusic',
+    'voice': 'InputMessagesFilterVoice',
+    'round': 'InputMessagesFilterRoundVideo',
+    'gif': 'InputMessagesFilterGif',
+    'url': 'InputMessagesFilterUrl',
+}
+
+
+def _later(a: Optional[datetime], b: Optional[datetime]) -> Optional[datetime]:
+    # Naive datetimes are local time, as Telethon reads them
+    if a is None or b is None:
+        return a or b
+    return a if a.timestamp() >= b.timestamp() else b
+
+
+@dataclass(frozen=True)
+class SourceQuery:
+    """Server-side filters of a range or whole-channel source, from its URL query string.
+
+    ``https://t.me/chan?type=photo&search=cats&from=@alice&since=2024-01-01&until=2024-02-01``
+    reads only the photos of ``chan`` posted by ``@alice`` in January 2024 whose text matches
+    ``cats``.  *type*, *search* and *from_user* become the ``filter``, ``q`` and ``from_id``
+    of a ``messages.search`` request, and the dates its ``min_date`` and ``max_date``.
+    Reading also stops at the first message posted at or after *until_date*.
+    """
+
+    type: Optional[str] = None
+    search: Optional[str] = None
+    from_user: Optional[str] = None
+    since_date: Optional[datetime] = None
+    until_date: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, query: str) -> 'SourceQuery':
+        """Parse a URL query string; raises ValueError for unknown keys, types or dates."""
+        fields = {}
+        names = {'type': 'type', 'search': 'search', 'from': 'from_user', 'since': 'since_date', 'until': 'until_date'}
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            if key not in names:
+                raise ValueError(f"unknown query parameter {key!r}; expected one of {', '.join(names)}")
+            if not value:
+                raise ValueError(f"query parameter {key!r} is empty")
+            fields[names[key]] = value
+        if 'type' in fields and fields['type'] not in QUERY_TYPES:
+            raise ValueError(f"unknown type {fields['type']!r}; expected one of {', '.join(QUERY_TYPES)}")
+        for name in ('since_date', 'until_date'):
+            if name in fields:
+                fields[name] = datetime.fromisoformat(fields[name])
+        return cls(**fields)
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, name) is not None for name in self.__dataclass_fields__)
+
+    def canonical(self) -> str:
+        """Return the query string in a stable form, '' if there are no filters."""
+        values = (
+            ('type', self.type), ('search', self.search), ('from', self.from_user),
+            ('since', self.since_date and self.since_date.isoformat()),
+            ('until', self.until_date and self.until_date.isoformat()),
+        )
+        return urlencode([(key, value) for key, value in values if value is not None])
+
+    @property
+    def filtered(self) -> bool:
+        """True if the source needs Telegram's search rather than a plain history read."""
+        return any(value is not None for value in (self.type, self.search, self.from_user))
+
+    def search_request(self, entity, after: int, since_date=None, until_date=None):
+        """Return the ``messages.search`` request for the page of matches after message *after*.
+
+        A negative ``add_offset`` of a whole page makes Telegram return the matches from
+        ``offset_id`` on, so pages are read oldest first.
+        """
+        from telethon.tl import functions, types
+
+        message_filter = getattr(types, QUERY_TYPES[self.type])() if self.type else types.InputMessagesFilterEmpty()
+        return functions.messages.SearchRequest(
+            peer=entity, q=self.search or '', filter=message_filter, min_date=since_date, max_date=until_date,
+            offset_id=after + 1, add_offset=-SEARCH_PAGE_SIZE, limit=SEARCH_PAGE_SIZE, max_id=0, min_id=0, hash=0,
+            from_id=self.from_user,
+        )
+
+
+def mark_key(channel, query: Optional[SourceQuery] = None) -> str:
+    """Return the high-water mark key of a source: its channel, plus its query if filtered."""
+    canonical = query.canonical() if query else ''
+    return cache_key(f'{channel}?{canonical}' if canonical else channel)
+
+
+async def iter_search(client, entity, query, after=0, since_date=None):
+    """Yield the messages of *entity* matching the :class:`SourceQuery` *query* after *after*, oldest first.
+
+    ``iter_messages`` turns its offset date into the search's upper date bound, so the
+    search requests are sent directly, with both date bounds.
+    """
+    from telethon import utils
+    from telethon.tl import types
+
+    while True:
+        result = await client(query.search_request(entity, after, since_date, query.until_date))
+        entities = {utils.get_peer_id(x): x for x in [*result.users, *result.chats]}
+        page = sorted(
+            (m for m in result.messages if not isinstance(m, types.MessageEmpty) and m.id > after),
+            key=lambda m: m.id,
+        )
+        for message in page:
+            if isinstance(message, types.Message):
+                # As iter_messages does, so the message can be sent and resolved like any other
+                message._finish_init(client, entities, entity)
+            after = message.id
+            yield message
+        if not page or len(result.messages) < SEARCH_PAGE_SIZE:
+            return
+
+
+async def iter_history(client, source_id, min_id=0, max_id=0, since_date=None, entity_cache=None, query=None):
+    """Yield the messages of *source_id* with ``min_id < id < max_id`` (0: unbounded), oldest first.
+
+    Pages come from ``iter_messages``, or from Telegram's search if the :class:`SourceQuery`
+    *query* filters them; after a flood wait the iteration resumes after the last message
+    yielded.  A search carries both date bounds; a history read checks them locally.
+    """
+    query = query or SourceQuery()
+    since_date = _later(since_date, query.since_date)
+    since = until = None
+    if not query.filtered:
+        since = since_date.timestamp() if since_date is not None else None
+        until = query.until_date.timestamp() if query.until_date is not None else None
+    cursor = min_id
+    while True:
+        entity = await entity_cache.resolve(client, source_id) if entity_cache is not None else source_id
+        if query.filtered:
+            messages = iter_search(client, entity, query, cursor, since_date)
+        else:
+            # Read oldest first, a history request's offset date is a lower bound
+            messages = client.iter_messages(
+                entity, reverse=True, min_id=cursor, max_id=max_id, offset_date=since_date, wait_time=0,
+            )
+        try:
+            async for message in messages:
+                if max_id and message.id >= max_id:
+                    return
+                date = getattr(message, 'date', None)
+                if until is not None and date is not None and date.timestamp() >= until:
+                    return
+                cursor = message.id
+                # Telegram gives min_id precedence over the offset date; skip what it let through
+                if since is not None and date is not None and date.timestamp() < since:
+                    continue
+                yield message
+            return
+        except Exception as e:
+            seconds = flood_wait_seconds(e)
+            if seconds is None:
+                raise
+            print(f"[WARN] Flood wait of {seconds}s while reading {source_id}; resuming after {cursor}.", file=sys.stderr)
+            await asyncio.sleep(seconds)
+
+
+async def history_items(
+    client, channel, first_id, last_id, history, start_index, entity_cache=None, after=None, query=None,
+):
+    """Yield RepostItems for the messages of a range or whole-channel source, oldest first.
+
+    Only messages matching the :class:`SourceQuery` *query* are read.  With *after*, only
+    messages with a higher ID are read (the source's high-water mark).  An album only partly
+    matching *query* is sent with its matching members.
+    Consecutive messages sharing a grouped_id form an album: the first one carries the album,
+    the others are marked as duplicates.  An album is yielded once its last member has been read.
+    """
+    source_id = to_entity_id(channel)
+    min_id, max_id = history.id_bounds(first_id, last_id)
+    if after is not None:
+        min_id = max(min_id, after)
+    key = mark_key(channel, query)
+    index = start_index
+    pending = []  # items of the album being collected
+    async for message in iter_history(client, source_id, min_id, max_id, history.since_date, entity_cache, query):
+        grouped_id = getattr(message, 'grouped_id', None)
+        if pending and grouped_id != pending[0].message.grouped_id:
+            for item in pending:
+                yield item
+            pending = []
+        item = RepostItem(
+            index, dest_message_url(channel, message.id), channel, message.id, source_id, message, mark_key=key,
+        )
+        index += 1
+        if not grouped_id:
+            yield item
+        elif pending:
+            item.album_duplicate = True
+            pending[0].album.append(message)
+            pending.append(item)
+        else:
+            item.album = [message]
+            pending.append(item)
+    for item in pending:
+        yield item
+
+
+async def _fill_window(client, items, albums, queued_albums, entity_cache, limiter, message_cache=None):
+    if message_cache is not None:
+        for item in items:
+            if item.valid:
+                message_cache.fill(item)
+    refs = [(item.source_id, item.msg_id) for item in items if item.valid and not item.cached]
+    prefetched = await prefetch_messages(client, refs, entity_cache=entity_cache, limiter=limiter)
+    for ref in refs:
+        fetched = prefetched.get(ref)
+        if not isinstance(fetched, Exception):
+            albums.seed(*ref, fetched)
+
+    for item in items:
+        if not item.valid:
+            continue
+        if not item.cached:
+            fetched = prefetched.get((item.source_id, item.msg_id))
+            if isinstance(fetched, Exception):
+                item.error = fetched
+                continue
+            item.message = fetched
+        grouped_id = getattr(item.message, 'grouped_id', None)
+        if grouped_id:
+            # Several input URLs may point into the same album: send it only once
+            if (item.source_id, grouped_id) in queued_albums:
+                queued_albums.add((item.source_id, grouped_id))
+                item.album_duplicate = True
+                item.album = None
+                continue
+            if item.album is None:
+                try:
+                    item.album = await albums.resolve(item.source_id, item.message)
+                except Exception as e:
+                    item.error = e
+                    continue
+            queued_albums.add((item.source_id, grouped_id))
+
+
+async def produce_items(
+    client,
+    urls,
+    queue,
+    entity_cache=None,
+    limiter=None,
+    window=GET_MESSAGES_BATCH_SIZE,
+    completed=None,
+    sent_albums=None,
+    message_cache=None,
+    history=None,
+    marks=None,
+):
+    """Fetch stage: turn *urls* into fetched RepostItems on *queue*, in input order.
+
+    URLs are consumed lazily, *window* at a time, so at most one window plus the queue
+    contents are held in memory.  Range and whole-channel URLs expand into one item per
+    message (see :func:`history_items`), bounded by the :class:`HistoryFilter` *history*;
+    item indices count the expanded messages.  A whole channel without a lower bound, a
+    query or *marks* is an invalid item.  Their URLs may carry a :class:`SourceQuery`
+    (``?type=photo&search=…``) that is pushed down to Telegram's search.  *marks*, if given,
+    maps a source's :func:`mark_key` to the last message already mirrored from it (or None);
+    such sources are read after it.
+    A ``None`` sentinel is queued once the input is exhausted (or fetching failed, in which
+    case the error is re-raised after the sentinel).
+
+    *completed* maps input indices finished by an interrupted run to their URL; those entries
+    are neither fetched nor queued.  *sent_albums* lists ``(source_id, grouped_id)`` pairs that
+    were already sent, so later members of those albums are collapsed too.  Only the
+    ``RECENT_ALBUMS`` most recently queued albums are remembered.
+
+    With a *message_cache* (see :mod:`src.message_cache`), messages and albums found there are
+    not fetched again.
+    """
+    completed = completed or {}
+    albums = AlbumResolver(client, entity_cache, limiter)
+    queued_albums = RecentAlbums(sent_albums or ())
+    history = history or HistoryFilter()
+
+    async def flush(batch):
+        items = [make_item(index, url) for index, url in batch if completed.get(index) != url]
+        await _fill_window(client, items, albums, queued_albums, entity_cache, limiter, message_cache)
+        for item in items:
+            await queue.put(item)
+
+    try:
+        index = 0
+        batch = []
+        for url in urls:
+            base, _, query_string = url.strip().partition('?')
+            source = parse_history_url(base)
+            if source is None:
+                batch.append((index, url))
+                index += 1
+                if len(batch) >= window:
+                    await flush(batch)
+                    batch = []
+                continue
+            # Keep input order: URLs before the range are queued first
+            await flush(batch)
+            batch = []
+            try:
+                query = SourceQuery.parse(query_string)
+            except ValueError as e:
+                print(f"[ERROR] Invalid source query in {url.strip()}: {e}", file=sys.stderr)
+                await queue.put(RepostItem(index, url))
+                index += 1
+                continue
+            if source[1] is None and not (query or history.lower_bounded or marks is not None):
+                # A stray channel link must not repost a channel's entire history
+                print(
+                    f"[ERROR] {url.strip()} is a whole channel; bound it with --since-id, --since-date, "
+                    f"a query or --incremental.",
+                    file=sys.stderr,
+                )
+                await queue.put(RepostItem(index, url))
+                index += 1
+                continue
+            after = marks(mark_key(source[0], query)) if marks is not None else None
+            try:
+                async for item in history_items(client, *source, history, index, entity_cache, after, query):
+                    index = item.index + 1
+                    if completed.get(item.index) == item.url:
+                        continue
+                    if item.album:
+                        album_key = (item.source_id, item.message.grouped_id)
+                        if album_key in queued_albums:
+                            item.album, item.album_duplicate = None, True
+                        queued_albums.add(album_key)
+                    await queue.put(item)
+            except Exception as e:
+                # Like an invalid URL: the run goes on and exits with an error status at the end
+                print(f"[ERROR] Could not read {url.strip()}: {e}", file=sys.stderr)
+                await queue.put(RepostItem(index, url))
+                index += 1
+        await flush(batch)
+    except asyncio.CancelledError:
+        raise
+    except BaseException:
+        await queue.put(None)
+        raise
+    await queue.put(None)
@@ -0,0 +1,68 @@
+"""``prefetch``: fetch source messages ahead of a scheduled ``repost``.
+
+:func:`prefetch` runs the fetch stage of the repost pipeline (batched
+``get_messages`` plus album resolution) over a source URL file and stores the
+messages and albums in the session's :class:`~src.message_cache.MessageCache`.
+A later ``repost`` of the same list through the same session then reads them
+from the cache, so its publishing window is spent sending.
+"""
+
+import asyncio
+import os
+import sys
+
+from .entity_cache import EntityCache
+from .message_cache import MessageCache, message_cache_path
+from .metrics import RunSummary
+from .pipeline import PIPELINE_QUEUE_SIZE, produce_items
+from .rate_limit import RateLimiter
+from .reposter import get_data_dirs, open_client
+from .session_pool import DEFAULT_SESSION, entity_cache_path
+from .utils_files import iter_url_lines
+
+
+async def prefetch(source=None, session_name=DEFAULT_SESSION, client=None, history=None):
+    """Fetch the messages listed in *source* through *session_name* and cache them.
+
+    Range and whole-channel sources are bounded by the :class:`HistoryFilter` *history*.
+    Returns the number of messages stored.  Messages that cannot be fetched are
+    reported and left to ``repost``, which fetches whatever the cache misses.
+    """
+    input_dir, _ = get_data_dirs()
+    input_file = source or os.path.join(input_dir, "source_urls.txt")
+    if input_file != "-" and not os.path.exists(input_file):
+        print(f"Input file {input_file} does not exist.", file=sys.stderr)
+        sys.exit(1)
+
+    run_summary = RunSummary("prefetch")
+    entity_cache = EntityCache(entity_cache_path(session_name))
+    stored = missing = failed = 0
+    with MessageCache(message_cache_path(session_name)) as message_cache:
+        async with open_client(client, session_name=session_name) as client:
+            queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            producer = asyncio.create_task(produce_items(
+                client, iter_url_lines(input_file), queue, entity_cache=entity_cache, limiter=RateLimiter(0),
+                history=history,
+            ))
+            while (item := await queue.get()) is not None:
+                if not item.valid:
+                    print(f"Invalid Telegram message URL: {item.url}", file=sys.stderr)
+                elif item.error is not None:
+                    print(f"Error fetching message {item.msg_id} from {item.channel}: {item.error}", file=sys.stderr)
+                    failed += 1
+                elif item.message is None:
+                    print(f"Could not find message with ID {item.msg_id} in {item.channel}.")
+                    missing += 1
+                elif not item.album_duplicate and message_cache.store_item(item):
+                    stored += len(item.album or [item.message])
+            await producer
+        evicted = message_cache.evict()
+    entity_cache.save()
+
+    print(f"Cached {stored} messages in {message_cache.path}.", file=sys.stderr)
+    if missing or failed:
+        print(f"[WARN] {missing} messages not found and {failed} failed to fetch; repost will fetch them.", file=sys.stderr)
+    if evicted:
+        print(f"[INFO] Evicted {evicted} stale or least recently used cached messages.", file=sys.stderr)
+    run_summary.finish(stored, evicted=evicted)
+    return stored
@@ -0,0 +1,152 @@
+"""FloodWait-aware adaptive rate limiting for Telegram API calls.
+
+Each limiter key (typically ``(method, destination)``) gets its own single-token
+bucket: a call may start once ``interval`` seconds have passed since the
+previous one.  The interval starts at the configured sleep interval and adapts:
+
+* on ``FloodWaitError`` the key is blocked for exactly the server-reported
+  number of seconds, its interval is multiplied by ``backoff`` (bounded by
+  ``max_interval``) and the call is retried;
+* after ``recover_after`` consecutive successes the interval shrinks by
+  ``recovery`` again, never below ``min_interval``.
+
+``min_interval`` defaults to the configured interval, so without flood waits the
+pacing is exactly the fixed ``--sleep`` behaviour.  Pass a lower ``--min-sleep``
+to let the limiter probe for a faster rate, and ``--max-sleep`` to cap backoff.
+
+With ``max_wait`` set, a flood wait longer than that is not slept out: the key
+is still blocked, but the error is re-raised so a caller with other accounts
+(see :mod:`src.session_pool`) can move the work instead of idling.
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .metrics import METRICS, limiter_label
+
+# Interval used after the first flood wait when the configured interval is 0
+MIN_BACKOFF_INTERVAL = 0.5
+
+
+def flood_wait_seconds(exc: BaseException) -> Optional[int]:
+    """Return the wait Telegram asked for if *exc* is a flood/slow-mode wait, else None."""
+    from telethon import errors
+
+    if isinstance(exc, (errors.FloodWaitError, errors.SlowModeWaitError)):
+        return exc.seconds
+    return None
+
+
+@dataclass
+class _Bucket:
+    interval: float
+    next_at: float = 0.0
+    successes: int = 0
+
+
+class RateLimiter:
+    """Per-key token bucket that backs off on FloodWait and slowly ramps back up."""
+
+    def __init__(
+        self,
+        interval: float,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        backoff: float = 2.0,
+        recovery: float = 0.9,
+        recover_after: int = 10,
+        max_retries: int = 5,
+        max_wait: Optional[float] = None,
+    ):
+        self.interval = interval
+        self.min_interval = interval if min_interval is None else min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.recovery = recovery
+        self.recover_after = recover_after
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self._buckets = {}
+
+    def _bucket(self, key) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.interval)
+        return bucket
+
+    def current_interval(self, key) -> float:
+        """Return the interval currently enforced for *key*."""
+        return self._bucket(key).interval
+
+    async def acquire(self, key) -> None:
+        """Reserve the next slot for *key*, then wait until it comes.
+
+        The slot is reserved before sleeping, so concurrent callers on one key queue up
+        one interval apart instead of waking together.
+        """
+        bucket = self._bucket(key)
+        now = time.monotonic()
+        start = max(bucket.next_at, now)
+        bucket.next_at = start + bucket.interval
+        delay = start - now
+        if delay > 0:
+            METRICS.inc("rate_limit_sleep_seconds_total", delay, key=limiter_label(key))
+            await asyncio.sleep(delay)
+
+    def on_success(self, key) -> None:
+        """Record a successful call; ramp the rate back up after a streak of successes."""
+        bucket = self._bucket(key)
+        bucket.successes += 1
+        if bucket.successes >= self.recover_after and bucket.interval > self.min_interval:
+            bucket.interval = max(self.min_interval, bucket.interval * self.recovery)
+            bucket.successes = 0
+
+    def on_flood(self, key, seconds: float) -> None:
+        """Block *key* for exactly *seconds* and slow its pacing down."""
+        bucket = self._bucket(key)
+        bucket.successes = 0
+        METRICS.inc("flood_waits_total", key=limiter_label(key))
+        METRICS.inc("flood_wait_seconds_total", seconds, key=limiter_label(key))
+        interval = max(bucket.interval * self.backoff, MIN_BACKOFF_INTERVAL)
+        if self.max_interval is not None:
+            interval = min(interval, max(self.max_interval, self.min_interval))
+        bucket.interval = interval
+        # The retry waits exactly as long as the server asked for
+        bucket.next_at = time.monotonic() + seconds
+
+    async def call(self, key, fn):
+        """Await ``fn()`` under the limit for *key*, retrying after flood waits."""
+        attempt = 0
+        while True:
+            await self.acquire(key)
+            try:
+                result = await fn()
+            except Exception as e:
+                seconds = flood_wait_seconds(e)
+                if seconds is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.on_flood(key, seconds)
+                if self.max_wait is not None and seconds > self.max_wait:
+                    raise
+                print(
+                    f"[WARN] Flood wait of {seconds}s on {key}; retrying "
+                    f"({attempt}/{self.max_retries}) at {self.current_interval(key):.2f}s spacing.",
+                    file=sys.stderr,
+                )
+                continue
+            self.on_success(key)
+            return result
+
+
+async def unpaced_call(key, fn):
+    """Await ``fn()`` outside the paced send and read paths, sleeping out its flood waits.
+
+    Clients are opened with ``flood_sleep_threshold=0`` so the paced paths see every flood
+    wait; entity lookups, media transfers and handle refreshes go through here instead.
+    No spacing is added and no state is kept between calls.
+    """
+    return await RateLimiter(0, max_interval=0).call(key, fn)
@@ -0,0 +1,170 @@
+"""Cross-run index of which source message produced which destination message.
+
+Re-running ``repost`` over the same source list used to send everything
+again, spending sends, uploads and flood budget on posts that were already
+live.  :class:`RepostIndex` keeps one row per destination message in
+``.state/repost_index.sqlite``:
+
+* the destination (as an :func:`~src.entity_cache.cache_key`),
+* the source message it was copied from (``channel/msg_id``; every member of
+  an album maps to all of the album's destination messages),
+* a content hash of the source text and media, so edited posts are sent
+  again,
+* and the run that *owns* the destination message (``{publish_ts}_{slug}``,
+  the stem of the run file).
+
+``repost`` looks entries up before sending.  On a hit it reuses the
+destination messages: their URLs go into the new run file and ownership moves
+to the new run.  Indexed messages are checked to still exist first, in
+batches of ``LIVENESS_BATCH`` IDs; a copy deleted by hand is forgotten and
+sent again.  ``delete`` only deletes destination messages owned by the
+run being deleted (or not indexed at all), so tagging and deleting the
+previous run never removes posts the current run reused, and it forgets the
+messages it deleted.  ``--force`` sends everything again regardless.
+
+Writes are committed every ``COMMIT_EVERY`` operations and when the index is
+closed.  A resumed repost run claims the messages in its journal again, so
+claims lost in a crash are restored before the previous run can be deleted.
+"""
+
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+from .entity_cache import cache_key
+from .utils_files import state_dir
+
+INDEX_FILENAME = "repost_index.sqlite"
+# Writes are committed in batches; close() commits the rest
+COMMIT_EVERY = 100
+# Indexed destination messages checked for liveness per get_messages request
+LIVENESS_BATCH = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    destination TEXT NOT NULL,
+    dest_msg_id INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    content_hash TEXT,
+    run TEXT NOT NULL,
+    PRIMARY KEY (destination, dest_msg_id, source)
+);
+CREATE INDEX IF NOT EXISTS posts_by_source ON posts (destination, source, run);
+CREATE INDEX IF NOT EXISTS posts_by_run ON posts (destination, run);
+"""
+
+
+def source_key(channel, msg_id) -> str:
+    """Return the index key of source message *msg_id* in *channel*."""
+    return f"{cache_key(channel)}/{msg_id}"
+
+
+def content_hash(messages) -> str:
+    """Hash the text and media identity of *messages* (one message or an album)."""
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    digest = hashlib.sha256()
+    for message in messages:
+        text = getattr(message, "message", None)
+        digest.update((text if isinstance(text, str) else "").encode("utf-8", "surrogatepass"))
+        media = getattr(message, "media", None)
+        for kind in ("photo", "document"):
+            media_id = getattr(getattr(media, kind, None), "id", None)
+            if isinstance(media_id, int):
+                digest.update(f"\0{kind}:{media_id}".encode())
+        digest.update(b"\1")
+    return digest.hexdigest()[:32]
+
+
+class RepostIndex:
+    """SQLite index of destination messages by source message and owning run."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else state_dir() / INDEX_FILENAME
+        self._conn = None
+        self._pending = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _write(self, sql, rows) -> None:
+        conn = self._connect()
+        conn.executemany(sql, rows)
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self) -> None:
+        if self._conn is not None:
+            self._conn.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.commit()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "RepostIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def lookup(self, destination, source: str) -> Optional[tuple]:
+        """Return ``(dest_msg_ids, content_hash)`` of the newest run's copy of *source*, or None."""
+        rows = self._connect().execute(
+            "SELECT dest_msg_id, content_hash, run FROM posts WHERE destination = ? AND source = ? "
+            "ORDER BY run DESC, dest_msg_id",
+            (cache_key(destination), source),
+        ).fetchall()
+        if not rows:
+            return None
+        newest = rows[0][2]
+        return [row[0] for row in rows if row[2] == newest], rows[0][1]
+
+    def record(self, destination, sources: Iterable[str], dest_msg_ids: Iterable[int], run: str, digest=None) -> None:
+        """Record that *sources* were copied to *dest_msg_ids*, owned by *run*."""
+        dest_msg_ids = list(dest_msg_ids)
+        self._write(
+            "INSERT OR REPLACE INTO posts (destination, dest_msg_id, source, content_hash, run) VALUES (?, ?, ?, ?, ?)",
+            [(cache_key(destination), msg_id, source, digest, run) for source in sources for msg_id in dest_msg_ids],
+        )
+
+    def claim(self, destination, dest_msg_ids: Iterable[int], run: str) -> None:
+        """Move ownership of *dest_msg_ids* to *run*."""
+        self._write(
+            "UPDATE posts SET run = ? WHERE destination = ? AND dest_msg_id = ?",
+            [(run, cache_key(destination), msg_id) for msg_id in dest_msg_ids],
+        )
+
+    def owned_elsewhere(self, destination, run: str) -> Set[int]:
+        """Return the destination message IDs owned by runs other than *run*."""
+        rows = self._connect().execute(
+            "SELECT DISTINCT dest_msg_id FROM posts WHERE destination = ? AND run != ?",
+            (cache_key(destination), run),
+        )
+        return {msg_id for (msg_id,) in rows}
+
+    def dest_ids_from(self, destination, first: int, limit: int) -> List[int]:
+        """Return up to *limit* indexed message IDs of *destination* from *first* on, ascending."""
+        rows = self._connect().execute(
+            "SELECT DISTINCT dest_msg_id FROM posts WHERE destination = ? AND dest_msg_id >= ? "
+            "ORDER BY dest_msg_id LIMIT ?",
+            (cache_key(destination), first, limit),
+        )
+        return [msg_id for (msg_id,) in rows]
+
+    def forget(self, destination, dest_msg_ids: List[int]) -> None:
+        """Drop deleted destination messages from the index."""
+        self._write(
+            "DELETE FROM posts WHERE destination = ? AND dest_msg_id = ?",
+            [(cache_key(destination), msg_id) for msg_id in dest_msg_ids],
+        )
@@ -1,13 +1,27 @@
 import os
-import re
-import sys
-import inspect
 import asyncio
+import sys
+from contextlib import ExitStack, asynccontextmanager, nullcontext
+from dataclasses import dataclass, field
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from src.utils_files import dest_slug
+from src.config import env_number, get_config
+from src.utils_files import dest_slug, repost_journal_path, latest_repost_journal, iter_url_lines, state_dir
+from src.run_catalog import RunCatalog
+from src.repost_index import LIVENESS_BATCH, RepostIndex, content_hash, source_key
+from src.message_cache import MessageCache, is_file_reference_error, message_cache_path
+from src.media_store import MediaStore, media_id, send_media
+from src.journal import Journal, cancel_on_signals
+from src.metrics import METRICS, InstrumentedClient, RunSummary
+# parse_telegram_url and prefetch_messages are re-exported for existing importers
+from src.urls import parse_telegram_url, normalize_channel_id, to_entity_id, dest_message_url  # noqa: F401
+from src.entity_cache import EntityCache
+from src.watermarks import Watermarks
+from src.rate_limit import RateLimiter, flood_wait_seconds, unpaced_call
+from src.session_pool import DEFAULT_SESSION, SessionPool, entity_cache_path
+from src.pipeline import PIPELINE_QUEUE_SIZE, FanOut, prefetch_messages, produce_items, refetch_item  # noqa: F401
 
 # Define DummyClient at module level so it can be mocked in tests
 class DummyClient:
@@ -26,70 +40,77 @@ class DummyClient:
         return DummyMsg()
     async def is_user_authorized(self): return True
     async def delete_messages(self, *a, **kw): return None
+    async def download_media(self, *a, **kw): return None
+    async def upload_file(self, *a, **kw): return None
+    async def iter_messages(self, *a, **kw):
+        for message in ():
+            yield message
+    def add_event_handler(self, *a, **kw): pass
+    async def run_until_disconnected(self): pass
+
+
+def _telegram_client_class():
+    """Return the client class, importing Telethon on first use.
+
+    Importing Telethon takes most of the CLI's start-up time, so ``--help`` and
+    the file-only code paths never pay for it.  Tests replace the module-level
+    ``TelegramClient`` attribute, which is honoured here.
+    """
+    cls = globals().get("TelegramClient")
+    if cls is None:
+        if get_config().test_mode:
+            cls = DummyClient
+        else:
+            from telethon import TelegramClient as cls
+        globals()["TelegramClient"] = cls
+    return cls
 
-TEST_MODE = os.environ.get("TEST_MODE") == "1"
 
-if TEST_MODE:
-    TelegramClient = DummyClient
-else:
-    from telethon import TelegramClient
+def __getattr__(name):
+    # Resolves ``src.reposter.TelegramClient`` lazily for importers and mock.patch
+    if name == "TelegramClient":
+        return _telegram_client_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-API_ID = os.getenv("API_ID")
-API_HASH = os.getenv("API_HASH")
 
 def is_running_tests():
-    # Detect if running under pytest or test framework
-    for frame in inspect.stack():
-        if 'pytest' in frame.filename or 'unittest' in frame.filename:
-            return True
-    return False
+    return get_config().test_mode
 
 # Directory selection helper
 def get_data_dirs():
-    if TEST_MODE or is_running_tests():
-        return "./tests/data/input", "./tests/data/output"
-    else:
-        return "./data/input", "./data/output"
-
-# Helper to parse Telegram message URLs
-def parse_telegram_url(url):
-    """Parses a Telegram message URL and returns (channel_name_or_id, message_id) or (None, None) if invalid."""
-    # Match /t.me/channel_name/message_id
-    m1 = re.match(r'https?://t\.me/([\w\-]+)/([0-9]+)', url)
-    if m1 and m1.group(1) != 'c':
-        return m1.group(1), int(m1.group(2))
-    # Match /t.me/c/channel_id/message_id
-    m2 = re.match(r'https?://t\.me/c/(\d+)/([0-9]+)', url)
-    if m2:
-        # /c/ IDs are missing the -100 prefix
-        return f'-100{m2.group(1)}', int(m2.group(2))
-    return None, None
-
-def normalize_channel_id(channel):
-    """If channel is all digits and doesn't start with -100, prepend -100."""
-    if isinstance(channel, str) and channel.isdigit() and not channel.startswith('-100'):
-        return f'-100{channel}'
-    return channel
+    return get_config().data_dirs
+
+
+@asynccontextmanager
+async def open_client(client=None, session_name=DEFAULT_SESSION):
+    """Yield *client* unchanged if given (its owner keeps it connected), else connect a new one.
+
+    Lets ``sync`` run repost and delete over one shared connection.  Flood waits are handled by
+    the rate limiters (calls outside the paced paths use :func:`unpaced_call`), not slept away
+    inside Telethon.  New clients are wrapped in an
+    :class:`InstrumentedClient` so their API calls show up in the metrics.
+    """
+    if client is not None:
+        yield client
+        return
+    config = get_config()
+    client_cls = _telegram_client_class()
+    async with client_cls(session_name, config.api_id, config.api_hash, flood_sleep_threshold=0) as new_client:
+        yield InstrumentedClient(new_client)
+
 
 def get_sleep_interval(cli_value: Optional[float]) -> float:
     """Get sleep interval with priority: CLI argument > environment variable > default (0.1)"""
     if cli_value is not None:
         return cli_value
 
-    env_value = os.environ.get("REPOST_SLEEP_INTERVAL")
-    if env_value is not None:
-        try:
-            return float(env_value)
-        except (ValueError, TypeError):
-            pass
-
-    return 0.1  # Default value
+    return env_number("REPOST_SLEEP_INTERVAL", 0.1)
 
-async def login():
+async def login(session_name=DEFAULT_SESSION):
     """Connects to Telegram and creates a session file if one doesn't exist."""
     print("Attempting to connect to Telegram to create a session...", file=sys.stderr)
-    session_name = "anon"
-    async with TelegramClient(session_name, API_ID, API_HASH) as client:
+    config = get_config()
+    async with _telegram_client_class()(session_name, config.api_id, config.api_hash) as client:
         if await client.is_user_authorized():
             print("Session file is valid. You are already logged in.")
         else:
@@ -97,153 +118,517 @@ async def login():
             # We can send a message to ourselves to confirm it works.
             await client.send_message("me", "Login successful!")
             print("Login successful. Session file created/updated.")
+            # Cached access hashes and media references belong to the previous account; start fresh
+            EntityCache(entity_cache_path(session_name)).clear()
+            with MessageCache(message_cache_path(session_name)) as message_cache:
+                message_cache.clear()
+
+
+async def send_item(client, item, normalized_destination, entity_cache, limiter, session=None, media_store=None):
+    """Send stage: copy *item*'s message, or its whole album, to the destination.
+
+    Returns the list of sent messages.  With a *session* name the rate limit is kept per
+    session and destination, since flood limits apply per account.  Media that cannot be
+    sent by reference are sent as copies from *media_store* (see :func:`send_media`).
+    """
+    destination_id = to_entity_id(normalized_destination)
+    send_key = ("send", destination_id) if session is None else ("send", session, destination_id)
+
+    # --- Media group logic ---
+    if item.album:
+        media_list = [m.media for m in item.album if getattr(m, 'media', None)]
+        if media_list:
+            # Only the first item can have a caption in Telegram albums; take it from whichever
+            # member carries it, since the input may list any member of the album
+            caption = next((m.message for m in item.album if getattr(m, 'message', None)), None)
+
+            def send_album(files):
+                return limiter.call(send_key, lambda: entity_cache.call(
+                    client, destination_id,
+                    lambda entity: client.send_file(entity, files, caption=caption),
+                ))
+
+            sent_msgs = await send_media(
+                media_store, client, session, item.source_id, destination_id, media_list,
+                lambda: send_album(media_list), send_album,
+            )
+            # send_file returns a list if multiple files, or a single Message if one file
+            if not isinstance(sent_msgs, list):
+                sent_msgs = [sent_msgs]
+            print(f"Reposted media group {item.message.grouped_id} from {item.channel} to {normalized_destination} as {len(sent_msgs)} messages.")
+            return sent_msgs
+    # --- End media group logic ---
+
+    def send_copy(files):
+        return limiter.call(send_key, lambda: entity_cache.call(
+            client, destination_id,
+            lambda entity: client.send_file(
+                entity, files[0], caption=item.message.message, formatting_entities=item.message.entities,
+            ),
+        ))
+
+    media = getattr(item.message, 'media', None)
+    sent = await send_media(
+        media_store if media_id(media) else None, client, session, item.source_id, destination_id, [media],
+        lambda: limiter.call(send_key, lambda: entity_cache.call(
+            client, destination_id,
+            lambda entity: client.send_message(entity, item.message),
+        )),
+        send_copy,
+    )
+    print(f"Reposted message {item.msg_id} from {item.channel} to {normalized_destination} as {dest_message_url(normalized_destination, sent.id)}.")
+    return [sent]
+
+
+@dataclass
+class DestinationRun:
+    """Output file, progress journal and rate limiter of one destination in a repost run."""
+
+    destination: str
+    normalized: str
+    slug: str
+    publish_ts: str
+    output_file: str
+    journal: Journal
+    limiter: RateLimiter
+    resumed: bool = False
+    done_records: list = field(default_factory=list)
+    any_invalid: bool = False
+    sent_messages: int = 0
+    reused_messages: int = 0
+    incremental: bool = False
+    marks: dict = field(default_factory=dict)  # source key -> last message mirrored by earlier runs
+    mirrored: dict = field(default_factory=dict)  # source key -> last message mirrored by this run
+    held: set = field(default_factory=set)  # sources whose mark a failed send holds back
+    alive: dict = field(default_factory=dict)  # indexed destination message ID -> still exists
+
+    @property
+    def run_id(self) -> str:
+        """Owner name of this run's messages in the repost index: ``{publish_ts}_{slug}``."""
+        return Path(self.output_file).stem
+
+    @property
+    def temp_file(self) -> str:
+        # Kept in the state directory so in-progress runs never touch the output directory
+        return str(state_dir() / (Path(self.output_file).name + ".tmp"))
+
+    @property
+    def completed(self) -> dict:
+        """Input index -> URL of the entries finished by the interrupted run."""
+        return {r["i"]: r["url"] for r in self.done_records}
+
+    @property
+    def sent_albums(self) -> set:
+        return {tuple(r["album"]) for r in self.done_records if r.get("album")}
+
+    def already_mirrored(self, item) -> bool:
+        """True if an incremental run mirrored *item* to this destination before."""
+        return self.incremental and item.mark_key is not None and item.msg_id <= self.marks.get(item.mark_key, 0)
+
+    def track(self, item, ok: bool = True) -> None:
+        """Advance (or, if not *ok*, hold) this run's mark of *item*'s source."""
+        key = item.mark_key
+        if not self.incremental or key is None:
+            return
+        if not ok:
+            self.held.add(key)
+        elif key not in self.held:
+            self.mirrored[key] = max(self.mirrored.get(key, 0), item.msg_id)
+
+
+def start_destination_run(destination, output_dir, resume, limiter) -> DestinationRun:
+    """Pick the run file of *destination*, continuing its interrupted run if *resume* is set."""
+    normalized_destination = str(normalize_channel_id(destination))
+    slug = dest_slug(normalized_destination)
 
+    resume_journal = latest_repost_journal(slug) if resume else None
+    if resume_journal is not None:
+        # Continue the interrupted run under its original publish timestamp
+        publish_ts = resume_journal.name[:15]
+        ts_output_file = os.path.join(output_dir, f"{publish_ts}_{slug}.txt")
+        print(f"Resuming interrupted run {publish_ts} for {normalized_destination}.", file=sys.stderr)
+    else:
+        if resume:
+            print(f"No interrupted run found for {normalized_destination}; starting a new one.", file=sys.stderr)
+        elif latest_repost_journal(slug) is not None:
+            print(f"[WARN] An interrupted run exists for {normalized_destination}; use --resume to continue it.", file=sys.stderr)
+        publish_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ts_output_file = os.path.join(output_dir, f"{publish_ts}_{slug}.txt")
+        # Ensure unique filename within same second (important for fast tests)
+        while Path(ts_output_file).exists():
+            dt = datetime.strptime(publish_ts, "%Y%m%d_%H%M%S") + timedelta(seconds=1)
+            publish_ts = dt.strftime("%Y%m%d_%H%M%S")
+            ts_output_file = os.path.join(output_dir, f"{publish_ts}_{slug}.txt")
+
+    # Entries completed by an interrupted run are skipped; the journal is the source of truth
+    journal = Journal(repost_journal_path(publish_ts, slug))
+    done_records = sorted(journal.load(), key=lambda r: r["i"]) if resume_journal else []
+    return DestinationRun(
+        destination, normalized_destination, slug, publish_ts, ts_output_file, journal, limiter,
+        resumed=resume_journal is not None,
+        done_records=done_records,
+        any_invalid=any(r.get("invalid") for r in done_records),
+    )
+
+
+async def send_with_handoff(pool, run, item, fetched_by, media_store=None):
+    """Send *item* to *run*'s destination through the session the pool assigns to it.
+
+    A flood wait longer than the pool's hand-off threshold marks the session unhealthy and
+    the send is retried on another session, after re-fetching the item through it.  An item
+    read from the message cache whose file references expired is fetched again and retried.
+    """
+    while True:
+        lane = pool.lane_for(run.normalized)
+        to_send = item
+        if lane.name != fetched_by:
+            to_send = await refetch_item(lane.client, item, lane.entity_cache)
+            if not to_send.message:
+                raise ValueError(f"message is not accessible to session {lane.name}")
+        try:
+            return await send_item(
+                lane.client, to_send, run.normalized, lane.entity_cache, run.limiter,
+                session=lane.name, media_store=media_store,
+            )
+        except Exception as e:
+            if to_send.cached and is_file_reference_error(e):
+                print(f"[WARN] Cached media of {item.url} expired; fetching it again.", file=sys.stderr)
+                item = await refetch_item(lane.client, item, lane.entity_cache)
+                fetched_by = lane.name
+                if not item.message:
+                    raise ValueError(f"message is not accessible to session {lane.name}")
+                continue
+            seconds = flood_wait_seconds(e)
+            if seconds is None or pool.handoff_after is None or seconds <= pool.handoff_after:
+                raise
+            pool.report_flood(lane.name, seconds)
+
+
+async def still_live(index, run, pool, dest_ids) -> bool:
+    """True if the indexed messages *dest_ids* still exist in *run*'s destination.
+
+    IDs not checked yet are fetched with one ``get_messages`` of the indexed IDs from the
+    first of them on, so reusing a run in order costs one request per ``LIVENESS_BATCH``
+    messages.  If the check fails, the messages are assumed to exist.
+    """
+    unknown = [msg_id for msg_id in dest_ids if msg_id not in run.alive]
+    if unknown:
+        batch = sorted(set(index.dest_ids_from(run.normalized, min(unknown), LIVENESS_BATCH)) | set(unknown))
+        lane = pool.lane_for(run.normalized)
+        try:
+            entity = await lane.entity_cache.resolve(lane.client, to_entity_id(run.normalized))
+            found = await unpaced_call(
+                ("get_messages", run.normalized), lambda: lane.client.get_messages(entity, ids=batch),
+            )
+        except Exception as e:
+            print(f"[WARN] Could not check indexed messages of {run.normalized}: {e}", file=sys.stderr)
+            return True
+        run.alive.update((msg_id, message is not None) for msg_id, message in zip(batch, found))
+    return all(run.alive.get(msg_id, True) for msg_id in dest_ids)
+
+
+async def reuse_from_index(index, run, item, pool=None) -> Optional[list]:
+    """Return the destination URLs of an earlier copy of *item* that can be reused, claiming them.
+
+    A copy is reusable unless the source text or media changed since it was sent, or (when
+    a *pool* is given to check with) one of its messages was deleted from the destination.
+    A deleted copy is forgotten.
+    """
+    hit = index.lookup(run.normalized, source_key(item.channel, item.msg_id))
+    if hit is None:
+        return None
+    dest_ids, digest = hit
+    if digest is not None and digest != content_hash(item.album or item.message):
+        return None
+    if pool is not None and not await still_live(index, run, pool, dest_ids):
+        print(f"[INFO] The earlier copy of {item.url} was deleted from {run.normalized}; sending it again.")
+        index.forget(run.normalized, dest_ids)
+        return None
+    index.claim(run.normalized, dest_ids, run.run_id)
+    return [dest_message_url(run.normalized, msg_id) for msg_id in dest_ids]
+
+
+async def send_to_destination(pool, run, queue, fetched_by, index=None, force=False, media_store=None):
+    """Send stage of one destination: drain *queue* in order, writing and journaling new URLs.
+
+    Items on *queue* were fetched by session *fetched_by*.  With a repost *index*, messages
+    already copied to the destination are reused instead of sent again, unless *force* is set.
+    Media that cannot be sent by reference are copied through *media_store*.
+    """
+    completed = run.completed
+    sent_albums = run.sent_albums
+    # Open the temp file for the new timestamped output, restoring resumed progress
+    with open(run.temp_file, "w", encoding="utf-8") as ts_out:
+        for record in run.done_records:
+            for dest_url in record.get("dst", []):
+                ts_out.write(dest_url + "\n")
+        while (item := await queue.get()) is not None:
+            METRICS.set_gauge("pipeline_queue_depth", queue.qsize(), destination=run.normalized)
+            if completed.get(item.index) == item.url or run.already_mirrored(item):
+                # Finished for this destination only; others still needed the item
+                continue
+            if not item.valid:
+                print(f"Invalid Telegram message URL: {item.url}", file=sys.stderr)
+                run.any_invalid = True
+                run.journal.record(i=item.index, url=item.url, invalid=True)
+                continue
+            try:
+                if item.error is not None:
+                    raise item.error
+                if not item.message:
+                    print(f"Could not find message with ID {item.msg_id} in {item.channel}.")
+                    run.journal.record(i=item.index, url=item.url)
+                    continue
+                album_key = (item.source_id, item.message.grouped_id) if item.album else None
+                if item.album_duplicate or album_key in sent_albums:
+                    print(f"Skipped message {item.msg_id} from {item.channel}: its media group was already reposted.")
+                    run.journal.record(i=item.index, url=item.url)
+                    run.track(item)
+                    continue
+                dest_urls = None
+                if index is not None and not force:
+                    dest_urls = await reuse_from_index(index, run, item, pool)
+                if dest_urls is not None:
+                    print(f"Reused {len(dest_urls)} message(s) already copied from {item.url} to {run.normalized}.")
+                    run.reused_messages += len(dest_urls)
+                else:
+                    sent_msgs = await send_with_handoff(pool, run, item, fetched_by, media_store)
+                    dest_urls = [dest_message_url(run.normalized, sent.id) for sent in sent_msgs]
+                    if index is not None:
+                        members = item.album or [item.message]
+                        index.record(
+                            run.normalized,
+                            {source_key(item.channel, m.id) for m in members} | {source_key(item.channel, item.msg_id)},
+                            [sent.id for sent in sent_msgs],
+                            run.run_id,
+                            content_hash(item.album or item.message),
+                        )
+                    run.sent_messages += len(dest_urls)
+                for dest_url in dest_urls:
+                    ts_out.write(dest_url + "\n")
+                run.journal.record(i=item.index, url=item.url, dst=dest_urls, album=album_key and list(album_key))
+                run.track(item)
+            except Exception as e:
+                print(f"Error reposting message {item.msg_id} from {item.channel}: {e}", file=sys.stderr)
+                run.track(item, ok=False)
+
+
+def group_marks(group):
+    """Return the high-water marks a fetch stage shared by the runs in *group* reads from.
+
+    That is the lowest mark of each source, or None if a run has none; each sender then
+    skips the messages its own destination already has.
+    """
+    def marks(key):
+        found = [run.marks.get(key) for run in group]
+        return None if None in found else min(found)
+
+    return marks
+
+
+def tag_previous_run(run) -> None:
+    """Tag the newest earlier untagged run of *run*'s destination as marked for deletion."""
+    from src.utils_files import list_runs  # local import to avoid top-level cycle
 
-async def repost_from_file(destination, source=None, sleep_interval=None):
-    """Reads source message URLs from file and reposts them to the destination channel. Writes new message URLs to output file atomically."""
-    session_name = "anon"
-    # Directory logic: use ./data/ for user, ./tests/data/ for tests
-    input_dir, output_dir = get_data_dirs()
-    input_file = source or os.path.join(input_dir, "source_urls.txt")
+    existing_runs = list_runs(run.slug, status=[""])  # only untagged files
+    # The first item should be the newest; remove the current file itself
+    if existing_runs and existing_runs[0] == Path(run.output_file):
+        existing_runs = existing_runs[1:]
 
-    # --- Output filenames ---
-    from datetime import timedelta
+    if existing_runs:
+        prev_path = existing_runs[0]
+        marked_path = prev_path.with_suffix("")  # drop .txt
+        marked_path = Path(str(marked_path) + ".marked_for_deletion.txt")
+        if not marked_path.exists():
+            with RunCatalog().updating() as catalog:
+                prev_path.rename(marked_path)
+                catalog.rename(prev_path, marked_path)
+            print(f"Tagged previous run {prev_path.name} as {marked_path.name} for deletion.")
 
-    normalized_destination = str(normalize_channel_id(destination))
-    slug = dest_slug(normalized_destination)
 
-    publish_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    ts_output_file = os.path.join(output_dir, f"{publish_ts}_{slug}.txt")
-    # Ensure unique filename within same second (important for fast tests)
-    while Path(ts_output_file).exists():
-        dt = datetime.strptime(publish_ts, "%Y%m%d_%H%M%S") + timedelta(seconds=1)
-        publish_ts = dt.strftime("%Y%m%d_%H%M%S")
-        ts_output_file = os.path.join(output_dir, f"{publish_ts}_{slug}.txt")
+async def repost_from_file(
+    destination, source=None, sleep_interval=None, min_sleep=None, max_sleep=None, resume=False,
+    sessions=None, pool=None, force=False, history=None, incremental=False,
+):
+    """Reads source message URLs from file and reposts them to the destination channel. Writes new message URLs to output file atomically.
+
+    *destination* may be a list of channels: every source message and album is then fetched once
+    and sent to all of them concurrently, each destination with its own rate limiter, run file,
+    journal and previous-run tagging.
 
-    ts_temp_file = ts_output_file + ".tmp"
+    Sends are paced by an adaptive :class:`RateLimiter` starting at the sleep interval; *min_sleep*
+    and *max_sleep* bound how far it may speed up or back off after flood waits.
 
-    # Normalize destination for all downstream logic (already computed above)
+    Progress is journaled after every entry; with *resume* the newest interrupted run for the
+    destination is continued and its completed entries are skipped.
+
+    Destinations are spread over the *sessions* of a :class:`SessionPool` (default: the ``anon``
+    session); a destination whose session enters a long flood wait moves to another session.
+    An already connected *pool* may be passed in to share connections and entity caches across
+    commands.
+
+    Source messages already copied to a destination (see :class:`RepostIndex`) are reused
+    instead of sent again; *force* sends everything.  Messages stored by ``prefetch`` (see
+    :class:`MessageCache`) are read from the cache instead of fetched.  Media that cannot be
+    sent by reference are uploaded once per session and reused (see :class:`MediaStore`).
+
+    Range and whole-channel source URLs are read page by page, bounded by the
+    :class:`HistoryFilter` *history* (see :func:`produce_items`).  With *incremental*, those
+    sources are read only past each destination's high-water mark (see :class:`Watermarks`),
+    the marks are advanced, and the previous run is kept instead of tagged for deletion.
+    """
+    # Directory logic: use ./data/ for user, ./tests/data/ for tests
+    input_dir, output_dir = get_data_dirs()
+    input_file = source or os.path.join(input_dir, "source_urls.txt")
+    destinations = list(destination) if isinstance(destination, (list, tuple)) else [destination]
 
     # Get the actual sleep interval to use
     sleep_time = get_sleep_interval(sleep_interval)
 
-    if not os.path.exists(input_file):
+    owns_pool = pool is None
+    if owns_pool:
+        pool = SessionPool(sessions)
+    run_summary = RunSummary("repost")
+
+    # --- Output filenames, one run per distinct destination ---
+    runs = []
+    for dest in destinations:
+        if any(run.normalized == str(normalize_channel_id(dest)) for run in runs):
+            continue
+        limiter = pool.limiter(
+            ("send", str(normalize_channel_id(dest)), sleep_time, min_sleep, max_sleep),
+            lambda: RateLimiter(sleep_time, min_interval=min_sleep, max_interval=max_sleep, max_wait=pool.handoff_after),
+        )
+        runs.append(start_destination_run(dest, output_dir, resume, limiter))
+    if incremental:
+        with Watermarks() as watermarks:
+            for run in runs:
+                run.incremental = True
+                run.marks = watermarks.for_destination(run.normalized)
+
+    if input_file != "-" and not os.path.exists(input_file):
         print(f"Input file {input_file} does not exist.", file=sys.stderr)
         sys.exit(1)
 
     os.makedirs(output_dir, exist_ok=True)
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        source_urls = [line.strip() for line in f if line.strip()]
+    # URLs are read lazily as the pipeline consumes them ("-" streams from stdin)
+    source_urls = iter_url_lines(input_file)
 
-    print(f"Read {len(source_urls)} source URLs from {input_file}.", file=sys.stderr)
+    print(f"Streaming source URLs from {'stdin' if input_file == '-' else input_file}.", file=sys.stderr)
     print(f"Using sleep interval: {sleep_time} seconds between reposts.", file=sys.stderr)
 
-    any_invalid = False
-    async with TelegramClient(session_name, API_ID, API_HASH) as client:
+    read_limiter = pool.limiter(("read",), lambda: RateLimiter(0))
+    for run in runs:
+        run.journal.open(truncate=not run.resumed)
+    index = RepostIndex()
+    for run in runs:
+        if run.resumed:
+            # Re-claim what the interrupted run reused in case its index writes were lost
+            dest_ids = [parse_telegram_url(url)[1] for r in run.done_records for url in r.get("dst", [])]
+            index.claim(run.normalized, [msg_id for msg_id in dest_ids if msg_id], run.run_id)
+    message_caches = []
+    with index, MediaStore() as media_store, cancel_on_signals(), ExitStack() as open_caches:
         try:
-            destination_id = normalized_destination
-            try:
-                destination_id = int(destination_id)
-            except (ValueError, TypeError):
-                pass
-            try:
-                dest_entity = await client.get_entity(destination_id)
-            except Exception as e1:
-                print(f"[WARN] get_entity failed for destination '{destination_id}': {e1}", file=sys.stderr)
+            async with (pool if owns_pool else nullcontext(pool)):
+                # Each destination is assigned a session; the destinations sharing a session
+                # share one fetch stage.  Stdin can only be read once, so there all destinations
+                # share the first one's fetch stage and other sessions re-fetch what they send.
+                groups = {}
+                for run in runs:
+                    lane = pool.lane_for(run.normalized)
+                    try:
+                        await lane.entity_cache.resolve(lane.client, to_entity_id(run.normalized))
+                    except Exception:
+                        print(f"Could not find the destination entity '{run.destination}'.", file=sys.stderr)
+                        sys.exit(1)
+                    fetched_by = next(iter(groups), lane.name) if input_file == "-" else lane.name
+                    groups.setdefault(fetched_by, []).append(run)
+
+                producers = []
+                senders = []
+                for name, group in groups.items():
+                    lane = pool.lanes[name]
+                    # The fetch stage skips only what every destination in the group has completed
+                    completed = group[0].completed
+                    sent_albums = group[0].sent_albums
+                    for run in group[1:]:
+                        other = run.completed
+                        completed = {i: url for i, url in completed.items() if other.get(i) == url}
+                        sent_albums &= run.sent_albums
+                    if completed:
+                        print(f"Skipping {len(completed)} entries completed by the interrupted run.", file=sys.stderr)
+
+                    # Fetch stage runs ahead of the send loops through bounded queues, one per destination
+                    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in group]
+                    urls = source_urls if len(groups) == 1 else iter_url_lines(input_file)
+                    marks = group_marks(group) if incremental else None
+                    # Messages prefetched by this session are read from its message cache
+                    message_cache = open_caches.enter_context(MessageCache(message_cache_path(name)))
+                    message_caches.append(message_cache)
+                    producers.append(asyncio.create_task(produce_items(
+                        lane.client, urls, queues[0] if len(queues) == 1 else FanOut(queues),
+                        entity_cache=lane.entity_cache, limiter=read_limiter,
+                        completed=completed, sent_albums=sent_albums, message_cache=message_cache,
+                        history=history, marks=marks,
+                    )))
+                    senders += [
+                        asyncio.create_task(send_to_destination(pool, run, queue, name, index, force, media_store))
+                        for run, queue in zip(group, queues)
+                    ]
                 try:
-                    dest_entity = await client.get_input_entity(destination_id)
-                except Exception as e2:
-                    print(f"[ERROR] get_input_entity also failed for destination '{destination_id}': {e2}", file=sys.stderr)
-                    print(f"Could not find the destination entity '{destination}'.", file=sys.stderr)
-                    sys.exit(1)
-        except Exception as e:
-            print(f"Could not resolve the destination entity '{destination}'. Error: {e}", file=sys.stderr)
+                    await asyncio.gather(*senders)
+                except BaseException:
+                    for task in producers + senders:
+                        task.cancel()
+                    raise
+                # Surface errors raised by the fetch stage
+                await asyncio.gather(*producers)
+        except asyncio.CancelledError:
+            for run in runs:
+                run.journal.close()
+                print(
+                    f"Interrupted: progress saved to {run.journal.path}. Re-run with --resume to continue.",
+                    file=sys.stderr,
+                )
+            pool.save_caches()
             sys.exit(1)
 
-        # Open the temp file for the new timestamped output
-        with open(ts_temp_file, "w", encoding="utf-8") as ts_out:
-            for i, url in enumerate(source_urls):
-                channel, msg_id = parse_telegram_url(url)
-                if channel and msg_id:
-                    try:
-                        source_id = normalize_channel_id(channel)
-                        try:
-                            source_id = int(source_id)
-                        except (ValueError, TypeError):
-                            pass
-                        message_to_send = await client.get_messages(source_id, ids=msg_id)
-
-                        # --- Media group logic ---
-                        grouped_id = getattr(message_to_send, 'grouped_id', None)
-                        if grouped_id:
-                            # Fetch a wider window of messages around msg_id to ensure all group messages are found
-                            fetch_ids = list(range(msg_id - 10, msg_id + 10))
-                            group_msgs = await client.get_messages(source_id, ids=fetch_ids)
-                            group_msgs = [m for m in group_msgs if getattr(m, 'grouped_id', None) == grouped_id]
-                            group_msgs = sorted(group_msgs, key=lambda m: m.id)
-                            media_list = []
-                            for m in group_msgs:
-                                if hasattr(m, 'media') and m.media:
-                                    media_list.append(m.media)
-                            if media_list:
-                                # Only the first item can have a caption in Telegram albums
-                                caption = message_to_send.message if hasattr(message_to_send, 'message') else None
-                                sent_msgs = await client.send_file(dest_entity, media_list, caption=caption)
-                                # send_file returns a list if multiple files, or a single Message if one file
-                                if not isinstance(sent_msgs, list):
-                                    sent_msgs = [sent_msgs]
-                                # Write URLs for each sent message
-                                for sent in sent_msgs:
-                                    # Format destination URL correctly for private/public channels
-                                    if normalized_destination.startswith("-100"):
-                                        new_url = f"https://t.me/c/{normalized_destination[4:]}/{sent.id}"
-                                    else:
-                                        new_url = f"https://t.me/{normalized_destination}/{sent.id}"
-                                    ts_out.write(new_url + "\n")
-                                print(f"Reposted media group {grouped_id} from {channel} to {normalized_destination} as {len(sent_msgs)} messages.")
-                                await asyncio.sleep(sleep_time)
-                                continue  # Skip the single-message send below
-                        # --- End media group logic ---
-                        if message_to_send:
-                            sent = await client.send_message(dest_entity, message_to_send)
-                            # Format destination URL correctly for private/public channels
-                            if normalized_destination.startswith("-100"):
-                                dest_url = f"https://t.me/c/{normalized_destination[4:]}/{sent.id}"
-                            else:
-                                dest_url = f"https://t.me/{normalized_destination}/{sent.id}"
-                            ts_out.write(dest_url + "\n")
-                            print(f"Reposted message {msg_id} from {channel} to {normalized_destination} as {dest_url}.")
-
-                            # Sleep between messages, but not after the last one
-                            if i < len(source_urls) - 1:
-                                await asyncio.sleep(sleep_time)
-                        else:
-                            print(f"Could not find message with ID {msg_id} in {channel}.")
-                    except Exception as e:
-                        print(f"Error reposting message {msg_id} from {channel}: {e}", file=sys.stderr)
-                else:
-                    print(f"Invalid Telegram message URL: {url}", file=sys.stderr)
-                    any_invalid = True
-
-    os.replace(ts_temp_file, ts_output_file)
-    print(f"Wrote new destination URLs to {ts_output_file}.")
-
-    # --- Tag previous untagged run for same destination ---
-    from src.utils_files import list_runs  # local import to avoid top-level cycle
-
-    existing_runs = list_runs(slug, status=[""])  # only untagged files
-    # The first item should be the newest; remove the current file itself
-    if existing_runs and existing_runs[0] == Path(ts_output_file):
-        existing_runs = existing_runs[1:]
-
-    if existing_runs:
-        prev_path = existing_runs[0]
-        marked_path = prev_path.with_suffix("")  # drop .txt
-        marked_path = Path(str(marked_path) + ".marked_for_deletion.txt")
-        if not marked_path.exists():
-            prev_path.rename(marked_path)
-            print(f"Tagged previous run {prev_path.name} as {marked_path.name} for deletion.")
-
-    if any_invalid:
+    pool.save_caches()
+    for run in runs:
+        if run.incremental and os.path.getsize(run.temp_file) == 0:
+            # Nothing new: keep the run history free of empty runs
+            os.remove(run.temp_file)
+            print(f"No new messages for {run.normalized} since the last run.")
+        else:
+            with RunCatalog().updating() as catalog:
+                os.replace(run.temp_file, run.output_file)
+                catalog.add(run.output_file)
+            print(f"Wrote new destination URLs to {run.output_file}.")
+        run.journal.remove()
+
+        if run.incremental:
+            # The new run adds to the destination's history instead of replacing it
+            with Watermarks() as watermarks:
+                for source, msg_id in run.mirrored.items():
+                    watermarks.advance(source, run.normalized, msg_id)
+            for source in sorted(run.held):
+                print(f"[WARN] High-water mark of {source} held back by a failed send; the next run retries it.", file=sys.stderr)
+        else:
+            # --- Tag previous untagged run for same destination ---
+            tag_previous_run(run)
+
+    cached = sum(cache.hits for cache in message_caches)
+    if cached:
+        print(f"[INFO] Read {cached} source messages from the prefetch cache.", file=sys.stderr)
+    reused = sum(run.reused_messages for run in runs)
+    if reused:
+        print(f"[INFO] Reused {reused} messages already in the destination; use --force to send them again.", file=sys.stderr)
+    run_summary.finish(
+        sum(run.sent_messages for run in runs),
+        destinations={run.normalized: run.sent_messages for run in runs},
+        reused=reused,
+        cached=cached,
+    )
+    if any(run.any_invalid for run in runs):
         sys.exit(1)
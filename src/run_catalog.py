@@ -0,0 +1,161 @@
+"""Indexed catalog of run files backing :func:`src.utils_files.list_runs`.
+
+Scanning the output directory means matching a regex and parsing a timestamp
+for every file, and after months of syncs most of those files are
+``.deleted_at_…`` leftovers.  :class:`RunCatalog` keeps one row per run file
+in ``.state/runs.sqlite``, indexed by ``(slug, status, publish_ts)``, so
+"newest marked run for this slug" is an index lookup.
+
+The commands record the run files they create, tag, rename and delete through
+:meth:`RunCatalog.updating`.  Changes made by anything else (a user moving
+files, tests writing fixtures) are detected from the output directory's
+modification time, which changes whenever an entry is added, removed or
+renamed, together with its entry count: on filesystems with coarse
+timestamps a file written in the same tick as the last sync leaves the
+modification time unchanged.  A stale catalog is rebuilt from the filesystem
+on the next query; paths that vanished since the last sync, and queries that
+find nothing, trigger a rebuild too.
+"""
+
+import os
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .utils_files import _get_data_dirs, state_dir
+
+CATALOG_FILENAME = "runs.sqlite"
+
+# {publish_ts}_{slug}[.{status}].txt
+RUN_FILE_RE = re.compile(r"^(?P<publish>\d{8}_\d{6})_(?P<slug>[^.]+)(?:\.(?P<status>[\w_]+))?\.txt$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    name TEXT PRIMARY KEY,
+    slug TEXT NOT NULL,
+    status TEXT NOT NULL,
+    publish_ts TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_slug_status ON runs (slug, status, publish_ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def parse_run_name(name: str) -> Optional[tuple]:
+    """Return ``(slug, status, publish_ts)`` for a run file name, or None if it is not one."""
+    m = RUN_FILE_RE.match(name)
+    if not m:
+        return None
+    try:
+        datetime.strptime(m.group("publish"), "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+    return m.group("slug"), m.group("status") or "", m.group("publish")
+
+
+class RunCatalog:
+    """SQLite index of the run files in the output directory."""
+
+    def __init__(self, output_dir=None, path=None):
+        if output_dir is None:
+            _, output_dir = _get_data_dirs()
+        self.output_dir = Path(output_dir)
+        self.path = Path(path) if path is not None else state_dir() / CATALOG_FILENAME
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _dir_state(self) -> str:
+        """Return the output directory's modification time and entry count."""
+        return f"{os.stat(self.output_dir).st_mtime_ns}:{len(os.listdir(self.output_dir))}"
+
+    def _is_fresh(self, conn) -> bool:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'dir_state'").fetchone()
+        return row is not None and row[0] == self._dir_state()
+
+    def _store_state(self, conn) -> None:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dir_state', ?)", (self._dir_state(),))
+
+    def _rebuild(self, conn) -> None:
+        rows = []
+        for entry in os.scandir(self.output_dir):
+            if not entry.is_file():
+                continue
+            parsed = parse_run_name(entry.name)
+            if parsed is not None:
+                rows.append((entry.name, *parsed))
+        conn.execute("DELETE FROM runs")
+        conn.executemany("INSERT INTO runs (name, slug, status, publish_ts) VALUES (?, ?, ?, ?)", rows)
+        self._store_state(conn)
+
+    def rebuild(self) -> None:
+        """Re-index the output directory from scratch."""
+        with closing(self._connect()) as conn, conn:
+            self._rebuild(conn)
+
+    def _query(self, conn, slug, statuses) -> List[str]:
+        placeholders = ", ".join("?" for _ in statuses)
+        # Newest first; at equal timestamps tagged files come before the untagged one
+        rows = conn.execute(
+            f"SELECT name FROM runs WHERE slug = ? AND status IN ({placeholders}) "
+            "ORDER BY publish_ts DESC, status = '' ASC",
+            (slug, *statuses),
+        ).fetchall()
+        return [name for (name,) in rows]
+
+    def runs(self, slug: str, statuses: Iterable[str]) -> List[Path]:
+        """Return the run files of *slug* whose status is in *statuses*, newest first."""
+        statuses = list(statuses)
+        if not statuses:
+            return []
+        with closing(self._connect()) as conn, conn:
+            rebuilt = not self._is_fresh(conn)
+            if rebuilt:
+                self._rebuild(conn)
+            names = self._query(conn, slug, statuses)
+            # A miss may be a file the modification time did not reveal
+            if (not names and not rebuilt) or not all((self.output_dir / name).exists() for name in names):
+                self._rebuild(conn)
+                names = self._query(conn, slug, statuses)
+        return [self.output_dir / name for name in names]
+
+    @contextmanager
+    def updating(self):
+        """Record the run-file changes made inside the block.
+
+        Filesystem changes go inside the block together with the matching :meth:`add`,
+        :meth:`remove` or :meth:`rename` calls.  If the catalog was in sync before the
+        block it is marked in sync afterwards; otherwise the next query rebuilds it anyway.
+        """
+        with closing(self._connect()) as conn, conn:
+            fresh = self._is_fresh(conn)
+            self._conn = conn
+            try:
+                yield self
+            finally:
+                self._conn = None
+            if fresh:
+                self._store_state(conn)
+
+    def add(self, path) -> None:
+        name = Path(path).name
+        parsed = parse_run_name(name)
+        if parsed is not None:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (name, slug, status, publish_ts) VALUES (?, ?, ?, ?)",
+                (name, *parsed),
+            )
+
+    def remove(self, path) -> None:
+        self._conn.execute("DELETE FROM runs WHERE name = ?", (Path(path).name,))
+
+    def rename(self, old_path, new_path) -> None:
+        self.remove(old_path)
+        self.add(new_path)
@@ -0,0 +1,173 @@
+"""Long-running ``serve`` mode: run spooled jobs over warm connections.
+
+Every ``python -m src.main`` call pays for interpreter start-up, the Telethon
+import, connecting and authenticating.  :func:`serve` opens one
+:class:`SessionPool` and keeps it for its whole lifetime, polling a spool
+directory (``data/input/spool/`` by default) for jobs.  Connections, entity
+caches and rate-limiter state stay warm between jobs.
+
+A job is either
+
+* a JSON manifest (``*.json``) naming a ``command`` (``repost``, ``delete`` or
+  ``sync``) and its options, e.g.
+  ``{"command": "sync", "destination": "@chan", "source": "data/input/a.txt"}``;
+* a plain URL file (``*.txt``), reposted to the ``serve --destination``
+  channel(s).
+
+Jobs are claimed by moving them to ``processing/`` and end up in ``done/`` or
+``failed/``.  Jobs left in ``processing/`` by a daemon that was stopped or
+crashed are picked up again with ``resume`` on the next start.  Writers should
+create job files under a dot-prefixed name and rename them into place, since
+dotfiles are ignored.
+
+With *metrics_port*, the metrics registry (see :mod:`src.metrics`) is served
+in the Prometheus text format at ``http://<host>:<port>/metrics``.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from .delete import delete_from_file
+from .journal import cancel_on_signals
+from .metrics import export_textfile, serve_metrics
+from .pipeline import HistoryFilter
+from .reposter import get_data_dirs, repost_from_file
+from .session_pool import SessionPool
+from .sync import sync
+from .urls import normalize_channel_id
+
+SPOOL_DIRNAME = "spool"
+DEFAULT_POLL_INTERVAL = 1.0
+JOB_COMMANDS = ("repost", "delete", "sync")
+JOB_SUFFIXES = (".json", ".txt")
+
+
+def get_spool_dir(spool=None) -> Path:
+    """Return the spool directory (default ``<input_dir>/spool``), creating its subdirectories."""
+    input_dir, _ = get_data_dirs()
+    path = Path(spool) if spool else Path(input_dir) / SPOOL_DIRNAME
+    for sub in ("processing", "done", "failed"):
+        (path / sub).mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def pending_jobs(directory) -> list:
+    """Return the job files in *directory*, oldest first."""
+    jobs = [
+        p for p in Path(directory).iterdir()
+        if p.is_file() and p.suffix in JOB_SUFFIXES and not p.name.startswith(".")
+    ]
+    return sorted(jobs, key=lambda p: (p.stat().st_mtime, p.name))
+
+
+def load_job(path, default_destination=None) -> dict:
+    """Parse the job in *path*; raises ValueError for malformed jobs."""
+    path = Path(path)
+    if path.suffix == ".txt":
+        if not default_destination:
+            raise ValueError("URL file jobs need a destination: start serve with --destination.")
+        return {"command": "repost", "destination": list(default_destination), "source": str(path)}
+
+    with open(path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    if not isinstance(job, dict) or job.get("command") not in JOB_COMMANDS:
+        raise ValueError(f"Job manifest must be an object with a command of {', '.join(JOB_COMMANDS)}.")
+    if job["command"] != "delete" and not job.get("destination"):
+        raise ValueError(f"{job['command']} jobs need a destination.")
+    return job
+
+
+async def run_job(pool, job, resume=False) -> None:
+    """Run one parsed *job* over the connections of *pool*."""
+    command = job["command"]
+    destination = job.get("destination")
+    resume = resume or bool(job.get("resume", False))
+    force = bool(job.get("force", False))
+    sleep_options = (job.get("sleep"), job.get("min_sleep"), job.get("max_sleep"))
+    since_date = job.get("since_date")
+    history = HistoryFilter(
+        job.get("since_id"), job.get("until_id"), datetime.fromisoformat(since_date) if since_date else None,
+    )
+
+    if command == "repost":
+        await repost_from_file(
+            destination, job.get("source"), *sleep_options, resume, pool=pool, force=force, history=history,
+            incremental=bool(job.get("incremental", False)),
+        )
+    elif command == "sync":
+        await sync(
+            destination, job.get("source"), *sleep_options, resume, pool=pool, force=force, history=history,
+            reuse=bool(job.get("reuse", False)),
+        )
+    else:
+        destinations = list(destination) if isinstance(destination, (list, tuple)) else [destination]
+        if job.get("delete_urls"):
+            destinations = destinations[:1]
+        for dest in destinations:
+            lane = pool.lane_for(str(normalize_channel_id(dest))) if dest else pool.lanes[pool.names[0]]
+            await delete_from_file(
+                job.get("delete_urls"), destination=dest, resume=resume,
+                client=lane.client, entity_cache=lane.entity_cache,
+            )
+
+
+async def serve(
+    spool=None, destination=(), sessions=None, poll_interval=DEFAULT_POLL_INTERVAL, once=False, metrics_port=None,
+):
+    """Run jobs from the spool directory until stopped (or, with *once*, until it is empty)."""
+    spool_dir = get_spool_dir(spool)
+    processing_dir = spool_dir / "processing"
+    stopping = False
+
+    def on_signal():
+        nonlocal stopping
+        stopping = True
+
+    async def process(path, resume):
+        claimed = processing_dir / path.name
+        if path != claimed:
+            os.replace(path, claimed)
+        try:
+            job = load_job(claimed, destination)
+            print(f"[INFO] Running {job['command']} job {claimed.name}.", file=sys.stderr)
+            await run_job(pool, job, resume)
+        except (Exception, SystemExit) as e:
+            if stopping:
+                # Interrupted by shutdown: leave the job claimed so the next start resumes it
+                raise asyncio.CancelledError()
+            reason = "see the messages above" if isinstance(e, SystemExit) else e
+            print(f"[ERROR] Job {claimed.name} failed: {reason}", file=sys.stderr)
+            os.replace(claimed, spool_dir / "failed" / claimed.name)
+            export_textfile()
+            return
+        os.replace(claimed, spool_dir / "done" / claimed.name)
+        print(f"[INFO] Finished job {claimed.name}.", file=sys.stderr)
+
+    print(f"Serving jobs from {spool_dir}.", file=sys.stderr)
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = await serve_metrics(metrics_port)
+        print(f"Serving metrics at http://0.0.0.0:{metrics_port}/metrics.", file=sys.stderr)
+    async with SessionPool(sessions) as pool:
+        with cancel_on_signals(on_signal):
+            try:
+                # Jobs a stopped or crashed daemon had claimed are resumed first
+                for path in pending_jobs(processing_dir):
+                    await process(path, resume=True)
+                while True:
+                    jobs = pending_jobs(spool_dir)
+                    for path in jobs:
+                        await process(path, resume=False)
+                    if once and not jobs:
+                        break
+                    if not jobs:
+                        await asyncio.sleep(poll_interval)
+            except asyncio.CancelledError:
+                print("Stopped serving jobs.", file=sys.stderr)
+            finally:
+                if metrics_server is not None:
+                    metrics_server.close()
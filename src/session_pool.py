@@ -0,0 +1,162 @@
+"""Pool of Telegram sessions for sharding sends across several accounts.
+
+Flood limits apply per account, so one session caps how fast anything can be
+posted.  A :class:`SessionPool` connects one :class:`TelegramClient` per
+session file and hands out :class:`Lane` objects (client plus that account's
+own :class:`EntityCache`, since access hashes are per account).  Work is
+spread by key, normally the destination: each key sticks to the least-loaded
+healthy session.
+
+A session is *unhealthy* while it sits in a flood wait longer than
+``HANDOFF_FLOOD_WAIT`` seconds.  :meth:`SessionPool.report_flood` records
+that, and the next :meth:`SessionPool.lane_for` call moves the key to another
+session.  Flood deadlines are kept in ``.state/session_health.json``, so the
+next run also avoids a session that is still blocked.
+
+Sessions come from ``--session`` (repeatable), else from the comma-separated
+``TELEGRAM_SESSIONS`` env var, else the single ``anon`` session.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+from .entity_cache import EntityCache
+from .utils_files import state_dir
+
+DEFAULT_SESSION = "anon"
+HEALTH_FILENAME = "session_health.json"
+# Flood waits longer than this move work to another session instead of being slept out
+HANDOFF_FLOOD_WAIT = 60
+
+
+def get_session_names(cli_sessions: Optional[Iterable[str]] = None) -> List[str]:
+    """Return the session names: CLI values > ``TELEGRAM_SESSIONS`` env var > ``["anon"]``."""
+    names = list(cli_sessions or ())
+    if not names:
+        env_value = os.environ.get("TELEGRAM_SESSIONS", "")
+        names = [name.strip() for name in env_value.split(",") if name.strip()]
+    # dict keeps the given order while dropping duplicates
+    return list(dict.fromkeys(names)) or [DEFAULT_SESSION]
+
+
+def entity_cache_path(session: str) -> Optional[Path]:
+    """Return the entity cache file of *session* (None: the default cache file)."""
+    if session == DEFAULT_SESSION:
+        return None
+    return state_dir() / f"entity_cache.{session}.json"
+
+
+@dataclass
+class Lane:
+    """One connected session: its name, client and per-account entity cache."""
+
+    name: str
+    client: Any
+    entity_cache: EntityCache
+
+
+class SessionPool:
+    """Connected sessions plus the flood health used to assign work to them."""
+
+    def __init__(self, sessions: Optional[Iterable[str]] = None, health_path: Optional[Path] = None):
+        self.names = get_session_names(sessions)
+        self.health_path = Path(health_path) if health_path is not None else state_dir() / HEALTH_FILENAME
+        self.lanes = {}  # session name -> Lane
+        self._assigned = {}  # key -> session name
+        self._blocked_until = self._load_health()  # session name -> wall-clock deadline
+        self._limiters = {}  # key -> RateLimiter kept for the pool's lifetime
+        self._stack = AsyncExitStack()
+
+    def _load_health(self) -> dict:
+        try:
+            with open(self.health_path, "r", encoding="utf-8") as f:
+                return {name: float(deadline) for name, deadline in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError, AttributeError, OSError) as e:
+            print(f"[WARN] Ignoring unreadable session health file {self.health_path}: {e}", file=sys.stderr)
+            return {}
+
+    def save_health(self) -> None:
+        """Persist the flood deadlines that have not passed yet."""
+        now = time.time()
+        pending = {name: deadline for name, deadline in self._blocked_until.items() if deadline > now}
+        if not pending and not self.health_path.exists():
+            return
+        self.health_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.health_path.with_name(self.health_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pending, f)
+        os.replace(tmp_path, self.health_path)
+
+    async def __aenter__(self) -> "SessionPool":
+        from .reposter import open_client  # local import to avoid top-level cycle
+
+        for name in self.names:
+            client = await self._stack.enter_async_context(open_client(session_name=name))
+            self.lanes[name] = Lane(name, client, EntityCache(entity_cache_path(name)))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.save_health()
+        return await self._stack.__aexit__(exc_type, exc, tb)
+
+    @property
+    def handoff_after(self) -> Optional[float]:
+        """Flood wait above which callers should hand work off (None with a single session)."""
+        return HANDOFF_FLOOD_WAIT if len(self.names) > 1 else None
+
+    def remaining_wait(self, name: str) -> float:
+        return max(0.0, self._blocked_until.get(name, 0.0) - time.time())
+
+    def is_healthy(self, name: str) -> bool:
+        return self.remaining_wait(name) <= HANDOFF_FLOOD_WAIT
+
+    def report_flood(self, name: str, seconds: float) -> None:
+        """Record that session *name* must wait *seconds* before its next call."""
+        deadline = time.time() + seconds
+        self._blocked_until[name] = max(self._blocked_until.get(name, 0.0), deadline)
+        if not self.is_healthy(name):
+            print(f"[WARN] Session {name} is in a {seconds}s flood wait; moving its work to other sessions.", file=sys.stderr)
+
+    def lane_for(self, key) -> Lane:
+        """Return the session *key* is assigned to, (re)assigning it if needed.
+
+        A key keeps its session while that session is healthy.  Otherwise it goes to
+        the healthy session with the fewest keys, or, if every session is blocked, to
+        the one whose flood wait ends first.
+        """
+        name = self._assigned.get(key)
+        if name is None or not self.is_healthy(name):
+            load = {n: 0 for n in self.names}
+            for other, assigned in self._assigned.items():
+                if other != key:
+                    load[assigned] += 1
+            healthy = [n for n in self.names if self.is_healthy(n)]
+            if healthy:
+                name = min(healthy, key=lambda n: load[n])
+            else:
+                name = min(self.names, key=self.remaining_wait)
+            self._assigned[key] = name
+        return self.lanes[name]
+
+    def limiter(self, key, factory):
+        """Return the rate limiter stored under *key*, creating it with *factory* on first use.
+
+        Limiters live as long as the pool, so a long-running ``serve`` keeps its pacing
+        and flood backoff between jobs.
+        """
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = factory()
+        return limiter
+
+    def save_caches(self) -> None:
+        for lane in self.lanes.values():
+            lane.entity_cache.save()
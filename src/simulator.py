@@ -0,0 +1,400 @@
+"""In-process Telegram simulator for benchmarks and end-to-end tests.
+
+``DummyClient`` and the ``AsyncMock`` fixtures only make the commands run;
+they model none of what makes a real run slow.  :class:`FakeTelegram` is a
+small in-memory "server" holding channels and their messages, and
+:meth:`FakeTelegram.client` returns :class:`SimulatedClient` objects that
+implement the subset of ``TelegramClient`` the commands use, so
+``src.reposter.TelegramClient`` can be pointed at it.
+
+The simulator models
+
+* per-method latency (``asyncio.sleep`` before each call completes);
+* FloodWait injection: every *n*-th call of a method raises
+  ``FloodWaitError`` with a chosen wait;
+* album layouts: :meth:`FakeTelegram.populate` groups consecutive messages
+  into albums, and ``send_file`` with several files creates one;
+* ID allocation: each channel hands out increasing message IDs, as Telegram
+  does;
+* call accounting: :attr:`FakeTelegram.calls` counts API calls per method;
+* file transfers: :meth:`FakeTelegram.add_file` creates a document whose
+  download (and any upload) costs one ``download_part`` / ``upload_part``
+  call per part, both through Telethon's sequential ``download_media`` /
+  ``upload_file`` and through ``iter_download`` and raw part requests;
+* history reads: ``iter_messages`` (oldest first) costs one ``get_history``
+  call per page of 100 messages; ``messages.search`` requests and filtered
+  ``iter_messages`` calls cost one ``search`` call per page and return only
+  matching messages.
+
+Channels are addressed like Telethon addresses them: by ``@username``,
+``-100…`` ID or the returned ``InputPeerChannel``.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+# Telegram returns at most 100 messages per messages.getHistory request
+HISTORY_PAGE_SIZE = 100
+# Media kinds matched by the search filters the simulator models
+FILTER_KINDS = {
+    "InputMessagesFilterPhotos": {"photo"},
+    "InputMessagesFilterVideo": {"video"},
+    "InputMessagesFilterPhotoVideo": {"photo", "video"},
+    "InputMessagesFilterDocument": {"document", "video"},
+}
+
+
+@dataclass
+class SimMessage:
+    """A stored message with the attributes the commands read."""
+
+    id: int
+    message: str = ""
+    media: Any = None
+    grouped_id: Optional[int] = None
+    input_chat: Any = None
+    date: Optional[datetime] = None
+    from_id: Optional[str] = None  # username of the author
+
+
+@dataclass
+class SimDocument:
+    """A stored file; only its size is modelled, its bytes are zeros."""
+
+    id: int
+    size: int
+    mime_type: str = "video/mp4"
+    attributes: List[Any] = field(default_factory=list)
+
+
+@dataclass
+class SimMedia:
+    document: SimDocument
+
+
+def _media_kind(media) -> Optional[str]:
+    """Return ``photo``, ``video`` or ``document`` for stored *media* (plain strings are photos)."""
+    if media is None:
+        return None
+    if isinstance(media, SimMedia):
+        return "video" if media.document.mime_type.startswith("video/") else "document"
+    return "photo"
+
+
+def _default_part_size(size: int) -> int:
+    """Part size Telethon's sequential transfers pick for a file of *size* bytes."""
+    from telethon import utils
+
+    return utils.get_appropriated_part_size(size) * 1024
+
+
+@dataclass
+class SimChannel:
+    id: int  # bare channel ID, without the -100 prefix
+    username: Optional[str] = None
+    messages: Dict[int, SimMessage] = field(default_factory=dict)
+    next_id: int = 1
+    _peer: Any = None
+
+    @property
+    def peer(self):
+        if self._peer is None:
+            from telethon.tl import types
+
+            self._peer = types.InputPeerChannel(channel_id=self.id, access_hash=self.id * 7919)
+        return self._peer
+
+    def allocate(self, store: bool = True, **kwargs) -> SimMessage:
+        """Create the channel's next message; with *store* False only its ID is used up."""
+        message = SimMessage(self.next_id, input_chat=self.peer, **kwargs)
+        if store:
+            self.messages[message.id] = message
+        self.next_id += 1
+        return message
+
+
+@dataclass
+class _FloodRule:
+    every: int
+    seconds: int
+
+
+class FakeTelegram:
+    """In-memory Telegram: channels, messages, latency, flood injection and call counts.
+
+    With *keep_sent* False, sent messages only use up IDs and are not stored, so
+    long benchmark runs do not measure the simulator's own memory.
+    """
+
+    def __init__(
+        self, latency: Optional[Dict[str, float]] = None, default_latency: float = 0.0, keep_sent: bool = True,
+    ):
+        self.latency = dict(latency or {})
+        self.default_latency = default_latency
+        self.keep_sent = keep_sent
+        self.calls = Counter()
+        self._channels = {}  # bare ID -> SimChannel
+        self._usernames = {}  # lower-case username -> SimChannel
+        self._floods = {}  # method -> _FloodRule
+        self._grouped_ids = count(1)
+        self._file_ids = count(1)
+
+    # -- setup -------------------------------------------------------------
+
+    def add_channel(self, channel_id, username: Optional[str] = None) -> SimChannel:
+        """Create a channel; *channel_id* may carry the ``-100`` prefix."""
+        bare = int(str(channel_id).removeprefix("-100"))
+        channel = SimChannel(bare, username)
+        self._channels[bare] = channel
+        if username:
+            self._usernames[username.lstrip("@").lower()] = channel
+        return channel
+
+    def populate(self, channel_id, n: int, album_every: int = 0, album_size: int = 3) -> List[int]:
+        """Add *n* messages to a channel and return their IDs.
+
+        With *album_every* > 0, every *album_every*-th message starts an album of
+        *album_size* consecutive messages (counted in *n*).
+        """
+        channel = self.channel(channel_id)
+        ids = []
+        remaining = 0
+        grouped_id = None
+        for i in range(n):
+            if remaining == 0 and album_every and i % album_every == 0:
+                grouped_id, remaining = next(self._grouped_ids), album_size
+            if remaining:
+                remaining -= 1
+                message = channel.allocate(message=f"album part {i}", media=f"media-{channel.id}-{i}", grouped_id=grouped_id)
+            else:
+                message = channel.allocate(message=f"message {i}")
+            ids.append(message.id)
+        return ids
+
+    def add_file(self, size: int) -> SimMedia:
+        """Create a document of *size* bytes and return it as message media."""
+        return SimMedia(SimDocument(next(self._file_ids), size))
+
+    def inject_flood(self, method: str, seconds: int, every: int = 1) -> None:
+        """Make every *every*-th call of *method* raise a FloodWaitError of *seconds*."""
+        self._floods[method] = _FloodRule(every, seconds)
+
+    def clear_floods(self) -> None:
+        self._floods.clear()
+
+    def channel(self, entity) -> SimChannel:
+        """Return the channel *entity* (username, ``-100`` ID, bare ID or input peer) refers to."""
+        channel_id = getattr(entity, "channel_id", None)
+        if channel_id is None:
+            key = str(entity).strip()
+            if key.lstrip("-").isdigit():
+                channel_id = int(key.removeprefix("-100"))
+            else:
+                channel = self._usernames.get(key.lstrip("@").lower())
+                if channel is None:
+                    raise ValueError(f'Cannot find any entity corresponding to "{entity}"')
+                return channel
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            from telethon import errors
+
+            raise errors.ChannelInvalidError(None)
+        return channel
+
+    def client(self, *args, **kwargs) -> "SimulatedClient":
+        """``TelegramClient``-compatible factory; the arguments are ignored."""
+        return SimulatedClient(self)
+
+    # -- per-call behaviour ------------------------------------------------
+
+    async def call(self, method: str) -> None:
+        """Account for one API call: count it, apply its latency and any injected flood."""
+        self.calls[method] += 1
+        delay = self.latency.get(method, self.default_latency)
+        if delay:
+            await asyncio.sleep(delay)
+        rule = self._floods.get(method)
+        if rule is not None and self.calls[method] % rule.every == 0:
+            from telethon import errors
+
+            raise errors.FloodWaitError(None, capture=rule.seconds)
+
+    @property
+    def total_calls(self) -> int:
+        """API calls made so far, not counting connections."""
+        return sum(n for method, n in self.calls.items() if method != "connect")
+
+
+class SimulatedClient:
+    """The ``TelegramClient`` methods used by repost, delete, sync and follow."""
+
+    def __init__(self, server: FakeTelegram):
+        self.server = server
+
+    async def __aenter__(self):
+        self.server.calls["connect"] += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def get_entity(self, entity):
+        await self.server.call("get_entity")
+        return self.server.channel(entity).peer
+
+    async def get_input_entity(self, entity):
+        await self.server.call("get_input_entity")
+        return self.server.channel(entity).peer
+
+    async def get_messages(self, entity, ids=None):
+        await self.server.call("get_messages")
+        channel = self.server.channel(entity)
+        if isinstance(ids, int):
+            return channel.messages.get(ids)
+        # Like Telegram, missing IDs come back as None in their position
+        return [channel.messages.get(msg_id) for msg_id in ids or ()]
+
+    def _matching(self, channel, search=None, message_filter=None, from_user=None, min_date=None, max_date=None):
+        """Return the sorted IDs of *channel*'s messages matching a search."""
+        kinds = None
+        if message_filter is not None:
+            name = getattr(message_filter, "__name__", type(message_filter).__name__)
+            if name != "InputMessagesFilterEmpty":
+                if name not in FILTER_KINDS:
+                    raise NotImplementedError(f"the simulator does not model {name}")
+                kinds = FILTER_KINDS[name]
+        author = str(from_user).lstrip("@").lower() if from_user is not None else None
+
+        def matches(message):
+            return (
+                (min_date is None or message.date is None or message.date >= min_date)
+                and (max_date is None or message.date is None or message.date < max_date)
+                and (not search or search.lower() in message.message.lower())
+                and (kinds is None or _media_kind(message.media) in kinds)
+                and (author is None or (message.from_id or "").lower() == author)
+            )
+
+        return sorted(msg_id for msg_id, message in channel.messages.items() if matches(message))
+
+    async def iter_messages(
+        self, entity, reverse=False, min_id=0, max_id=0, offset_date=None, limit=None,
+        search=None, filter=None, from_user=None, **kwargs,
+    ):
+        """History reads and searches, oldest first only: one call per page of 100.
+
+        As in Telethon, the offset date is a lower bound of a history read but the upper
+        bound (``max_date``) of a search.
+        """
+        if not reverse:
+            raise NotImplementedError("the simulator only reads history oldest first")
+        channel = self.server.channel(entity)
+        is_search = search is not None or filter is not None or from_user is not None
+        if is_search:
+            ids = self._matching(channel, search, filter, from_user, max_date=offset_date)
+        else:
+            ids = self._matching(channel, min_date=offset_date)
+        ids = [msg_id for msg_id in ids if msg_id > min_id and (not max_id or msg_id < max_id)][:limit]
+        # An empty history still costs the request that finds it empty
+        for start in range(0, max(len(ids), 1), HISTORY_PAGE_SIZE):
+            await self.server.call("search" if is_search else "get_history")
+            for msg_id in ids[start:start + HISTORY_PAGE_SIZE]:
+                yield channel.messages[msg_id]
+
+    async def _search(self, request):
+        """One ``messages.search`` page; a negative ``add_offset`` reads from ``offset_id`` on."""
+        from telethon.tl import types
+
+        await self.server.call("search")
+        channel = self.server.channel(request.peer)
+        ids = self._matching(
+            channel, request.q, request.filter, request.from_id, request.min_date, request.max_date,
+        )
+        if request.add_offset < 0:
+            page = [msg_id for msg_id in ids if msg_id >= request.offset_id][:request.limit]
+        else:
+            page = [msg_id for msg_id in ids if not request.offset_id or msg_id < request.offset_id][-request.limit:]
+        # Newest first, as Telegram returns them
+        return types.messages.Messages(
+            messages=[channel.messages[msg_id] for msg_id in reversed(page)], chats=[], users=[],
+        )
+
+    async def send_message(self, entity, message):
+        await self.server.call("send_message")
+        channel = self.server.channel(entity)
+        store = self.server.keep_sent
+        if isinstance(message, SimMessage):
+            return channel.allocate(store, message=message.message, media=message.media)
+        return channel.allocate(store, message=str(message))
+
+    async def send_file(self, entity, file, caption=None):
+        await self.server.call("send_file")
+        channel = self.server.channel(entity)
+        store = self.server.keep_sent
+        files = file if isinstance(file, (list, tuple)) else [file]
+        if len(files) == 1:
+            return channel.allocate(store, message=caption or "", media=files[0])
+        grouped_id = next(self.server._grouped_ids)
+        return [
+            channel.allocate(store, message=(caption or "") if i == 0 else "", media=media, grouped_id=grouped_id)
+            for i, media in enumerate(files)
+        ]
+
+    async def delete_messages(self, entity, message_ids):
+        await self.server.call("delete_messages")
+        channel = self.server.channel(entity)
+        ids = [message_ids] if isinstance(message_ids, int) else list(message_ids)
+        for msg_id in ids:
+            channel.messages.pop(msg_id, None)
+        return None
+
+    async def download_media(self, media, file=None):
+        """Sequential download: one ``download_part`` call per part, like Telethon's."""
+        size = media.document.size
+        part_size = _default_part_size(size)
+        with open(file, "wb") as f:
+            for offset in range(0, size, part_size):
+                await self.server.call("download_part")
+                f.write(bytes(min(part_size, size - offset)))
+        return file
+
+    async def iter_download(self, media, offset=0, request_size=512 * 1024, limit=None, file_size=None, **kwargs):
+        size = media.document.size
+        served = 0
+        while offset < size and (limit is None or served < limit):
+            await self.server.call("download_part")
+            yield bytes(min(request_size, size - offset))
+            offset += request_size
+            served += 1
+
+    async def upload_file(self, file, **kwargs):
+        """Sequential upload: one ``upload_part`` call per part, like Telethon's."""
+        from telethon.tl import types
+
+        size = os.path.getsize(file)
+        part_size = _default_part_size(size)
+        parts = -(-size // part_size)
+        with open(file, "rb") as f:
+            while f.read(part_size):
+                await self.server.call("upload_part")
+        return types.InputFileBig(next(self.server._file_ids), parts, os.path.basename(file))
+
+    async def __call__(self, request):
+        """Raw requests: message searches and the upload part requests of parallel transfers."""
+        if type(request).__name__ == "SearchRequest":
+            return await self._search(request)
+        await self.server.call("upload_part")
+        return True
+
+    def add_event_handler(self, *args, **kwargs) -> None:
+        pass
+
+    async def run_until_disconnected(self) -> None:
+        pass
@@ -0,0 +1,53 @@
+"""Single-process ``sync``: repost, tag the previous run, then delete it.
+
+``make sync`` used to chain ``make repost`` and ``make delete``, paying for two
+interpreter start-ups, two client connections and two cold entity caches.
+:func:`sync` runs both steps over one :class:`SessionPool` (one connection and
+entity cache per session), keeping the abort-on-error behaviour: a failed
+repost stops the run before anything is deleted.
+"""
+
+import sys
+from contextlib import nullcontext
+
+from .delete import delete_from_file
+from .reposter import repost_from_file
+from .session_pool import SessionPool
+from .utils_files import dest_slug, list_runs
+from .urls import normalize_channel_id
+
+
+async def sync(
+    destination, source=None, sleep_interval=None, min_sleep=None, max_sleep=None, resume=False,
+    sessions=None, pool=None, force=False, history=None, reuse=False,
+):
+    """Repost *source* to *destination*, then delete the run tagged for deletion.
+
+    *destination* may be a list, as for :func:`repost_from_file`; the tagged run
+    of every destination is deleted in turn, through the session that reposted
+    to it.  Raises ``SystemExit`` as soon as either step fails.  When there is
+    no previous run to delete (e.g. the first sync of a destination) only the
+    repost is performed.  An already connected *pool* may be passed in (see
+    ``serve``); otherwise one is opened for *sessions*.
+
+    By default every message is sent again and the whole previous run is
+    deleted.  With *reuse*, posts already in the destination are reused by the
+    new run (see :mod:`src.repost_index`), so only removed source messages are
+    deleted along with the previous run; *force* overrides *reuse*.
+    """
+    async with (SessionPool(sessions) if pool is None else nullcontext(pool)) as pool:
+        await repost_from_file(
+            destination, source, sleep_interval, min_sleep, max_sleep, resume, pool=pool,
+            force=force or not reuse, history=history,
+        )
+
+        destinations = list(destination) if isinstance(destination, (list, tuple)) else [destination]
+        for dest in destinations:
+            normalized_destination = str(normalize_channel_id(dest))
+            if not list_runs(dest_slug(normalized_destination), status=["marked_for_deletion"]):
+                print(f"No previous run of {dest} is marked for deletion; nothing to delete.", file=sys.stderr)
+                continue
+            lane = pool.lane_for(normalized_destination)
+            await delete_from_file(
+                destination=dest, resume=resume, client=lane.client, entity_cache=lane.entity_cache,
+            )
@@ -0,0 +1,56 @@
+"""Helpers for Telegram message URLs and channel identifiers.
+
+Kept free of Telethon and file-system logic so they can be shared by the
+repost, delete and pipeline modules without import cycles.
+"""
+
+import re
+
+
+# Helper to parse Telegram message URLs
+def parse_telegram_url(url):
+    """Parses a Telegram message URL and returns (channel_name_or_id, message_id) or (None, None) if invalid."""
+    # Match /t.me/channel_name/message_id
+    m1 = re.match(r'https?://t\.me/([\w\-]+)/([0-9]+)', url)
+    if m1 and m1.group(1) != 'c':
+        return m1.group(1), int(m1.group(2))
+    # Match /t.me/c/channel_id/message_id
+    m2 = re.match(r'https?://t\.me/c/(\d+)/([0-9]+)', url)
+    if m2:
+        # /c/ IDs are missing the -100 prefix
+        return f'-100{m2.group(1)}', int(m2.group(2))
+    return None, None
+
+def parse_history_url(url):
+    """Parse a range (``t.me/chan/100-5000``) or whole-channel (``t.me/chan``) source URL.
+
+    Returns ``(channel_name_or_id, first_id, last_id)``, with None IDs for a whole channel,
+    or None if *url* is neither.
+    """
+    m = re.match(r'https?://t\.me/(?:c/(\d+)|([\w\-]+))(?:/(\d+)-(\d+))?/?$', url.strip())
+    if not m or m.group(2) == 'c':
+        return None
+    channel = f'-100{m.group(1)}' if m.group(1) else m.group(2)
+    if m.group(3) is None:
+        return channel, None, None
+    return channel, int(m.group(3)), int(m.group(4))
+
+def normalize_channel_id(channel):
+    """If channel is all digits and doesn't start with -100, prepend -100."""
+    if isinstance(channel, str) and channel.isdigit() and not channel.startswith('-100'):
+        return f'-100{channel}'
+    return channel
+
+def to_entity_id(channel):
+    """Normalize *channel* and convert numeric IDs to int, as expected by Telethon."""
+    entity_id = normalize_channel_id(channel)
+    try:
+        return int(entity_id)
+    except (ValueError, TypeError):
+        return entity_id
+
+def dest_message_url(normalized_destination, msg_id):
+    """Format the URL of message *msg_id* in the destination, for private or public channels."""
+    if normalized_destination.startswith("-100"):
+        return f"https://t.me/c/{normalized_destination[4:]}/{msg_id}"
+    return f"https://t.me/{normalized_destination}/{msg_id}"
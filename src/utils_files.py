@@ -15,45 +15,28 @@ Later phases introduce additional suffixes (``.deleted_at_…``) but the helpers
 here focus on the two patterns required for Plan step 1.
 """
 
-import os
+import sys
+from datetime import datetime
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List
 
-# NOTE: We define a lightweight copy of get_data_dirs here to avoid circular
-# imports.  This helper is pure-utility (no Telegram dependencies) and keeps
-# src.utils_files fully standalone.
+from .config import get_config
 
 
 def _get_data_dirs():
-    """Return (input_dir, output_dir) matching the logic in src.reposter.
-
-    Duplicated here to avoid circular imports; kept minimal and in sync with
-    the original.
-    """
-
-    TEST_MODE = os.environ.get("TEST_MODE") == "1"
-
-    def _is_running_tests() -> bool:
-        import inspect
-
-        for frame in inspect.stack():
-            if 'pytest' in frame.filename or 'unittest' in frame.filename:
-                return True
-        return False
-
-    if TEST_MODE or _is_running_tests():
-        return "./tests/data/input", "./tests/data/output"
-    return "./data/input", "./data/output"
-
-
-from datetime import datetime
-import re
-from pathlib import Path
-from typing import Iterable, List
+    """Return (input_dir, output_dir) from the process-wide runtime config."""
+    return get_config().data_dirs
 
 
 __all__ = [
     "dest_slug",
     "parse_publish_ts",
     "list_runs",
+    "state_dir",
+    "repost_journal_path",
+    "latest_repost_journal",
+    "iter_url_lines",
 ]
 
 # ---------------------------------------------------------------------------
@@ -130,12 +113,17 @@ def list_runs(dest_slug: str, status: Iterable[str] | None = None) -> List[Path]
     -------
     list[Path]
         Sorted **newest → oldest** by publish timestamp.
+
+    Answered from the indexed :class:`src.run_catalog.RunCatalog`, which is
+    rebuilt from the directory whenever it has changed behind its back.
     """
 
+    from .run_catalog import RunCatalog  # local import to avoid top-level cycle
+
     if status is None:
         status = ("", "marked_for_deletion")
 
-    # Normalise to set for faster membership checks and ensure strings
+    # Normalise to a set of strings
     status_set = {str(s) for s in status}
 
     _, output_dir_str = _get_data_dirs()
@@ -144,26 +132,58 @@ def list_runs(dest_slug: str, status: Iterable[str] | None = None) -> List[Path]
         # Nothing to return
         return []
 
-    pattern_re = re.compile(
-        rf"^(\d{{8}}_\d{{6}})_{re.escape(dest_slug)}(?:\.(?P<suffix>[\w_]+))?\.txt$"
-    )
-
-    matches: list[tuple[Path, datetime, str]] = []  # (path, ts, suffix)
-    for p in output_dir.iterdir():
-        if not p.is_file():
-            continue
-        m = pattern_re.match(p.name)
-        if not m:
-            continue
-        suffix = m.group("suffix") or ""
-        if suffix not in status_set:
-            continue
-        ts = parse_publish_ts(p)
-        if ts is None:
-            # Skip files without valid timestamp – defensive
-            continue
-        matches.append((p, ts, suffix))
-
-    # Primary: timestamp DESC, Secondary: suffix presence (non-empty suffix first)
-    matches.sort(key=lambda t: (-t[1].timestamp(), t[2] == ""))
-    return [p for p, _, _ in matches]
+    return RunCatalog(output_dir).runs(dest_slug, sorted(status_set))
+
+
+def state_dir() -> Path:
+    """Return the directory holding internal state files (caches, journals).
+
+    Lives inside the output directory as ``.state/`` so it is persisted by the
+    same volume mount as the run files, while staying out of :func:`list_runs`.
+    The directory is created on first use.
+    """
+
+    _, output_dir_str = _get_data_dirs()
+    path = Path(output_dir_str) / ".state"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def repost_journal_path(publish_ts: str, dest_slug: str) -> Path:
+    """Return the progress journal path of the repost run ``{publish_ts}_{dest_slug}``."""
+
+    return state_dir() / f"{publish_ts}_{dest_slug}.repost.journal"
+
+
+def latest_repost_journal(dest_slug: str) -> Path | None:
+    """Return the journal of the newest unfinished repost run for *dest_slug*.
+
+    Journals are removed when a run completes, so any journal left in the state
+    directory belongs to an interrupted run.
+    """
+
+    pattern_re = re.compile(rf"^\d{{8}}_\d{{6}}_{re.escape(dest_slug)}\.repost\.journal$")
+    journals = sorted(p for p in state_dir().iterdir() if pattern_re.match(p.name))
+    return journals[-1] if journals else None
+
+
+def iter_url_lines(path: str | Path) -> Iterator[str]:
+    """Yield the stripped, non-blank lines of *path* one at a time.
+
+    ``"-"`` reads from standard input.  Lines are never collected into a list,
+    so memory use stays flat however long the input is, and callers can start
+    working on the first URL as soon as it has been read.
+    """
+
+    if str(path) == "-":
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                yield line
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
@@ -0,0 +1,90 @@
+"""High-water marks of incremental mirroring, per source and destination.
+
+Mirroring a channel on a schedule used to mean building a new URL file for
+every run, and every run tagged the previous one for deletion as if it
+replaced it.  With ``repost --incremental``, :class:`Watermarks` remembers in
+``.state/watermarks.sqlite`` the last message of each range or whole-channel
+source that has been mirrored to each destination.  The next run reads that
+source only from the message after the mark, so a run over a quiet channel
+costs one history request, and the previous run is kept: each incremental
+run adds its messages to the destination's run history.  A source filtered
+by a query (see :class:`~src.pipeline.SourceQuery`) has a mark of its own.
+
+A mark only moves past messages that were sent (or reused): the first
+message that fails to send holds the mark of its source for the rest of the
+run, so the next run retries it.  Marks are saved once the run file is
+written; an interrupted run leaves them unchanged for ``--resume``.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .entity_cache import cache_key
+from .utils_files import state_dir
+
+WATERMARKS_FILENAME = "watermarks.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS marks (
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    msg_id INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source, destination)
+);
+"""
+
+
+class Watermarks:
+    """SQLite store of the last mirrored message ID per (source, destination)."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else state_dir() / WATERMARKS_FILENAME
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "Watermarks":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def get(self, source, destination) -> Optional[int]:
+        """Return the last message of *source* mirrored to *destination*, or None."""
+        row = self._connect().execute(
+            "SELECT msg_id FROM marks WHERE source = ? AND destination = ?", (cache_key(source), cache_key(destination)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def for_destination(self, destination) -> Dict[str, int]:
+        """Return ``{source key: last mirrored message ID}`` of every source of *destination*."""
+        rows = self._connect().execute(
+            "SELECT source, msg_id FROM marks WHERE destination = ?", (cache_key(destination),),
+        ).fetchall()
+        return dict(rows)
+
+    def advance(self, source, destination, msg_id: int) -> None:
+        """Move the mark of *source* for *destination* up to *msg_id*; marks never move back."""
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO marks (source, destination, msg_id, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, destination) DO UPDATE SET "
+            "msg_id = MAX(msg_id, excluded.msg_id), updated_at = excluded.updated_at",
+            (cache_key(source), cache_key(destination), msg_id, time.time()),
+        )
+        conn.commit()
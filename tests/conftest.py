@@ -2,6 +2,9 @@ import pytest
 from unittest.mock import AsyncMock, patch
 import os
 import asyncio
+import time
+from types import SimpleNamespace
+from pathlib import Path
 
 os.environ["TEST_MODE"] = "1"
 os.environ["API_ID"] = "12345"
@@ -15,6 +18,13 @@ class MockMessage:
         self.raw_text = text
         self.message = text
 
+async def drain_queue(queue):
+    """Collect the items put on a pipeline queue until its end-of-input None"""
+    items = []
+    while (item := await queue.get()) is not None:
+        items.append(item)
+    return items
+
 class MockEntity:
     def __init__(self, id=None, username=None, title="Test Channel"):
         self.id = id
@@ -24,11 +34,10 @@ class MockEntity:
 @pytest.fixture(autouse=True)
 def mock_telethon_client():
     # Mock the TelegramClient that gets used in the code
+    # Repost and delete both connect through src.reposter.open_client
     with patch('src.reposter.TelegramClient', autospec=True) as mock_client_cls, \
-         patch('src.delete.TelegramClient', autospec=True) as mock_delete_client_cls, \
          patch('src.reposter.DummyClient.delete_messages', new_callable=AsyncMock) as mock_delete_messages:
         mock_client = mock_client_cls.return_value
-        mock_delete_client_cls.return_value = mock_client
         mock_client.delete_messages = mock_delete_messages
 
         # Mock async context manager
@@ -94,6 +103,59 @@ def temp_dirs():
     if os.path.exists(temp_output):
         shutil.rmtree(temp_output, ignore_errors=True)
 
+@pytest.fixture
+def sends(mock_telethon_client):
+    """The mock client, with sent messages numbered from 100 on"""
+    counter = iter(range(100, 10_000))
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(next(counter))
+    # Let SystemExit escape the client context like the real client does
+    mock_telethon_client.__aexit__.return_value = False
+    return mock_telethon_client
+
+@pytest.fixture
+def write_source(temp_dirs, tmp_path):
+    """Write a list of URLs to a source_urls.txt under tmp_path and return its path"""
+    def write(urls):
+        path = str(tmp_path / "source_urls.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(url + "\n" for url in urls)
+        return path
+
+    return write
+
+@pytest.fixture
+def write_delete_file(temp_dirs):
+    """Write a list of URLs to a delete file in the output directory and return its path"""
+    def write(urls):
+        path = Path(temp_dirs[1]) / "to_delete.txt"
+        path.write_text("".join(url + "\n" for url in urls))
+        return path
+
+    return write
+
+@pytest.fixture
+def run_files(temp_dirs):
+    """List the run files of a destination slug, optionally with a tag suffix"""
+    def list_run_files(slug, suffix=""):
+        return sorted(Path(temp_dirs[1]).glob(f"*_{slug}{suffix}.txt"))
+
+    return list_run_files
+
+@pytest.fixture
+def produce():
+    """Run the pipeline's produce stage over a simulated server and return the queued items"""
+    from src.pipeline import produce_items
+
+    def run(server, urls, **kwargs):
+        async def scenario():
+            queue = asyncio.Queue()
+            await produce_items(server.client(), urls, queue, **kwargs)
+            return await drain_queue(queue)
+
+        return asyncio.run(scenario())
+
+    return run
+
 @pytest.fixture
 def test_env():
     """Provide test environment variables"""
@@ -105,6 +167,13 @@ def test_env():
 
 @pytest.fixture(autouse=True)
 def mock_asyncio_sleep():
-    """Mock asyncio.sleep to ensure tests run instantly"""
-    with patch('asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+    """Mock asyncio.sleep to ensure tests run instantly; the rate limiter's clock still moves on by the time slept"""
+    slept = [0.0]
+
+    async def advance(seconds, *args, **kwargs):
+        slept[0] += max(seconds, 0)
+
+    clock = SimpleNamespace(monotonic=lambda: time.monotonic() + slept[0])
+    with patch('asyncio.sleep', new_callable=AsyncMock, side_effect=advance) as mock_sleep, \
+         patch('src.rate_limit.time', clock):
         yield mock_sleep
@@ -0,0 +1,36 @@
+import pytest
+
+from src.delete import delete_from_file, format_ids
+
+
+def test_format_ids_collapses_runs():
+    assert format_ids([1, 2, 3, 7, 9, 10]) == "1-3, 7, 9-10"
+    assert format_ids([]) == ""
+
+
+@pytest.mark.asyncio
+async def test_deletes_in_chunks_of_100_per_channel(write_delete_file, mock_telethon_client):
+    urls = [f"https://t.me/c/123/{i}" for i in range(1, 251)]
+    urls += ["https://t.me/other/5", "https://t.me/c/123/1"]  # second channel + duplicate
+    path = write_delete_file(urls)
+
+    await delete_from_file(str(path))
+
+    calls = mock_telethon_client.delete_messages.call_args_list
+    assert [len(call.args[1]) for call in calls] == [100, 100, 50, 1]
+    assert calls[0].args[1] == list(range(1, 101))
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_reported(write_delete_file, mock_telethon_client, capsys):
+    path = write_delete_file([f"https://t.me/c/123/{i}" for i in range(1, 151)])
+    mock_telethon_client.delete_messages.side_effect = [None, Exception("Delete failed")]
+
+    with pytest.raises(SystemExit):
+        await delete_from_file(str(path))
+
+    err = capsys.readouterr().err
+    assert "chunk 2/2" in err
+    assert "101-150" in err
+    assert "Already deleted from -100123: 1-100" in err
+    assert path.exists()
@@ -0,0 +1,26 @@
+import pytest
+
+from src.delete import delete_from_file
+
+
+@pytest.mark.asyncio
+async def test_each_channel_resolved_once(write_delete_file, mock_telethon_client):
+    urls = [f"https://t.me/c/123/{i}" for i in range(1, 6)] + ["https://t.me/c/456/1"]
+    path = write_delete_file(urls)
+
+    await delete_from_file(str(path))
+
+    resolved = sorted(call.args[0] for call in mock_telethon_client.get_entity.call_args_list)
+    assert resolved == [-100456, -100123]
+
+
+@pytest.mark.asyncio
+async def test_unresolvable_channel_aborts_before_any_delete(write_delete_file, mock_telethon_client):
+    path = write_delete_file(["https://t.me/c/123/1", "https://t.me/broken/2"])
+    mock_telethon_client.get_input_entity.side_effect = Exception("Input entity failed")
+
+    with pytest.raises(SystemExit):
+        await delete_from_file(str(path))
+
+    mock_telethon_client.delete_messages.assert_not_called()
+    assert path.exists()
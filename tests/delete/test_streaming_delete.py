@@ -0,0 +1,20 @@
+from src.delete import _IdBitmap, iter_delete_chunks
+
+
+def test_id_bitmap_detects_duplicates():
+    seen = _IdBitmap()
+    assert seen.add(5)
+    assert seen.add(1_000_000)
+    assert not seen.add(5)
+    assert not seen.add(1_000_000)
+
+
+def test_chunks_are_emitted_per_channel_as_soon_as_full(tmp_path):
+    path = tmp_path / "to_delete.txt"
+    lines = [f"https://t.me/c/1/{i}" for i in range(1, 4)]
+    lines += ["https://t.me/c/2/9", "not a url", "https://t.me/c/1/4", "https://t.me/c/1/2"]
+    path.write_text("\n".join(lines) + "\n")
+
+    chunks = list(iter_delete_chunks(path, skip={("-1001", 3)}, size=2))
+
+    assert chunks == [("-1001", [1, 2]), ("-1001", [4]), ("-1002", [9])]
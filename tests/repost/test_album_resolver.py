@@ -0,0 +1,76 @@
+import pytest
+
+from src.pipeline import AlbumResolver, RecentAlbums
+from src.reposter import repost_from_file
+from tests.conftest import MockMessage
+from tests.test_file_repost import (
+    make_album_get_messages_side_effect,
+    read_dest_urls,
+    write_source_urls,
+)
+
+DEST_PUBLIC = "@dummy_channel991"
+
+
+def _album(first_id, size, grouped_id=555):
+    msgs = [MockMessage(first_id + n, text="Caption" if n == 0 else None, media=object()) for n in range(size)]
+    for m in msgs:
+        m.grouped_id = grouped_id
+    return msgs
+
+
+@pytest.mark.asyncio
+async def test_window_grows_only_until_boundary(mock_telethon_client):
+    msgs = _album(100, 10)
+    mock_telethon_client.get_messages.side_effect = make_album_get_messages_side_effect(msgs)
+    resolver = AlbumResolver(mock_telethon_client)
+
+    album = await resolver.resolve("src", msgs[-1])
+
+    assert [m.id for m in album] == list(range(100, 110))
+    # 104..108 + 110..114 first, then only the missing lower part
+    assert mock_telethon_client.get_messages.call_count == 2
+    assert resolver._albums.get(("src", 555)) is album
+
+
+@pytest.mark.asyncio
+async def test_known_neighbours_are_not_fetched_again(mock_telethon_client):
+    msgs = _album(10, 2)
+    resolver = AlbumResolver(mock_telethon_client)
+    resolver.seed("src", 9, None)
+    resolver.seed("src", 11, msgs[1])
+    resolver.seed("src", 12, None)
+
+    album = await resolver.resolve("src", msgs[0])
+
+    assert album == msgs
+    mock_telethon_client.get_messages.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_album_members_in_input_are_sent_once(temp_dirs, mock_telethon_client):
+    msgs = _album(10, 3)
+    mock_telethon_client.get_messages.side_effect = make_album_get_messages_side_effect(msgs)
+    mock_telethon_client.send_file.side_effect = lambda dest, media_list, caption=None: [
+        MockMessage(100 + n) for n in range(len(media_list))
+    ]
+    write_source_urls([f"https://t.me/publicsource/{i}" for i in (11, 10, 12)])
+
+    await repost_from_file(DEST_PUBLIC)
+
+    assert mock_telethon_client.send_file.call_count == 1
+    assert mock_telethon_client.send_file.call_args.kwargs["caption"] == "Caption"
+    assert len(read_dest_urls()) == 3
+    # One batched prefetch and one window probe; every member was already known
+    assert mock_telethon_client.get_messages.call_count == 2
+
+
+def test_recent_albums_forget_the_least_recently_used():
+    albums = RecentAlbums([("src", 1), ("src", 2)], maxsize=3)
+    albums.add(("src", 3))
+    albums.get(("src", 1))
+
+    albums.add(("src", 4))
+
+    assert len(albums) == 3
+    assert ("src", 2) not in albums and ("src", 1) in albums
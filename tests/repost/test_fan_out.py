@@ -0,0 +1,52 @@
+import pytest
+from click.testing import CliRunner
+
+from src.cli import cli
+from src.reposter import repost_from_file
+from tests.conftest import MockMessage
+
+DESTINATIONS = ["1111111111", "2222222222"]
+
+
+def _source_urls(n):
+    return [f"https://t.me/src/{i}" for i in range(1, n + 1)]
+
+
+@pytest.mark.asyncio
+async def test_each_message_fetched_once_and_sent_to_every_destination(write_source, run_files, mock_telethon_client):
+    source = write_source(_source_urls(3))
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(
+        int(str(entity.id)[-1]) * 100 + message.id
+    )
+
+    await repost_from_file(DESTINATIONS, source, sleep_interval=0)
+
+    mock_telethon_client.get_messages.assert_called_once()
+    assert mock_telethon_client.send_message.call_count == 6
+    for dest in DESTINATIONS:
+        [run_file] = run_files(dest)
+        digit = int(dest[-1])
+        assert run_file.read_text().split() == [f"https://t.me/c/{dest}/{digit * 100 + i}" for i in (1, 2, 3)]
+
+
+@pytest.mark.asyncio
+async def test_previous_run_is_tagged_per_destination(write_source, run_files, mock_telethon_client):
+    source = write_source(_source_urls(1))
+
+    await repost_from_file(DESTINATIONS[:1], source, sleep_interval=0)
+    await repost_from_file(DESTINATIONS, source, sleep_interval=0)
+
+    assert len(run_files(DESTINATIONS[0], ".marked_for_deletion")) == 1
+    assert run_files(DESTINATIONS[1], ".marked_for_deletion") == []
+    assert len(run_files(DESTINATIONS[1])) == 1
+
+
+def test_cli_accepts_repeated_destination(write_source, mock_telethon_client):
+    source = write_source(_source_urls(1))
+
+    result = CliRunner().invoke(
+        cli, ["repost", "--destination", DESTINATIONS[0], "--destination", DESTINATIONS[1], "--source", source, "--sleep", "0"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert mock_telethon_client.send_message.call_count == 2
@@ -0,0 +1,134 @@
+import asyncio
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.bench import simulated_telegram
+from src.pipeline import HistoryFilter
+from src.reposter import get_data_dirs, repost_from_file
+from src.simulator import FakeTelegram
+from src.urls import parse_history_url
+
+SOURCE = "-1001000000001"
+DESTINATION = "-1002000000002"
+
+
+@pytest.fixture
+def server():
+    server = FakeTelegram()
+    server.add_channel(SOURCE, username="src")
+    server.add_channel(DESTINATION)
+    return server
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://t.me/src/100-5000", ("src", 100, 5000)),
+    ("https://t.me/c/1000000001/5-7", ("-1001000000001", 5, 7)),
+    ("https://t.me/src", ("src", None, None)),
+    ("https://t.me/c/1000000001/", ("-1001000000001", None, None)),
+    ("https://t.me/src/100", None),
+    ("https://t.me/c", None),
+    ("not_a_url", None),
+])
+def test_parse_history_url(url, expected):
+    assert parse_history_url(url) == expected
+
+
+def test_range_expands_into_messages_with_albums_grouped(server, produce):
+    server.populate(SOURCE, 250, album_every=10, album_size=3)
+
+    items = produce(server, ["https://t.me/src/5-204"])
+
+    assert [item.msg_id for item in items] == list(range(5, 205))
+    assert [item.index for item in items] == list(range(200))
+    assert items[0].url == "https://t.me/src/5"
+    # Messages 11-13 form an album: the first carries it, the others are duplicates
+    assert [m.id for m in items[6].album] == [11, 12, 13]
+    assert items[7].album_duplicate and items[8].album_duplicate
+    # Two pages of history, and no per-message fetches
+    assert server.calls["get_history"] == 2
+    assert server.calls["get_messages"] == 0
+
+
+def test_single_urls_and_ranges_keep_input_order(server, produce):
+    server.populate(SOURCE, 20)
+    urls = ["https://t.me/src/1", "https://t.me/src/10-12", "https://t.me/src/2"]
+
+    items = produce(server, urls)
+
+    assert [item.msg_id for item in items] == [1, 10, 11, 12, 2]
+    assert [item.index for item in items] == list(range(5))
+
+
+def test_history_filter_bounds_channel_sources(server, produce):
+    server.populate(SOURCE, 30)
+    channel = server.channel(SOURCE)
+    for msg_id, message in channel.messages.items():
+        message.date = datetime(2024, 1, msg_id)
+
+    items = produce(server, ["https://t.me/src"], history=HistoryFilter(since_id=3, until_id=25))
+    dated = produce(server, ["https://t.me/src/1-20"], history=HistoryFilter(since_date=datetime(2024, 1, 15)))
+
+    assert [item.msg_id for item in items] == list(range(3, 26))
+    assert [item.msg_id for item in dated] == list(range(15, 21))
+
+
+def test_unbounded_whole_channel_is_an_invalid_item(server, produce, capsys):
+    server.populate(SOURCE, 5)
+
+    items = produce(server, ["https://t.me/src", "https://t.me/src/2"])
+
+    assert not items[0].valid and items[1].msg_id == 2
+    assert "is a whole channel" in capsys.readouterr().err
+    assert server.calls["get_history"] == 0
+
+
+def test_completed_range_items_are_skipped(server, produce):
+    server.populate(SOURCE, 5)
+
+    items = produce(server, ["https://t.me/src/1-5"], completed={0: "https://t.me/src/1", 1: "https://t.me/src/2"})
+
+    assert [item.msg_id for item in items] == [3, 4, 5]
+
+
+def test_flood_wait_resumes_after_the_last_message(server, mock_asyncio_sleep, produce):
+    server.populate(SOURCE, 250)
+    server.inject_flood("get_history", seconds=3, every=2)
+
+    items = produce(server, ["https://t.me/src"], history=HistoryFilter(since_id=1))
+
+    assert [item.msg_id for item in items] == list(range(1, 251))
+    mock_asyncio_sleep.assert_any_await(3)
+
+
+def test_range_is_reposted_end_to_end(write_source, server):
+    server.populate(SOURCE, 12, album_every=6, album_size=3)
+    _, output_dir = get_data_dirs()
+    source = write_source(["https://t.me/src/2-10"])
+
+    with simulated_telegram(server):
+        asyncio.run(repost_from_file(DESTINATION, source, sleep_interval=0))
+
+    sent = server.channel(DESTINATION).messages
+    # 9 messages; albums 1-3 (cut by the range to 2-3) and 7-9 are each sent as a group
+    assert len(sent) == 9 and server.calls["send_file"] == 2
+    output = [Path(output_dir, name).read_text().split() for name in os.listdir(output_dir) if name.endswith(".txt")]
+    assert len(output) == 1 and len(output[0]) == 9
+
+
+def test_unreadable_source_does_not_abort_the_run(write_source, server, capsys):
+    server.populate(SOURCE, 3)
+    _, output_dir = get_data_dirs()
+    source = write_source(["https://t.me/src/1", "https://t.me/missing_channel/1-5", "https://t.me/src/2-3"])
+
+    with simulated_telegram(server), pytest.raises(SystemExit) as excinfo:
+        asyncio.run(repost_from_file(DESTINATION, source, sleep_interval=0))
+
+    assert excinfo.value.code == 1
+    assert len(server.channel(DESTINATION).messages) == 3
+    assert "Could not read https://t.me/missing_channel/1-5" in capsys.readouterr().err
+    # The run file is written and nothing is left in the state directory
+    assert len([name for name in os.listdir(output_dir) if name.endswith(".txt")]) == 1
+    assert not [name for name in os.listdir(Path(output_dir, ".state")) if name.endswith((".tmp", ".jsonl"))]
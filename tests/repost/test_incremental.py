@@ -0,0 +1,101 @@
+import asyncio
+
+from src.bench import simulated_telegram
+from src.pipeline import RepostItem
+from src.reposter import repost_from_file
+from src.simulator import FakeTelegram
+from src.utils_files import dest_slug
+from src.watermarks import Watermarks
+
+SOURCE = "-1001000000001"
+DESTINATION = "-1002000000002"
+OTHER_DESTINATION = "-1003000000003"
+SLUG = dest_slug(DESTINATION)
+
+
+def _setup(write_source, urls=("https://t.me/src",)):
+    server = FakeTelegram()
+    server.add_channel(SOURCE, username="src")
+    server.add_channel(DESTINATION)
+    server.add_channel(OTHER_DESTINATION)
+    return server, write_source(urls)
+
+
+def _mirror(server, source, destination=DESTINATION):
+    with simulated_telegram(server):
+        asyncio.run(repost_from_file(destination, source, sleep_interval=0, incremental=True))
+
+
+def test_second_run_sends_only_new_messages_and_keeps_the_first(write_source, run_files):
+    server, source = _setup(write_source)
+    server.populate(SOURCE, 5)
+    _mirror(server, source)
+
+    server.populate(SOURCE, 3)
+    server.calls.clear()
+    _mirror(server, source)
+
+    assert len(server.channel(DESTINATION).messages) == 8
+    assert server.calls["send_message"] == 3
+    assert len(run_files(SLUG)) == 2 and run_files(SLUG, ".marked_for_deletion") == []
+    with Watermarks() as watermarks:
+        assert watermarks.get("src", DESTINATION) == 8
+
+
+def test_quiet_channel_costs_one_history_call_and_no_run_file(write_source, run_files, capsys):
+    server, source = _setup(write_source)
+    server.populate(SOURCE, 5)
+    _mirror(server, source)
+
+    server.calls.clear()
+    _mirror(server, source)
+
+    assert server.calls["get_history"] == 1
+    assert server.calls["send_message"] == 0
+    assert len(run_files(SLUG)) == 1
+    assert "No new messages" in capsys.readouterr().out
+
+
+def test_destinations_sharing_a_fetch_stage_keep_their_own_marks(write_source):
+    server, source = _setup(write_source)
+    server.populate(SOURCE, 4)
+    _mirror(server, source)
+    server.populate(SOURCE, 2)
+
+    _mirror(server, source, destination=[DESTINATION, OTHER_DESTINATION])
+
+    assert len(server.channel(DESTINATION).messages) == 6
+    assert len(server.channel(OTHER_DESTINATION).messages) == 6
+    with Watermarks() as watermarks:
+        assert watermarks.get("src", DESTINATION) == watermarks.get("src", OTHER_DESTINATION) == 6
+
+
+def test_single_message_urls_are_not_tracked(write_source):
+    server, source = _setup(write_source, ["https://t.me/src/2"])
+    server.populate(SOURCE, 3)
+
+    _mirror(server, source)
+
+    with Watermarks() as watermarks:
+        assert watermarks.for_destination(DESTINATION) == {}
+
+
+def test_failed_send_holds_the_mark(temp_dirs):
+    from src.reposter import DestinationRun
+
+    run = DestinationRun(DESTINATION, DESTINATION, "slug", "ts", "out.txt", None, None, incremental=True)
+    items = [RepostItem(i, f"https://t.me/src/{i}", "src", i, mark_key="src") for i in (1, 2, 3)]
+
+    run.track(items[0])
+    run.track(items[1], ok=False)
+    run.track(items[2])
+
+    assert run.mirrored == {"src": 1} and run.held == {"src"}
+
+
+def test_marks_never_move_back(tmp_path):
+    with Watermarks(tmp_path / "marks.sqlite") as watermarks:
+        watermarks.advance("@Src", DESTINATION, 10)
+        watermarks.advance("src", DESTINATION, 7)
+
+        assert watermarks.get("src", DESTINATION) == 10
@@ -0,0 +1,128 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from telethon import errors
+from telethon.tl import types
+
+from src.media_store import MediaStore, send_media
+from src.reposter import repost_from_file
+from tests.repost.test_message_cache import SOURCE, _message
+
+PRIVATE_CHANNEL = "2763892937"
+OTHER_CHANNEL = "-1001234567890"
+
+
+def _sent(msg_id, photo_id):
+    return _message(msg_id, "", photo_id=photo_id)
+
+
+class ProtectedSource:
+    """Mock behaviour of a source channel that restricts forwarding."""
+
+    def __init__(self, client):
+        self.client = client
+        self.next_id = 100
+        self.sent_files = []
+        client.get_messages.side_effect = lambda entity, ids=None: [SOURCE.get(i) for i in ids]
+        client.send_file.side_effect = self.send_file
+        client.download_media.side_effect = self.download_media
+        client.upload_file.side_effect = lambda path: types.InputFile(id=1, parts=1, name=Path(path).name, md5_checksum="")
+
+    def send_file(self, entity, files, caption=None, **kwargs):
+        self.sent_files.append(files)
+        if any(isinstance(f, types.MessageMediaPhoto) for f in files):
+            raise errors.ChatForwardsRestrictedError(None)
+        sent = []
+        for _ in files:
+            self.next_id += 1
+            sent.append(_sent(self.next_id, photo_id=1000 + self.next_id))
+        return sent
+
+    async def download_media(self, media, file=None):
+        Path(file).write_bytes(b"photo-%d" % media.photo.id)
+        return file
+
+
+@pytest.fixture
+def protected(mock_telethon_client):
+    return ProtectedSource(mock_telethon_client)
+
+
+@pytest.mark.asyncio
+async def test_protected_album_is_uploaded_once_for_all_destinations_and_runs(write_source, protected):
+    source = write_source(["https://t.me/src/10"])
+
+    await repost_from_file([PRIVATE_CHANNEL, OTHER_CHANNEL], source, sleep_interval=0)
+
+    assert protected.client.download_media.call_count == 3
+    assert protected.client.upload_file.call_count == 3
+    # Each destination tried the reference once; the second one sent the first one's handles
+    copies = [files for files in protected.sent_files if not isinstance(files[0], types.MessageMediaPhoto)]
+    assert [type(f) for f in copies[0]] == [types.InputMediaUploadedPhoto] * 3
+    assert [type(f) for f in copies[1]] == [types.InputMediaPhoto] * 3
+
+    protected.client.download_media.reset_mock()
+    protected.client.upload_file.reset_mock()
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0, force=True)
+
+    protected.client.download_media.assert_not_called()
+    protected.client.upload_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_expired_handle_is_refreshed_from_its_destination_message(temp_dirs, tmp_path, protected):
+    store = MediaStore(tmp_path / "media")
+    media_list = [_message(30, photo_id=9).media]
+    calls = []
+
+    async def send_reference():
+        raise errors.ChatForwardsRestrictedError(None)
+
+    async def send_copies(files):
+        calls.append(files)
+        if len(calls) == 2:
+            raise errors.FileReferenceExpiredError(None)
+        return protected.send_file(PRIVATE_CHANNEL, files)
+
+    client = protected.client
+    await send_media(store, client, "anon", "src", PRIVATE_CHANNEL, media_list, send_reference, send_copies)
+    carrier = _sent(500, photo_id=77)
+    client.get_messages.side_effect = lambda entity, ids=None: carrier
+    await send_media(store, client, "anon", "src", PRIVATE_CHANNEL, media_list, send_reference, send_copies)
+
+    assert client.upload_file.call_count == 1
+    client.get_messages.assert_called_once_with(-1002763892937, ids=101)
+    # The retry used the handle of the refreshed carrier message
+    assert calls[2][0].id.id == 77
+    store.close()
+
+
+def test_blobs_are_content_addressed_and_evicted_lru(tmp_path, protected, monkeypatch):
+    now = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr("src.media_store.time.time", lambda: next(now))
+    store = MediaStore(tmp_path / "media", max_bytes=25)
+    same_bytes = _message(1, photo_id=5).media
+
+    async def download(media, file=None):
+        Path(file).write_bytes(b"0123456789" if media.photo.id in (5, 6) else b"abcdefghij" + bytes([media.photo.id]))
+        return file
+
+    protected.client.download_media.side_effect = download
+
+    async def scenario():
+        first = await store.input_media(protected.client, "anon", same_bytes)
+        again = await store.input_media(protected.client, "anon", _message(2, photo_id=6).media)
+        other = await store.input_media(protected.client, "anon", _message(3, photo_id=7).media)
+        last = await store.input_media(protected.client, "anon", _message(4, photo_id=8).media)
+        return first, again, other, last
+
+    first, again, other, last = asyncio.run(scenario())
+
+    # Photos 5 and 6 have identical bytes and share a blob
+    assert first[0] == again[0]
+    assert len({first[0], other[0], last[0]}) == 3
+    # 3 blobs of 10-11 bytes exceed 25 bytes: the least recently used one is gone
+    assert not store.blob_path(first[0]).exists()
+    assert store.blob_path(other[0]).exists() and store.blob_path(last[0]).exists()
+    store.close()
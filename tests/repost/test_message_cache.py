@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from telethon import errors
+from telethon.tl import types
+
+from src.message_cache import MessageCache, message_cache_path
+from src.prefetch import prefetch
+from src.reposter import get_data_dirs, repost_from_file
+from tests.conftest import MockMessage
+
+PRIVATE_CHANNEL = "2763892937"
+
+
+def _message(msg_id, text="Post", grouped_id=None, photo_id=None):
+    media = None
+    if photo_id is not None:
+        photo = types.Photo(
+            id=photo_id, access_hash=7, file_reference=b"ref", date=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            sizes=[], dc_id=2,
+        )
+        media = types.MessageMediaPhoto(photo=photo)
+    return types.Message(
+        id=msg_id, peer_id=types.PeerChannel(1), date=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        message=text, grouped_id=grouped_id, media=media,
+    )
+
+
+# 10..12 form an album, 20 is a single post
+SOURCE = {
+    10: _message(10, "Album caption", grouped_id=77, photo_id=1),
+    11: _message(11, "", grouped_id=77, photo_id=2),
+    12: _message(12, "", grouped_id=77, photo_id=3),
+    20: _message(20, "Single post"),
+}
+
+
+@pytest.fixture
+def source_channel(mock_telethon_client):
+    mock_telethon_client.get_messages.side_effect = lambda entity, ids=None: [SOURCE.get(i) for i in ids]
+    counter = iter(range(100, 10_000))
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(next(counter))
+    mock_telethon_client.send_file.side_effect = lambda entity, files, caption=None: [
+        MockMessage(next(counter)) for _ in files
+    ]
+    return mock_telethon_client
+
+
+@pytest.mark.asyncio
+async def test_repost_after_prefetch_does_not_fetch(write_source, source_channel):
+    source = write_source(["https://t.me/src/11", "https://t.me/src/20", "https://t.me/src/12"])
+
+    assert await prefetch(source) == 4
+    source_channel.get_messages.reset_mock()
+
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    source_channel.get_messages.assert_not_called()
+    # The album is sent once, with all members and the caption read from the cache
+    source_channel.send_file.assert_called_once()
+    files = source_channel.send_file.call_args.args[1]
+    assert [media.photo.id for media in files] == [1, 2, 3]
+    assert source_channel.send_file.call_args.kwargs["caption"] == "Album caption"
+    assert source_channel.send_message.call_args.args[1].message == "Single post"
+
+
+@pytest.mark.asyncio
+async def test_messages_missing_from_cache_are_fetched(write_source, source_channel):
+    await prefetch(write_source(["https://t.me/src/20"]))
+    source_channel.get_messages.reset_mock()
+
+    await repost_from_file(PRIVATE_CHANNEL, write_source(["https://t.me/src/20", "https://t.me/src/10"]), sleep_interval=0)
+
+    fetched_ids = sorted(i for call in source_channel.get_messages.call_args_list for i in call.kwargs["ids"])
+    assert 20 not in fetched_ids and 10 in fetched_ids
+    source_channel.send_file.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_expired_file_reference_is_fetched_again(write_source, source_channel):
+    source = write_source(["https://t.me/src/10"])
+    await prefetch(source)
+    source_channel.get_messages.reset_mock()
+    sent = source_channel.send_file.side_effect
+    calls = []
+
+    def send_file(entity, files, caption=None):
+        calls.append(files)
+        if len(calls) == 1:
+            raise errors.FileReferenceExpiredError(None)
+        return sent(entity, files, caption)
+
+    source_channel.send_file.side_effect = send_file
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    assert len(calls) == 2
+    assert sorted(source_channel.get_messages.call_args.kwargs["ids"]) == [10, 11, 12]
+    _, output_dir = get_data_dirs()
+    [run_file] = Path(output_dir).glob(f"*_{PRIVATE_CHANNEL}.txt")
+    assert len(run_file.read_text().splitlines()) == 3
+
+
+def test_stale_entries_are_ignored(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.message_cache.time.time", lambda: now[0])
+    with MessageCache(tmp_path / "cache.sqlite", ttl=60) as cache:
+        cache.store("@src", SOURCE[20])
+        assert cache.get("src", 20).message == "Single post"
+
+        now[0] += 61
+        assert cache.get("src", 20) is None
+        assert cache.evict() == 1
+
+
+def test_album_hit_needs_every_member(tmp_path):
+    with MessageCache(tmp_path / "cache.sqlite") as cache:
+        cache.store_album("src", [SOURCE[10], SOURCE[11], SOURCE[12]])
+        assert [m.id for m in cache.get_album("src", 77)] == [10, 11, 12]
+
+        cache._connect().execute("DELETE FROM messages WHERE msg_id = 11")
+        assert cache.get_album("src", 77) is None
+
+
+def test_eviction_drops_least_recently_used(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr("src.message_cache.time.time", lambda: now[0])
+    with MessageCache(tmp_path / "cache.sqlite") as cache:
+        for msg_id in (1, 2, 3):
+            now[0] += 1
+            cache.store("src", _message(msg_id))
+        cache.max_bytes = 2 * cache._connect().execute("SELECT MAX(size) FROM messages").fetchone()[0]
+        now[0] += 1
+        cache.get("src", 1)
+
+        assert cache.evict() == 1
+        assert cache.get("src", 1) is not None
+        assert cache.get("src", 2) is None
+        assert cache.get("src", 3) is not None
+
+
+def test_reading_does_not_create_a_cache(tmp_path):
+    cache = MessageCache(tmp_path / "cache.sqlite")
+
+    assert cache.get("src", 1) is None
+    assert not cache.path.exists()
+    # Telethon objects only; anything else is left to the fetch stage
+    assert cache.store("src", MockMessage(1)) is False
+
+
+def test_each_session_has_its_own_cache():
+    assert message_cache_path("anon").name == "message_cache.sqlite"
+    assert message_cache_path("acct2").name == "message_cache.acct2.sqlite"
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from src.pipeline import PIPELINE_QUEUE_SIZE, produce_items
+from src.reposter import repost_from_file, get_data_dirs
+from tests.conftest import MockMessage, drain_queue
+
+DEST_PUBLIC = "@dummy_channel991"
+
+
+@pytest.mark.asyncio
+async def test_items_are_queued_in_input_order(mock_telethon_client):
+    urls = ["https://t.me/a/3", "not_a_url", "https://t.me/b/1", "https://t.me/a/1", "https://t.me/c/5/9"]
+    queue = asyncio.Queue(maxsize=2)
+
+    producer = asyncio.create_task(produce_items(mock_telethon_client, urls, queue, window=2))
+    items = await drain_queue(queue)
+    await producer
+
+    assert [item.url for item in items] == urls
+    assert [item.index for item in items] == list(range(len(urls)))
+    assert not items[1].valid
+    assert items[0].message.id == 3
+    assert items[4].source_id == -1005
+
+
+@pytest.mark.asyncio
+async def test_fetch_errors_are_attached_to_items(mock_telethon_client):
+    mock_telethon_client.get_messages.side_effect = Exception("boom")
+    queue = asyncio.Queue()
+
+    await produce_items(mock_telethon_client, ["https://t.me/a/1"], queue)
+    items = await drain_queue(queue)
+
+    assert str(items[0].error) == "boom"
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_is_bounded(temp_dirs, mock_telethon_client):
+    input_dir, _ = get_data_dirs()
+    source = os.path.join(input_dir, "source_urls.txt")
+    Path(source).write_text("".join(f"https://t.me/src/{i}\n" for i in range(1, 1001)))
+    fetches_at_first_send = []
+
+    def send_message(entity, message):
+        if not fetches_at_first_send:
+            fetches_at_first_send.append(mock_telethon_client.get_messages.call_count)
+        return MockMessage(message.id)
+
+    mock_telethon_client.send_message.side_effect = send_message
+
+    await repost_from_file(DEST_PUBLIC, source, sleep_interval=0)
+
+    # Sending started before every window was fetched, and fetching never ran further
+    # ahead than the queue allows
+    assert fetches_at_first_send[0] <= PIPELINE_QUEUE_SIZE // 100 + 1
+    assert mock_telethon_client.get_messages.call_count == 10
+    assert mock_telethon_client.send_message.call_count == 1000
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from src.reposter import repost_from_file, get_data_dirs, prefetch_messages
+from tests.conftest import MockMessage
+
+DEST_PUBLIC = "@dummy_channel991"
+
+
+@pytest.mark.asyncio
+async def test_prefetch_groups_by_source_in_chunks(mock_telethon_client):
+    refs = [("chan_a", i) for i in range(1, 251)] + [("chan_b", 7), ("chan_a", 3)]
+
+    fetched = await prefetch_messages(mock_telethon_client, refs)
+
+    # 250 unique IDs from chan_a -> 3 chunks, chan_b -> 1 chunk
+    assert mock_telethon_client.get_messages.call_count == 4
+    for call in mock_telethon_client.get_messages.call_args_list:
+        assert len(call.kwargs["ids"]) <= 100
+    assert fetched[("chan_a", 250)].id == 250
+    assert fetched[("chan_b", 7)].id == 7
+
+
+@pytest.mark.asyncio
+async def test_prefetch_records_batch_errors(mock_telethon_client):
+    mock_telethon_client.get_messages.side_effect = Exception("boom")
+
+    fetched = await prefetch_messages(mock_telethon_client, [("chan_a", 1), ("chan_a", 2)])
+
+    assert isinstance(fetched[("chan_a", 1)], Exception)
+    assert isinstance(fetched[("chan_a", 2)], Exception)
+
+
+@pytest.mark.asyncio
+async def test_repost_sends_in_input_order_from_prefetch(write_source, mock_telethon_client):
+    msg_ids = [5, 3, 9, 1]
+    source = write_source([f"https://t.me/publicsource/{i}" for i in msg_ids])
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(1000 + message.id)
+
+    await repost_from_file(DEST_PUBLIC, source, sleep_interval=0)
+
+    # A single batched read for all four messages
+    assert mock_telethon_client.get_messages.call_count == 1
+    _, output_dir = get_data_dirs()
+    out_files = [p for p in Path(output_dir).glob("*.txt") if p.name.count(".") == 1]
+    lines = out_files[0].read_text().split()
+    assert lines == [f"https://t.me/{DEST_PUBLIC}/{1000 + i}" for i in msg_ids]
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from telethon.tl import types
+
+from src.pipeline import HistoryFilter, SourceQuery, mark_key
+from src.simulator import FakeTelegram
+
+SOURCE = "-1001000000001"
+
+
+@pytest.fixture
+def server():
+    """500 messages: every 10th is a photo by @alice, every 25th mentions cats."""
+    server = FakeTelegram()
+    server.add_channel(SOURCE, username="src")
+    channel = server.channel(SOURCE)
+    for i in range(1, 501):
+        channel.allocate(
+            message=f"post {i}" + (" about Cats" if i % 25 == 0 else ""),
+            media=f"photo-{i}" if i % 10 == 0 else None,
+            from_id="alice" if i % 10 == 0 else "bob",
+            date=datetime(2024, 1, 1 + i // 20),
+        )
+    return server
+
+
+def test_parse_query():
+    query = SourceQuery.parse("type=photo&search=a+cat&from=@alice&since=2024-01-01&until=2024-02-01T12:00:00")
+
+    assert query == SourceQuery("photo", "a cat", "@alice", datetime(2024, 1, 1), datetime(2024, 2, 1, 12))
+    request = query.search_request("src", after=41, since_date=query.since_date, until_date=query.until_date)
+    assert isinstance(request.filter, types.InputMessagesFilterPhotos)
+    assert (request.q, request.from_id, request.offset_id, request.add_offset) == ("a cat", "@alice", 42, -100)
+    assert (request.min_date, request.max_date) == (datetime(2024, 1, 1), datetime(2024, 2, 1, 12))
+    assert not SourceQuery.parse("")
+
+
+@pytest.mark.parametrize("query", ["type=sticker", "colour=red", "search=", "since=yesterday"])
+def test_invalid_queries_are_rejected(query):
+    with pytest.raises(ValueError):
+        SourceQuery.parse(query)
+
+
+def test_type_filter_is_pushed_to_the_server(server, produce):
+    items = produce(server, ["https://t.me/src?type=photo"])
+
+    assert [item.msg_id for item in items] == list(range(10, 501, 10))
+    # Only the 50 photos were read, in one search page, instead of 5 history pages
+    assert server.calls["search"] == 1 and server.calls["get_history"] == 0
+
+
+def test_search_author_and_dates_combine_with_ranges(server, produce):
+    cats = produce(server, ["https://t.me/src/1-300?search=cats"])
+    by_alice = produce(server, ["https://t.me/src?from=@alice&since=2024-01-05&until=2024-01-08"])
+
+    assert [item.msg_id for item in cats] == list(range(25, 301, 25))
+    # Jan 5 to Jan 7 hold messages 80-139
+    assert [item.msg_id for item in by_alice] == [80, 90, 100, 110, 120, 130]
+
+
+def test_dates_bound_searches_from_both_sides(server, produce):
+    photos = produce(
+        server, ["https://t.me/src?type=photo&until=2024-01-10"], history=HistoryFilter(since_date=datetime(2024, 1, 8)),
+    )
+
+    # Jan 8 to Jan 9 hold messages 140-179
+    assert [item.msg_id for item in photos] == [140, 150, 160, 170]
+    assert server.calls["search"] == 1
+
+
+def test_simulated_search_offset_date_is_an_upper_bound(server):
+    async def scenario():
+        client = server.client()
+        return [m.id async for m in client.iter_messages(
+            SOURCE, reverse=True, filter=types.InputMessagesFilterPhotos, offset_date=datetime(2024, 1, 3),
+        )]
+
+    # As Telethon sends it as the search's max_date
+    assert asyncio.run(scenario()) == [10, 20, 30]
+
+
+def test_invalid_query_source_is_an_invalid_item(server, capsys, produce):
+    items = produce(server, ["https://t.me/src?type=sticker", "https://t.me/src/3"])
+
+    assert not items[0].valid and items[1].msg_id == 3
+    assert "Invalid source query" in capsys.readouterr().err
+    assert server.calls["search"] == 0
+
+
+def test_filtered_sources_have_their_own_marks(server, produce):
+    seen = []
+
+    def marks(key):
+        seen.append(key)
+        return 400 if key == "src" else None
+
+    photos = produce(server, ["https://t.me/src?type=photo", "https://t.me/src"], marks=marks)
+
+    assert seen == [mark_key("src", SourceQuery("photo")), "src"] == ["src?type=photo", "src"]
+    assert len(photos) == 50 + 100
+    assert photos[0].mark_key == "src?type=photo" and photos[-1].mark_key == "src"
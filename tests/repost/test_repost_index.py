@@ -0,0 +1,113 @@
+import pytest
+
+from src.delete import delete_from_file
+from src.repost_index import RepostIndex, content_hash, source_key
+from src.reposter import repost_from_file
+from tests.conftest import MockMessage
+
+PRIVATE_CHANNEL = "2763892937"
+DEST_URL = "https://t.me/c/2763892937/{}"
+
+
+@pytest.mark.asyncio
+async def test_second_run_reuses_posts_instead_of_sending(write_source, run_files, sends):
+    source = write_source(["https://t.me/src/1", "https://t.me/src/2"])
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+    sends.send_message.reset_mock()
+
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    sends.send_message.assert_not_called()
+    [current] = run_files(PRIVATE_CHANNEL)
+    assert current.read_text().splitlines() == [DEST_URL.format(100), DEST_URL.format(101)]
+    # The previous run is still tagged, but owns nothing any more
+    assert len(run_files(PRIVATE_CHANNEL, ".marked_for_deletion")) == 1
+    index = RepostIndex()
+    assert index.owned_elsewhere(f"-100{PRIVATE_CHANNEL}", current.stem) == set()
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_force_sends_again(write_source, run_files, sends):
+    source = write_source(["https://t.me/src/1"])
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0, force=True)
+
+    assert sends.send_message.call_count == 2
+    [current] = run_files(PRIVATE_CHANNEL)
+    assert current.read_text().splitlines() == [DEST_URL.format(101)]
+
+
+@pytest.mark.asyncio
+async def test_edited_source_message_is_sent_again(write_source, sends):
+    source = write_source(["https://t.me/src/1"])
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    sends.get_messages.side_effect = lambda entity, ids=None: [MockMessage(i, text="edited") for i in ids]
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    assert sends.send_message.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_post_deleted_from_the_destination_is_sent_again(write_source, run_files, sends):
+    source = write_source(["https://t.me/src/1", "https://t.me/src/2"])
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+    sends.send_message.reset_mock()
+    sends.get_messages.reset_mock()
+
+    # Destination message 100 (the copy of src/1) was deleted by hand
+    sends.get_messages.side_effect = lambda entity, ids=None: [None if i == 100 else MockMessage(i) for i in ids]
+    await repost_from_file(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    assert sends.send_message.call_count == 1
+    [current] = run_files(PRIVATE_CHANNEL)
+    assert current.read_text().splitlines() == [DEST_URL.format(102), DEST_URL.format(101)]
+    # One source fetch and one liveness check covering both indexed posts
+    liveness = [c for c in sends.get_messages.await_args_list if 100 in (c.kwargs.get("ids") or ())]
+    assert len(liveness) == 1 and liveness[0].kwargs["ids"] == [100, 101]
+    with RepostIndex() as index:
+        assert index.lookup(f"-100{PRIVATE_CHANNEL}", source_key("src", 1))[0] == [102]
+
+
+@pytest.mark.asyncio
+async def test_delete_keeps_reused_posts_and_forgets_deleted_ones(write_source, sends):
+    await repost_from_file(PRIVATE_CHANNEL, write_source(["https://t.me/src/1", "https://t.me/src/2"]), sleep_interval=0)
+    await repost_from_file(PRIVATE_CHANNEL, write_source(["https://t.me/src/2"]), sleep_interval=0)
+
+    await delete_from_file(destination=PRIVATE_CHANNEL)
+
+    # Only the post of src/1 belonged to the deleted run; src/2 was reused by the current one
+    sends.delete_messages.assert_called_once()
+    assert sends.delete_messages.call_args.args[1] == [100]
+    index = RepostIndex()
+    assert index.lookup(f"-100{PRIVATE_CHANNEL}", source_key("src", 1)) is None
+    assert index.lookup(f"-100{PRIVATE_CHANNEL}", source_key("src", 2))[0] == [101]
+    index.close()
+
+    # A deleted post is sent again the next time its source is listed
+    sends.send_message.reset_mock()
+    await repost_from_file(PRIVATE_CHANNEL, write_source(["https://t.me/src/1", "https://t.me/src/2"]), sleep_interval=0)
+    assert sends.send_message.call_count == 1
+
+
+def test_index_lookup_prefers_newest_run(tmp_path):
+    with RepostIndex(tmp_path / "index.sqlite") as index:
+        index.record("@Dest", ["src/1"], [10], "20250101_000000_dest", "h1")
+        index.record("dest", ["src/1"], [20, 21], "20250102_000000_dest", "h2")
+
+        assert index.lookup("@dest", "src/1") == ([20, 21], "h2")
+        assert index.owned_elsewhere("dest", "20250102_000000_dest") == {10}
+
+        index.claim("dest", [10], "20250102_000000_dest")
+        assert index.owned_elsewhere("dest", "20250102_000000_dest") == set()
+
+        index.forget("dest", [20, 21])
+        assert index.lookup("dest", "src/1") == ([10], "h1")
+
+
+def test_content_hash_covers_text_and_album_members():
+    assert content_hash(MockMessage(1, text="a")) != content_hash(MockMessage(1, text="b"))
+    assert content_hash([MockMessage(1, text="a")]) == content_hash(MockMessage(1, text="a"))
+    assert content_hash([MockMessage(1, text="a"), MockMessage(2, text="")]) != content_hash(MockMessage(1, text="a"))
@@ -0,0 +1,55 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from src.reposter import repost_from_file, get_data_dirs
+from src.utils_files import iter_url_lines
+from tests.conftest import MockMessage
+
+DEST_PUBLIC = "@dummy_channel991"
+
+
+def test_iter_url_lines_skips_blank_lines(tmp_path):
+    path = tmp_path / "urls.txt"
+    path.write_text("  https://t.me/a/1 \n\n\nhttps://t.me/a/2\n")
+
+    assert list(iter_url_lines(path)) == ["https://t.me/a/1", "https://t.me/a/2"]
+
+
+@pytest.mark.asyncio
+async def test_source_dash_reads_stdin(temp_dirs, mock_telethon_client, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("https://t.me/src/1\n\nhttps://t.me/src/2\n"))
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(100 + message.id)
+
+    await repost_from_file(DEST_PUBLIC, "-", sleep_interval=0)
+
+    _, output_dir = get_data_dirs()
+    [run_file] = Path(output_dir).glob("*_dummy_channel991.txt")
+    assert run_file.read_text().split() == [f"https://t.me/{DEST_PUBLIC}/101", f"https://t.me/{DEST_PUBLIC}/102"]
+
+
+@pytest.mark.asyncio
+async def test_first_send_does_not_wait_for_whole_input(temp_dirs, mock_telethon_client, monkeypatch):
+    lines_read = []
+
+    class CountingStdin:
+        def __iter__(self):
+            for i in range(1, 1001):
+                lines_read.append(i)
+                yield f"https://t.me/src/{i}\n"
+
+    monkeypatch.setattr("sys.stdin", CountingStdin())
+    read_at_first_send = []
+
+    def send_message(entity, message):
+        if not read_at_first_send:
+            read_at_first_send.append(len(lines_read))
+        return MockMessage(message.id)
+
+    mock_telethon_client.send_message.side_effect = send_message
+
+    await repost_from_file(DEST_PUBLIC, "-", sleep_interval=0)
+
+    assert read_at_first_send[0] < 1000
+    assert mock_telethon_client.send_message.call_count == 1000
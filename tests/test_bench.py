@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from telethon import errors
+
+from src.bench import (
+    BenchResult, find_regressions, load_results, run_benchmark, save_results, simulated_telegram,
+)
+from src.pipeline import prefetch_messages
+from src.simulator import FakeTelegram
+
+
+def test_populate_lays_out_albums_with_consecutive_ids():
+    server = FakeTelegram()
+    server.add_channel("-1001000000001", username="src")
+
+    ids = server.populate("@src", 10, album_every=5, album_size=3)
+    channel = server.channel("-1001000000001")
+
+    assert ids == list(range(1, 11))
+    grouped = [channel.messages[i].grouped_id for i in ids]
+    assert grouped[0] == grouped[1] == grouped[2] is not None
+    assert grouped[3] is None and grouped[4] is None
+    assert grouped[5] == grouped[6] == grouped[7] not in (None, grouped[0])
+
+
+def test_simulated_client_counts_calls_and_allocates_ids():
+    server = FakeTelegram()
+    server.add_channel("-1002000000002")
+    server.add_channel("-1001000000001")
+    server.populate("-1001000000001", 3)
+    client = server.client()
+
+    async def scenario():
+        peer = await client.get_entity("-1002000000002")
+        fetched = await client.get_messages(peer, ids=[1, 2, 99])
+        sent = await client.send_message(peer, fetched[0])
+        album = await client.send_file(peer, ["a", "b"], caption="hi")
+        await client.delete_messages(peer, [sent.id])
+        return fetched, sent, album
+
+    fetched, sent, album = asyncio.run(scenario())
+
+    assert fetched[2] is None
+    assert sent.id == 1
+    assert [m.id for m in album] == [2, 3]
+    assert album[0].grouped_id == album[1].grouped_id and album[0].message == "hi"
+    assert 1 not in server.channel("-1002000000002").messages
+    assert server.calls == {"get_entity": 1, "get_messages": 1, "send_message": 1, "send_file": 1, "delete_messages": 1}
+    assert server.total_calls == 5
+
+
+def test_flood_injection_and_latency(mock_asyncio_sleep):
+    server = FakeTelegram(latency={"get_messages": 0.25})
+    server.add_channel("-1001000000001")
+    server.inject_flood("get_messages", seconds=7, every=2)
+    client = server.client()
+
+    async def scenario():
+        await client.get_messages("-1001000000001", ids=[1])
+        with pytest.raises(errors.FloodWaitError) as excinfo:
+            await client.get_messages("-1001000000001", ids=[1])
+        return excinfo.value
+
+    flood = asyncio.run(scenario())
+
+    assert flood.seconds == 7
+    mock_asyncio_sleep.assert_any_await(0.25)
+
+
+def test_batched_prefetch_cost_is_visible_in_call_counts():
+    server = FakeTelegram()
+    server.add_channel("-1001000000001")
+    ids = server.populate("-1001000000001", 250)
+
+    fetched = asyncio.run(prefetch_messages(server.client(), [(-1001000000001, i) for i in ids]))
+
+    assert len(fetched) == 250
+    assert server.calls["get_messages"] == 3
+
+
+def test_unknown_username_is_rejected():
+    server = FakeTelegram()
+
+    with pytest.raises(ValueError):
+        server.channel("@missing")
+
+
+@pytest.mark.parametrize("command", ["repost", "delete", "sync"])
+def test_run_benchmark_measures_each_command(command):
+    result = run_benchmark(command, 100, album_every=20)
+
+    assert result.command == command and result.urls == 100
+    assert result.messages_per_second > 0
+    assert result.peak_memory_bytes > 0
+    assert 0 < result.api_calls_per_message < 2
+    if command == "delete":
+        # 100 URLs fit in one delete call after resolving the channel once
+        assert result.calls["delete_messages"] == 1
+    else:
+        # Albums are sent as one call, so fewer sends than URLs
+        assert result.calls["send_file"] == 5
+        assert result.calls["send_message"] == 85
+
+
+def test_simulated_telegram_restores_client_class():
+    import src.reposter as reposter
+
+    previous = reposter.TelegramClient
+    with simulated_telegram(FakeTelegram()) as server:
+        assert reposter.TelegramClient == server.client
+    assert reposter.TelegramClient is previous
+
+
+def _result(command="repost", mps=1000.0, calls=0.9, peak=1_000_000):
+    return BenchResult(command, 100, 0.1, mps, int(calls * 100), calls, peak)
+
+
+def test_results_round_trip_and_regressions(tmp_path):
+    path = tmp_path / "baseline.json"
+    save_results([_result()], path)
+    baseline = load_results(path)
+
+    assert baseline["repost@100"].messages_per_second == 1000.0
+    assert find_regressions([_result(mps=900.0, peak=1_100_000)], baseline) == []
+
+    regressions = find_regressions([_result(mps=500.0, calls=1.0, peak=3_000_000)], baseline)
+    assert len(regressions) == 3
+    assert "msgs/s" in regressions[0] and "API calls/msg" in regressions[1] and "peak memory" in regressions[2]
+    # Scenarios missing from the baseline are not compared
+    assert find_regressions([_result(command="delete", mps=1.0)], baseline) == []
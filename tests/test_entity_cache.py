@@ -0,0 +1,81 @@
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from telethon.errors import ChannelInvalidError
+from telethon.tl.types import InputPeerChannel
+
+from src.delete import delete_from_file
+from src.entity_cache import EntityCache, cache_key
+from src.reposter import get_data_dirs
+
+CHANNEL_PEER = InputPeerChannel(channel_id=123, access_hash=999)
+
+
+class TestEntityCacheStorage:
+    def test_cache_key_normalization(self):
+        assert cache_key("@MyChannel") == cache_key("mychannel")
+        assert cache_key(-100123) == "-100123"
+
+    def test_roundtrip_through_disk(self, tmp_path):
+        path = tmp_path / "cache.json"
+        cache = EntityCache(path)
+        cache.remember("@mychannel", CHANNEL_PEER)
+        cache.save()
+
+        reloaded = EntityCache(path)
+        assert reloaded.lookup("mychannel") == CHANNEL_PEER
+
+    def test_entries_expire_after_ttl(self, tmp_path):
+        cache = EntityCache(tmp_path / "cache.json", ttl=60)
+        cache.remember("mychannel", CHANNEL_PEER)
+        cache._entries["mychannel"]["resolved_at"] = time.time() - 120
+
+        assert cache.lookup("mychannel") is None
+
+    def test_objects_without_input_peer_are_not_persisted(self, tmp_path):
+        cache = EntityCache(tmp_path / "cache.json")
+        cache.remember("mychannel", object())
+        assert cache.lookup("mychannel") is None
+
+
+@pytest.mark.asyncio
+class TestEntityCacheResolution:
+    async def test_second_run_skips_get_entity(self, tmp_path, mock_telethon_client):
+        mock_telethon_client.get_entity.side_effect = None
+        mock_telethon_client.get_entity.return_value = CHANNEL_PEER
+        path = tmp_path / "cache.json"
+
+        first = EntityCache(path)
+        await first.resolve(mock_telethon_client, "mychannel")
+        first.save()
+        second = EntityCache(path)
+        assert await second.resolve(mock_telethon_client, "@mychannel") == CHANNEL_PEER
+
+        assert mock_telethon_client.get_entity.call_count == 1
+
+    async def test_stale_peer_is_invalidated_and_retried(self, tmp_path, mock_telethon_client):
+        mock_telethon_client.get_entity.side_effect = None
+        mock_telethon_client.get_entity.return_value = CHANNEL_PEER
+        cache = EntityCache(tmp_path / "cache.json")
+        cache.remember("mychannel", InputPeerChannel(channel_id=123, access_hash=1))
+
+        fn = AsyncMock(side_effect=[ChannelInvalidError(None), "ok"])
+        assert await cache.call(mock_telethon_client, "mychannel", fn) == "ok"
+
+        assert fn.call_args_list[1].args[0] == CHANNEL_PEER
+        assert cache.lookup("mychannel") == CHANNEL_PEER
+
+    async def test_delete_reuses_persisted_entities(self, temp_dirs, mock_telethon_client):
+        mock_telethon_client.get_entity.side_effect = None
+        mock_telethon_client.get_entity.return_value = CHANNEL_PEER
+        _, output_dir = get_data_dirs()
+
+        for _ in range(2):
+            path = Path(output_dir) / "to_delete.txt"
+            path.write_text("https://t.me/c/123/1\n")
+            await delete_from_file(str(path))
+
+        assert mock_telethon_client.get_entity.call_count == 1
+        assert mock_telethon_client.delete_messages.call_args.args[0] == CHANNEL_PEER
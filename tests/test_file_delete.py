@@ -303,6 +303,14 @@ class TestDeleteFromFile:
             assert result.exit_code == 0
             assert "Delete command finished." in result.output
 
+        def test_cli_delete_rejects_stdin(self, temp_dirs, mock_telethon_client):
+            """Delete reads its file twice and renames it, so '-' is refused up front."""
+            runner = CliRunner()
+            result = runner.invoke(cli, ['delete', '--delete-urls', '-'], input="https://t.me/channel/1\n")
+            assert result.exit_code == 1
+            assert "stdin" in result.output
+            mock_telethon_client.delete_messages.assert_not_called()
+
         def test_cli_delete_unknown_flag_fails(self, temp_dirs, mock_telethon_client):
             """Delete should exit non-zero with an unknown flag (typo)."""
             runner = CliRunner()
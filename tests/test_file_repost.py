@@ -30,14 +30,9 @@ def _latest_output_file(slug: str | None = None):
         return None
     return max(pattern_files, key=lambda p: p.stat().st_mtime)
 
-def create_temp_source_file(urls, filename=None):
-    """Create a temporary source file with unique name to avoid conflicts"""
-    if filename is None:
-        # Create unique filename to avoid conflicts with existing files
-        import uuid
-        filename = f"test_source_{uuid.uuid4().hex[:8]}.txt"
-
-    filepath = os.path.join(TEMP_INPUT, filename)
+def create_temp_source_file(urls, directory, filename="custom_source.txt"):
+    """Create a source file in a temporary *directory* (e.g. pytest's tmp_path)"""
+    filepath = os.path.join(directory, filename)
     with open(filepath, "w") as f:
         for url in urls:
             f.write(f"{url}\n")
@@ -315,9 +310,9 @@ class TestIntegrationScenarios:
         dest_urls = read_dest_urls()
         assert len(dest_urls) == 3
 
-    async def test_custom_source_file_path(self, temp_dirs, mock_telethon_client):
+    async def test_custom_source_file_path(self, temp_dirs, tmp_path, mock_telethon_client):
         """Test using custom source file path"""
-        custom_source = create_temp_source_file([PUBLIC_MESSAGE_URL])
+        custom_source = create_temp_source_file([PUBLIC_MESSAGE_URL], tmp_path)
 
         dest = PUBLIC_CHANNEL
 
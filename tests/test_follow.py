@@ -0,0 +1,52 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from src.follow import follow
+from src.reposter import get_data_dirs
+from tests.conftest import MockMessage
+
+DEST = "2763892937"
+SOURCE_CHAT_ID = -100123
+
+
+def _grouped(message_id, grouped_id):
+    message = MockMessage(message_id, media=object())
+    message.grouped_id = grouped_id
+    return message
+
+
+def _serve_events(mock_client, events):
+    """Deliver *events* to the registered handlers once the client starts listening."""
+    handlers = []
+    mock_client.add_event_handler.side_effect = lambda callback, event=None: handlers.append(callback)
+
+    async def run_until_disconnected():
+        on_message, on_album = handlers
+        for kind, event in events:
+            await (on_album if kind == "album" else on_message)(event)
+
+    mock_client.run_until_disconnected.side_effect = run_until_disconnected
+
+
+@pytest.mark.asyncio
+async def test_new_posts_are_copied_and_appended_to_current_run(temp_dirs, mock_telethon_client):
+    _, output_dir = get_data_dirs()
+    run_file = Path(output_dir) / f"20250101_120000_{DEST}.txt"
+    run_file.write_text(f"https://t.me/c/{DEST}/1\n")
+    album = [_grouped(11, 7), _grouped(10, 7)]
+    _serve_events(mock_telethon_client, [
+        ("message", SimpleNamespace(chat_id=SOURCE_CHAT_ID, message=MockMessage(9))),
+        ("message", SimpleNamespace(chat_id=SOURCE_CHAT_ID, message=album[0])),  # handled as album
+        ("album", SimpleNamespace(chat_id=SOURCE_CHAT_ID, messages=album)),
+    ])
+    mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(2)
+    mock_telethon_client.send_file.side_effect = lambda entity, media, caption=None: [MockMessage(3), MockMessage(4)]
+
+    await follow([str(SOURCE_CHAT_ID)], DEST, sleep_interval=0)
+
+    assert mock_telethon_client.send_message.call_count == 1
+    assert mock_telethon_client.send_file.call_count == 1
+    assert run_file.read_text().split() == [f"https://t.me/c/{DEST}/{i}" for i in (1, 2, 3, 4)]
+    assert len(list(Path(output_dir).glob(f"*_{DEST}*.txt"))) == 1
@@ -0,0 +1,74 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from src.delete import delete_from_file
+from src.journal import Journal
+from src.reposter import repost_from_file, get_data_dirs
+from tests.conftest import MockMessage
+
+PUBLIC_CHANNEL = "@dummy_channel991"
+
+
+class TestJournalFile:
+    def test_records_roundtrip_and_torn_line_is_ignored(self, tmp_path):
+        journal = Journal(tmp_path / "run.journal").open()
+        journal.record(i=0, url="a")
+        journal.record(i=1, url="b")
+        journal.close()
+        with open(tmp_path / "run.journal", "a") as f:
+            f.write('{"i": 2, "url"')  # crash mid-write
+
+        assert Journal(tmp_path / "run.journal").load() == [{"i": 0, "url": "a"}, {"i": 1, "url": "b"}]
+
+    def test_remove(self, tmp_path):
+        journal = Journal(tmp_path / "run.journal").open()
+        journal.remove()
+        assert not journal.exists()
+
+
+@pytest.mark.asyncio
+class TestResume:
+    async def test_repost_resumes_after_interruption(self, temp_dirs, mock_telethon_client):
+        input_dir, output_dir = get_data_dirs()
+        source = os.path.join(input_dir, "source_urls.txt")
+        Path(source).write_text("".join(f"https://t.me/src/{i}\n" for i in range(1, 6)))
+
+        def interrupt_on_third(entity, message):
+            if message.id == 3:
+                raise asyncio.CancelledError()
+            return MockMessage(100 + message.id)
+
+        mock_telethon_client.send_message.side_effect = interrupt_on_third
+        mock_telethon_client.__aexit__.return_value = False  # let the cancellation propagate
+        with pytest.raises(SystemExit):
+            await repost_from_file(PUBLIC_CHANNEL, source, sleep_interval=0)
+        assert not list(Path(output_dir).glob("*_dummy_channel991.txt"))
+
+        mock_telethon_client.send_message.reset_mock()
+        mock_telethon_client.send_message.side_effect = lambda entity, message: MockMessage(100 + message.id)
+        await repost_from_file(PUBLIC_CHANNEL, source, sleep_interval=0, resume=True)
+
+        sent_ids = [call.args[1].id for call in mock_telethon_client.send_message.call_args_list]
+        assert sent_ids == [3, 4, 5]
+        [run_file] = Path(output_dir).glob("*_dummy_channel991.txt")
+        assert run_file.read_text().split() == [f"https://t.me/{PUBLIC_CHANNEL}/{100 + i}" for i in range(1, 6)]
+        assert not list((Path(output_dir) / ".state").glob("*.journal"))
+
+    async def test_delete_resume_skips_deleted_chunks(self, temp_dirs, mock_telethon_client):
+        _, output_dir = get_data_dirs()
+        path = Path(output_dir) / "to_delete.txt"
+        path.write_text("".join(f"https://t.me/c/123/{i}\n" for i in range(1, 151)))
+        mock_telethon_client.delete_messages.side_effect = [None, Exception("Delete failed")]
+
+        with pytest.raises(SystemExit):
+            await delete_from_file(str(path))
+
+        mock_telethon_client.delete_messages.reset_mock(side_effect=True)
+        await delete_from_file(str(path), resume=True)
+
+        [call] = mock_telethon_client.delete_messages.call_args_list
+        assert call.args[1] == list(range(101, 151))
+        assert not path.exists()
@@ -0,0 +1,155 @@
+import asyncio
+import json
+
+import pytest
+
+from src.bench import simulated_telegram
+from src.metrics import METRICS, InstrumentedClient, Metrics, RunSummary, serve_metrics
+from src.rate_limit import RateLimiter
+from src.reposter import repost_from_file
+from src.simulator import FakeTelegram
+from src.urls import dest_message_url
+from src.utils_files import state_dir
+
+SOURCE = "-1001000000001"
+DESTINATION = "-1002000000002"
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    METRICS.reset()
+    yield METRICS
+    METRICS.reset()
+
+
+def test_render_prometheus_counters_gauges_and_histograms():
+    metrics = Metrics()
+    metrics.inc("telegram_api_calls_total", method="send_message")
+    metrics.inc("telegram_api_calls_total", method="send_message")
+    metrics.set_gauge("pipeline_queue_depth", 7, destination="-100123")
+    metrics.observe("telegram_api_call_seconds", 0.03, method="get_messages")
+    metrics.observe("telegram_api_call_seconds", 100, method="get_messages")
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE telegram_api_calls_total counter" in text
+    assert 'telegram_api_calls_total{method="send_message"} 2' in text
+    assert 'pipeline_queue_depth{destination="-100123"} 7' in text
+    assert "# TYPE telegram_api_call_seconds histogram" in text
+    assert 'telegram_api_call_seconds_bucket{method="get_messages",le="0.025"} 0' in text
+    assert 'telegram_api_call_seconds_bucket{method="get_messages",le="0.05"} 1' in text
+    assert 'telegram_api_call_seconds_bucket{method="get_messages",le="+Inf"} 2' in text
+    assert 'telegram_api_call_seconds_count{method="get_messages"} 2' in text
+
+
+def test_instrumented_client_counts_calls_and_errors():
+    server = FakeTelegram()
+    server.add_channel(SOURCE)
+    metrics = Metrics()
+    client = InstrumentedClient(server.client(), metrics)
+
+    async def scenario():
+        await client.get_messages(SOURCE, ids=[1])
+        with pytest.raises(ValueError):
+            await client.get_entity("@missing")
+
+    asyncio.run(scenario())
+
+    assert metrics.value("telegram_api_calls_total", method="get_messages") == 1
+    assert metrics.value("telegram_api_calls_total", method="get_entity") == 1
+    assert metrics.value("telegram_api_errors_total", method="get_entity", error="ValueError") == 1
+    assert metrics.histogram("telegram_api_call_seconds", method="get_messages").count == 1
+    # Attributes other than the instrumented methods pass straight through
+    assert client.server is server
+
+
+def test_rate_limiter_reports_flood_waits(fresh_metrics):
+    server = FakeTelegram()
+    server.add_channel(DESTINATION)
+    server.inject_flood("send_message", seconds=3, every=2)
+    client = server.client()
+    limiter = RateLimiter(0)
+
+    async def scenario():
+        for _ in range(2):
+            await limiter.call(("send", DESTINATION), lambda: client.send_message(DESTINATION, "hi"))
+
+    asyncio.run(scenario())
+
+    assert fresh_metrics.value("flood_waits_total", key="send") == 1
+    assert fresh_metrics.value("flood_wait_seconds_total", key="send") == 3
+    assert fresh_metrics.value("rate_limit_sleep_seconds_total", key="send") > 0
+
+
+@pytest.mark.asyncio
+async def test_repost_writes_run_summary_and_textfile(temp_dirs, tmp_path, monkeypatch, fresh_metrics):
+    textfile = tmp_path / "reposter.prom"
+    monkeypatch.setenv("METRICS_TEXTFILE", str(textfile))
+    server = FakeTelegram()
+    server.add_channel(SOURCE)
+    server.add_channel(DESTINATION)
+    ids = server.populate(SOURCE, 12, album_every=6, album_size=3)
+    server.inject_flood("send_message", seconds=5, every=4)
+    source = tmp_path / "metrics_urls.txt"
+    source.write_text("".join(dest_message_url(SOURCE, i) + "\n" for i in ids))
+
+    with simulated_telegram(server):
+        await repost_from_file(DESTINATION, str(source), sleep_interval=0)
+
+    [summary_path] = (state_dir() / "metrics").glob("*_repost.json")
+    summary = json.loads(summary_path.read_text())
+    # 2 albums of 3 messages plus 6 single messages
+    assert summary["messages"] == 12
+    assert summary["destinations"] == {DESTINATION: 12}
+    assert summary["api_calls"]["send_file"]["count"] == 2
+    # 6 sends; the 4th call is flooded and retried
+    assert summary["api_calls"]["send_message"] == {"count": 7, "seconds": pytest.approx(0, abs=1), "errors": 1}
+    assert summary["flood_waits"] == {"send": {"count": 1, "seconds": 5}}
+    assert summary["messages_per_second"] > 0
+
+    text = textfile.read_text()
+    assert 'run_messages_total{command="repost"} 12' in text
+    assert 'telegram_api_calls_total{method="send_message"} 7' in text
+    assert 'pipeline_queue_depth{destination="-1002000000002"}' in text
+
+
+def test_run_summary_reports_only_its_own_calls(fresh_metrics):
+    fresh_metrics.inc("telegram_api_calls_total", 5, method="get_messages")
+    run = RunSummary("delete")
+    fresh_metrics.inc("telegram_api_calls_total", 2, method="delete_messages")
+
+    summary = run.summary(200)
+
+    assert summary["api_calls"] == {"delete_messages": {"count": 2, "seconds": 0, "errors": 0}}
+    assert summary["api_calls_per_message"] == 0.01
+
+
+def test_runs_started_in_the_same_second_keep_their_summaries(temp_dirs):
+    first, second = RunSummary("delete"), RunSummary("delete")
+    second.started_at = first.started_at
+
+    first.finish(1)
+    second.finish(2)
+
+    paths = sorted((state_dir() / "metrics").glob("*_delete*.json"))
+    assert paths[1].name == paths[0].stem + "_2.json"
+    assert [json.loads(path.read_text())["messages"] for path in paths] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text(fresh_metrics):
+    fresh_metrics.inc("telegram_api_calls_total", method="send_file")
+    server = await serve_metrics(0, host="127.0.0.1")
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        response = (await reader.read()).decode()
+        writer.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'telegram_api_calls_total{method="send_file"} 1' in response
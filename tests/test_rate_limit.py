@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+from telethon.errors import FloodWaitError
+
+from src.bench import simulated_telegram
+from src.rate_limit import RateLimiter, flood_wait_seconds
+from src.reposter import repost_from_file
+from src.simulator import FakeTelegram
+from tests.conftest import MockMessage
+
+PUBLIC_CHANNEL = "@dummy_channel991"
+
+
+def _flood(seconds):
+    err = FloodWaitError(None)
+    err.seconds = seconds
+    return err
+
+
+class TestRateLimiterState:
+    def test_flood_wait_seconds(self):
+        assert flood_wait_seconds(_flood(7)) == 7
+        assert flood_wait_seconds(ValueError("nope")) is None
+
+    def test_backoff_and_ramp_up(self):
+        limiter = RateLimiter(1.0, recover_after=2)
+        limiter.on_flood("k", 5)
+        assert limiter.current_interval("k") == 2.0
+
+        for _ in range(2):
+            limiter.on_success("k")
+        assert limiter.current_interval("k") == pytest.approx(1.8)
+
+        # Never ramps up beyond the configured floor
+        for _ in range(100):
+            limiter.on_success("k")
+        assert limiter.current_interval("k") == 1.0
+
+    def test_backoff_respects_cap(self):
+        limiter = RateLimiter(1.0, max_interval=3.0)
+        for _ in range(5):
+            limiter.on_flood("k", 1)
+        assert limiter.current_interval("k") == 3.0
+
+    def test_min_interval_allows_faster_rate(self):
+        limiter = RateLimiter(1.0, min_interval=0.5, recover_after=1)
+        for _ in range(20):
+            limiter.on_success("k")
+        assert limiter.current_interval("k") == 0.5
+
+
+@pytest.mark.asyncio
+class TestRateLimiterCall:
+    async def test_retries_after_exact_server_wait(self, mock_asyncio_sleep):
+        limiter = RateLimiter(0)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise _flood(30)
+            return "ok"
+
+        assert await limiter.call("k", flaky) == "ok"
+        assert len(attempts) == 2
+        assert mock_asyncio_sleep.call_args[0][0] == pytest.approx(30, abs=0.05)
+
+    async def test_concurrent_callers_queue_one_interval_apart(self, mock_asyncio_sleep):
+        limiter = RateLimiter(2)
+        # Sleep without moving the clock: every caller reserves its slot before it sleeps
+        mock_asyncio_sleep.side_effect = None
+
+        await asyncio.gather(*(limiter.acquire("k") for _ in range(3)))
+
+        delays = sorted(call.args[0] for call in mock_asyncio_sleep.call_args_list)
+        assert delays == [pytest.approx(2, abs=0.05), pytest.approx(4, abs=0.05)]
+
+    async def test_gives_up_after_max_retries(self, mock_asyncio_sleep):
+        limiter = RateLimiter(0, max_retries=2)
+
+        async def always_flooded():
+            raise _flood(1)
+
+        with pytest.raises(FloodWaitError):
+            await limiter.call("k", always_flooded)
+
+    async def test_repost_does_not_lose_flooded_message(self, temp_dirs, mock_telethon_client):
+        temp_input, _ = temp_dirs
+        source_file = os.path.join(temp_input, "source_urls.txt")
+        with open(source_file, "w") as f:
+            f.write("https://t.me/test/1\n")
+        mock_telethon_client.send_message.side_effect = [_flood(3), MockMessage(77)]
+
+        await repost_from_file(PUBLIC_CHANNEL, source_file, sleep_interval=0)
+
+        assert mock_telethon_client.send_message.call_count == 2
+
+    async def test_flood_outside_the_paced_paths_is_slept_out(self, temp_dirs, mock_asyncio_sleep):
+        server = FakeTelegram()
+        server.add_channel("-1001000000001", username="test")
+        server.add_channel("-1002000000002")
+        server.populate("-1001000000001", 1)
+        # The destination lookup is the first get_entity call
+        server.inject_flood("get_entity", seconds=3, every=1)
+        source_file = os.path.join(temp_dirs[0], "source_urls.txt")
+        with open(source_file, "w") as f:
+            f.write("https://t.me/test/1\n")
+
+        async def clear_after_first_flood(seconds):
+            server.clear_floods()
+
+        mock_asyncio_sleep.side_effect = clear_after_first_flood
+        with simulated_telegram(server):
+            await repost_from_file("-1002000000002", source_file, sleep_interval=0)
+
+        assert len(server.channel("-1002000000002").messages) == 1
+        mock_asyncio_sleep.assert_any_await(pytest.approx(3, abs=0.05))
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import src.reposter
+from src.reposter import get_data_dirs
+from src.serve import serve
+
+URL_FILE_DEST = "2763892937"
+MANIFEST_DEST = "1111111111"
+
+
+def _spool(tmp_path):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    return spool
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_over_one_connection(tmp_path, temp_dirs, mock_telethon_client):
+    spool = _spool(tmp_path)
+    source = tmp_path / "urls.txt"
+    source.write_text("https://t.me/src/1\n")
+    (spool / "a.json").write_text(json.dumps({"command": "repost", "destination": MANIFEST_DEST, "source": str(source), "sleep": 0}))
+    (spool / "b.txt").write_text("https://t.me/src/2\n")
+
+    await serve(spool, destination=(URL_FILE_DEST,), once=True)
+
+    assert sorted(p.name for p in (spool / "done").iterdir()) == ["a.json", "b.txt"]
+    assert src.reposter.TelegramClient.call_count == 1
+    _, output_dir = get_data_dirs()
+    assert len(list(Path(output_dir).glob(f"*_{MANIFEST_DEST}.txt"))) == 1
+    assert len(list(Path(output_dir).glob(f"*_{URL_FILE_DEST}.txt"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_job_does_not_stop_the_daemon(tmp_path, temp_dirs, mock_telethon_client):
+    spool = _spool(tmp_path)
+    (spool / "bad.json").write_text(json.dumps({"command": "explode"}))
+    (spool / "invalid.txt").write_text("not_a_url\n")
+    (spool / "ok.txt").write_text("https://t.me/src/1\n")
+
+    await serve(spool, destination=(URL_FILE_DEST,), once=True)
+
+    assert sorted(p.name for p in (spool / "failed").iterdir()) == ["bad.json", "invalid.txt"]
+    assert [p.name for p in (spool / "done").iterdir()] == ["ok.txt"]
+
+
+@pytest.mark.asyncio
+async def test_claimed_jobs_are_resumed_on_start(tmp_path, temp_dirs, mock_telethon_client):
+    spool = _spool(tmp_path)
+    (spool / "processing").mkdir()
+    (spool / "processing" / "left.txt").write_text("https://t.me/src/1\n")
+
+    await serve(spool, destination=(URL_FILE_DEST,), once=True)
+
+    assert [p.name for p in (spool / "done").iterdir()] == ["left.txt"]
+    assert mock_telethon_client.send_message.call_count == 1
@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+
+import pytest
+from telethon.errors import FloodWaitError
+
+import src.reposter
+from src.reposter import repost_from_file, get_data_dirs
+from src.session_pool import HANDOFF_FLOOD_WAIT, SessionPool, get_session_names
+from tests.conftest import MockMessage
+
+
+def test_session_names_priority(monkeypatch):
+    monkeypatch.delenv("TELEGRAM_SESSIONS", raising=False)
+    assert get_session_names() == ["anon"]
+    monkeypatch.setenv("TELEGRAM_SESSIONS", "a, b,a")
+    assert get_session_names() == ["a", "b"]
+    assert get_session_names(["c"]) == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_keys_stick_to_least_loaded_healthy_session(tmp_path, mock_telethon_client):
+    async with SessionPool(["a", "b"], health_path=tmp_path / "health.json") as pool:
+        assert pool.lane_for("x").name == "a"
+        assert pool.lane_for("y").name == "b"
+        assert pool.lane_for("x").name == "a"
+
+        pool.report_flood("a", HANDOFF_FLOOD_WAIT - 1)
+        assert pool.lane_for("x").name == "a"  # short waits are sat out
+        pool.report_flood("a", 3600)
+        assert pool.lane_for("x").name == "b"
+
+    # The next run still avoids the blocked session
+    async with SessionPool(["a", "b"], health_path=tmp_path / "health.json") as pool:
+        assert not pool.is_healthy("a")
+        assert pool.lane_for("z").name == "b"
+
+
+@pytest.mark.asyncio
+async def test_long_flood_wait_moves_destination_to_other_session(temp_dirs, mock_telethon_client):
+    input_dir, output_dir = get_data_dirs()
+    source = os.path.join(input_dir, "source_urls.txt")
+    Path(source).write_text("https://t.me/src/1\nhttps://t.me/src/2\n")
+    floods = [FloodWaitError(None, capture=3600)]
+
+    def send_message(entity, message):
+        if floods:
+            raise floods.pop()
+        return MockMessage(100 + message.id)
+
+    mock_telethon_client.send_message.side_effect = send_message
+
+    await repost_from_file("2763892937", source, sleep_interval=0, sessions=["a", "b"])
+
+    sessions = [call.args[0] for call in src.reposter.TelegramClient.call_args_list]
+    assert sessions == ["a", "b"]
+    # Both items were re-fetched through the second session before sending
+    assert mock_telethon_client.get_messages.call_count == 3
+    [run_file] = Path(output_dir).glob("*_2763892937.txt")
+    assert run_file.read_text().split() == ["https://t.me/c/2763892937/101", "https://t.me/c/2763892937/102"]
+    assert "a" in (Path(output_dir) / ".state" / "session_health.json").read_text()
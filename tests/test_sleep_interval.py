@@ -64,9 +64,9 @@ class TestSleepIntervalIntegration:
 
         # Verify sleep was called exactly 2 times (between 3 messages)
         assert mock_asyncio_sleep.call_count == 2
-        # Verify sleep was called with correct interval
+        # Verify sleep was called with correct interval (minus the time spent sending)
         for call in mock_asyncio_sleep.call_args_list:
-            assert call[0][0] == 1.5
+            assert call[0][0] == pytest.approx(1.5, abs=0.05)
 
     async def test_no_sleep_for_single_message(self, temp_dirs, mock_telethon_client, mock_asyncio_sleep):
         """Test that no sleep is called for single message"""
@@ -93,7 +93,7 @@ class TestSleepIntervalIntegration:
 
         # Verify sleep was called with environment variable value
         assert mock_asyncio_sleep.call_count == 1
-        assert mock_asyncio_sleep.call_args[0][0] == 2.5
+        assert mock_asyncio_sleep.call_args[0][0] == pytest.approx(2.5, abs=0.05)
 
     async def test_default_sleep_interval_used(self, temp_dirs, mock_telethon_client, mock_asyncio_sleep):
         """Test that default sleep interval (0.1) is used when no CLI or env value"""
@@ -108,7 +108,7 @@ class TestSleepIntervalIntegration:
 
         # Verify sleep was called with default value
         assert mock_asyncio_sleep.call_count == 1
-        assert mock_asyncio_sleep.call_args[0][0] == 0.1
+        assert mock_asyncio_sleep.call_args[0][0] == pytest.approx(0.1, abs=0.05)
 
     async def test_zero_sleep_interval_for_tests(self, temp_dirs, mock_telethon_client, mock_asyncio_sleep):
         """Test that zero sleep interval works (for test environments)"""
@@ -120,6 +120,5 @@ class TestSleepIntervalIntegration:
 
         await repost_from_file(PUBLIC_CHANNEL, source_file, sleep_interval=0.0)
 
-        # Verify sleep was called with zero value
-        assert mock_asyncio_sleep.call_count == 1
-        assert mock_asyncio_sleep.call_args[0][0] == 0.0
+        # A zero interval never has to wait
+        assert mock_asyncio_sleep.call_count == 0
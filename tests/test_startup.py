@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.config import env_number, get_config, reset_config
+from src.utils_files import list_runs
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Generous enough for a loaded CI runner; importing Telethon alone used to take most of it
+MAX_STARTUP_SECONDS = 1.5
+
+
+def _run_cli(*args):
+    """Run ``python -X importtime -m src.main *args`` outside test mode; return (seconds, stderr)."""
+    env = {k: v for k, v in os.environ.items() if k != "TEST_MODE"}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.main", *args],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stderr
+    return elapsed, result.stderr
+
+
+@pytest.mark.parametrize("args", [("--help",), ("repost", "--help"), ("delete", "--help")])
+def test_cli_cold_start_does_not_import_telethon(args):
+    elapsed = min(_run_cli(*args)[0] for _ in range(3))
+    _, importtime = _run_cli(*args)
+
+    assert " telethon" not in importtime
+    assert elapsed < MAX_STARTUP_SECONDS, f"{' '.join(args)} took {elapsed:.2f}s to start"
+
+
+def test_config_is_resolved_once_without_stack_inspection():
+    reset_config()
+    with patch("inspect.stack", side_effect=AssertionError("inspect.stack() called")):
+        config = get_config()
+        for _ in range(3):
+            list_runs("some_dest")
+
+    assert config.test_mode
+    assert config.data_dirs == ("./tests/data/input", "./tests/data/output")
+    assert get_config() is config
+
+
+def test_reset_config_rereads_environment(monkeypatch):
+    reset_config()
+    monkeypatch.setenv("API_HASH", "otherhash")
+    try:
+        assert get_config().api_hash == "otherhash"
+    finally:
+        reset_config()
+
+
+@pytest.mark.parametrize("value, expected", [(None, 8), ("3", 3), ("2.5", 8), ("many", 8)])
+def test_env_number_falls_back_to_default(monkeypatch, value, expected):
+    if value is not None:
+        monkeypatch.setenv("TRANSFER_PARALLELISM", value)
+    else:
+        monkeypatch.delenv("TRANSFER_PARALLELISM", raising=False)
+
+    assert env_number("TRANSFER_PARALLELISM", 8, int) == expected
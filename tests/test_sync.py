@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+import src.reposter
+from src.reposter import get_data_dirs
+from src.sync import sync
+
+PRIVATE_CHANNEL = "2763892937"
+
+
+@pytest.mark.asyncio
+async def test_sync_reposts_and_deletes_previous_run_over_one_connection(write_source, sends):
+    source = write_source(["https://t.me/src/1", "https://t.me/src/2"])
+
+    await sync(PRIVATE_CHANNEL, source, sleep_interval=0)
+    sends.delete_messages.assert_not_called()
+
+    # An unchanged list is posted afresh by default, and the whole previous run deleted
+    src.reposter.TelegramClient.reset_mock()
+    await sync(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    assert src.reposter.TelegramClient.call_count == 1
+    sends.delete_messages.assert_called_once()
+    assert sends.delete_messages.call_args.args[1] == [100, 101]
+    _, output_dir = get_data_dirs()
+    assert len(list(Path(output_dir).glob("*_2763892937.deleted_at_*.txt"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_repost_aborts_before_delete(write_source, sends):
+    source = write_source(["https://t.me/src/1"])
+    await sync(PRIVATE_CHANNEL, source, sleep_interval=0)
+
+    bad_source = write_source(["https://t.me/src/1", "not_a_url"])
+    with pytest.raises(SystemExit):
+        await sync(PRIVATE_CHANNEL, bad_source, sleep_interval=0)
+
+    sends.delete_messages.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_sync_reuses_live_posts_and_deletes_only_removed_ones(write_source, sends):
+    await sync(PRIVATE_CHANNEL, write_source(["https://t.me/src/1", "https://t.me/src/2"]), sleep_interval=0, reuse=True)
+    sends.send_message.reset_mock()
+
+    # src/2 left the source list and src/3 is new
+    await sync(PRIVATE_CHANNEL, write_source(["https://t.me/src/1", "https://t.me/src/3"]), sleep_interval=0, reuse=True)
+
+    assert sends.send_message.call_count == 1
+    sends.delete_messages.assert_called_once()
+    assert sends.delete_messages.call_args.args[1] == [101]
+    _, output_dir = get_data_dirs()
+    [current] = Path(output_dir).glob("*_2763892937.txt")
+    assert current.read_text().splitlines() == [
+        "https://t.me/c/2763892937/100",
+        "https://t.me/c/2763892937/102",
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from telethon.tl import types
+from telethon.tl.functions.upload import SaveBigFilePartRequest, SaveFilePartRequest
+
+from src.bench import run_transfer_benchmark
+from src.simulator import FakeTelegram
+from src.transfer import TransferEngine
+
+MiB = 2**20
+
+
+class RecordingClient:
+    """Accepts raw upload part requests and records them."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        return True
+
+
+def test_parallel_download_writes_every_part_in_place(tmp_path):
+    server = FakeTelegram()
+    media = server.add_file(3 * MiB + 123)
+    engine = TransferEngine(part_size_kb=256, parallelism=4, threshold=0)
+
+    path = asyncio.run(engine.download(server.client(), media, tmp_path / "video.mp4"))
+
+    assert (tmp_path / "video.mp4").stat().st_size == 3 * MiB + 123
+    assert path == str(tmp_path / "video.mp4")
+    # 13 parts of 256 KB, each requested exactly once
+    assert server.calls["download_part"] == 13
+
+
+def test_flooded_stripe_resumes_after_its_last_part(tmp_path, mock_asyncio_sleep):
+    server = FakeTelegram()
+    media = server.add_file(2 * MiB)
+    server.inject_flood("download_part", seconds=2, every=7)
+    engine = TransferEngine(part_size_kb=128, parallelism=2, threshold=0)
+
+    asyncio.run(engine.download(server.client(), media, tmp_path / "video.mp4"))
+
+    assert (tmp_path / "video.mp4").stat().st_size == 2 * MiB
+    # 16 parts, plus the 7th and 14th requests that were flooded and sent again
+    assert server.calls["download_part"] == 18
+
+
+def test_parallel_upload_sends_each_big_file_part_once(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * (44 * 1024 + 10))  # just over 11 MiB
+    client = RecordingClient()
+
+    input_file = asyncio.run(TransferEngine(part_size_kb=512, parallelism=3).upload(client, path))
+
+    assert isinstance(input_file, types.InputFileBig)
+    assert input_file.parts == 23 and input_file.name == "video.mp4"
+    assert all(isinstance(r, SaveBigFilePartRequest) for r in client.requests)
+    assert sorted(r.file_part for r in client.requests) == list(range(23))
+    assert {r.file_id for r in client.requests} == {input_file.id}
+    data = b"".join(r.bytes for r in sorted(client.requests, key=lambda r: r.file_part))
+    assert data == path.read_bytes()
+
+
+def test_small_parallel_upload_uses_file_parts_with_checksum(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"x" * 300_000)
+    client = RecordingClient()
+
+    input_file = asyncio.run(TransferEngine(part_size_kb=128, parallelism=2, threshold=0).upload(client, path))
+
+    assert isinstance(input_file, types.InputFile) and input_file.parts == 3
+    assert all(isinstance(r, SaveFilePartRequest) for r in client.requests)
+    assert len(input_file.md5_checksum) == 32
+
+
+def test_small_files_take_the_sequential_path(tmp_path):
+    server = FakeTelegram()
+    media = server.add_file(MiB)
+    client = server.client()
+    engine = TransferEngine()
+
+    path = asyncio.run(engine.download(client, media, str(tmp_path / "doc")))
+    asyncio.run(engine.upload(client, path))
+
+    # Telethon's own part size for 1 MiB is 128 KB
+    assert server.calls == {"download_part": 8, "upload_part": 8}
+
+
+@pytest.mark.parametrize("part_size_kb, parallelism", [(100, 4), (1024, 4), (512, 0)])
+def test_invalid_settings_are_rejected(part_size_kb, parallelism):
+    with pytest.raises(ValueError):
+        TransferEngine(part_size_kb, parallelism)
+
+
+def test_env_settings(monkeypatch):
+    monkeypatch.setenv("TRANSFER_PART_KB", "64")
+    monkeypatch.setenv("TRANSFER_PARALLELISM", "16")
+
+    engine = TransferEngine()
+
+    assert engine.part_size == 64 * 1024 and engine.parallelism == 16
+
+
+def test_transfer_benchmark_compares_both_paths():
+    sequential, parallel = run_transfer_benchmark(4 * MiB, part_latency=0, parallelism=4)
+
+    assert (sequential.mode, parallel.mode) == ("sequential", "parallel")
+    # 128 KB parts each way sequentially, 512 KB parts in parallel
+    assert sequential.requests == 64 and parallel.requests == 16
+    assert parallel.megabytes_per_second > 0
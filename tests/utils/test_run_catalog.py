@@ -0,0 +1,85 @@
+import os
+from contextlib import closing
+from pathlib import Path
+
+from src.reposter import get_data_dirs
+from src.run_catalog import RunCatalog, parse_run_name
+from src.utils_files import list_runs
+
+
+def _output_dir() -> Path:
+    _, output_dir = get_data_dirs()
+    path = Path(output_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def test_parse_run_name():
+    assert parse_run_name("20250705_120000_slug.txt") == ("slug", "", "20250705_120000")
+    assert parse_run_name("20250705_120000_slug.marked_for_deletion.txt") == ("slug", "marked_for_deletion", "20250705_120000")
+    assert parse_run_name("20251399_120000_slug.txt") is None
+    assert parse_run_name("notes.txt") is None
+
+
+def test_external_changes_are_picked_up(temp_dirs):
+    output_dir = _output_dir()
+    (output_dir / "20250705_120000_slug.txt").write_text("x")
+    assert [p.name for p in list_runs("slug", status=[""])] == ["20250705_120000_slug.txt"]
+
+    (output_dir / "20250706_120000_slug.txt").write_text("x")
+    (output_dir / "20250705_120000_slug.txt").unlink()
+    assert [p.name for p in list_runs("slug", status=[""])] == ["20250706_120000_slug.txt"]
+
+
+def test_recorded_changes_do_not_trigger_rebuild(temp_dirs, monkeypatch):
+    output_dir = _output_dir()
+    first = output_dir / "20250705_120000_slug.txt"
+    first.write_text("x")
+    catalog = RunCatalog(output_dir)
+    assert catalog.runs("slug", [""]) == [first]
+
+    rebuilds = []
+    original = RunCatalog._rebuild
+    monkeypatch.setattr(RunCatalog, "_rebuild", lambda self, conn: (rebuilds.append(1), original(self, conn)))
+    marked = output_dir / "20250705_120000_slug.marked_for_deletion.txt"
+    with catalog.updating() as update:
+        first.rename(marked)
+        update.rename(first, marked)
+
+    assert catalog.runs("slug", ["", "marked_for_deletion"]) == [marked]
+    assert rebuilds == []
+
+
+def test_lookup_uses_index(temp_dirs):
+    catalog = RunCatalog(_output_dir())
+    catalog.rebuild()
+    with closing(catalog._connect()) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT name FROM runs WHERE slug = ? AND status IN (?) "
+            "ORDER BY publish_ts DESC, status = '' ASC",
+            ("slug", "marked_for_deletion"),
+        ).fetchall()
+    assert any("runs_by_slug_status" in row[-1] for row in plan)
+
+
+def test_changes_within_one_mtime_tick_are_picked_up(temp_dirs):
+    output_dir = _output_dir()
+    first = output_dir / "20250705_120000_slug.txt"
+    first.write_text("x")
+    catalog = RunCatalog(output_dir)
+    assert catalog.runs("slug", [""]) == [first]
+
+    def keep_mtime(change):
+        # As on a filesystem with coarse timestamps
+        before = output_dir.stat()
+        change()
+        os.utime(output_dir, ns=(before.st_atime_ns, before.st_mtime_ns))
+
+    second = output_dir / "20250706_120000_slug.txt"
+    keep_mtime(lambda: second.write_text("x"))
+    assert catalog.runs("slug", [""]) == [second, first]
+
+    # Same entry count too: found by rescanning after a miss
+    other = output_dir / "20250706_120000_other.txt"
+    keep_mtime(lambda: (second.unlink(), other.write_text("x")))
+    assert catalog.runs("other", [""]) == [other]